@@ -1,2 +1,3 @@
-from cs2cad.cs2cad import cs2cad
+from cs2cad.cs2cad import cs2cad, cs2cad_many, ConversionResult
+from cs2cad.step_cache import StepCache
 from cs2cad.create_dataset import create_dataset, create_datasets
@@ -0,0 +1,168 @@
+"""Batch codec between json data and the padded command/argument vectors.
+
+`encode_batch` gives the same vectors as
+    CADSequence.from_dict -> normalize -> numericalize -> to_vector(pad=True)
+for every item, but it reads the json directly: profiles are parsed into
+ProfileArrays and quantized there, the extrude rows of the whole batch are
+quantized by one NumPy op. No Extrude or curve objects are built.
+`decode_batch` de-quantizes a whole batch at once; CADSequence objects are
+built lazily by `to_cad_sequences`.
+"""
+import numpy as np
+from .extrude import CADSequence, CoordSystem
+from .profile_arrays import ProfileArrays
+from .macro import *
+
+_EXT_PLANE = slice(1 + N_ARGS_SKETCH, 1 + N_ARGS_SKETCH + N_ARGS_PLANE)
+_EXT_POS = slice(_EXT_PLANE.stop, _EXT_PLANE.stop + 3)
+_EXT_SIZE = _EXT_POS.stop
+_EXT_EXTENT = slice(_EXT_SIZE + 1, _EXT_SIZE + 3)
+_EXT_OPERATION = slice(_EXT_EXTENT.stop, _EXT_EXTENT.stop + 2)
+
+# errors of json data the codec doesn't support, anything else is a bug and raised
+PARSE_ERRORS = (KeyError, ValueError, NotImplementedError)
+
+
+def _extrude_rows(all_stat, extrude_id, scale, n, max_n_loops, max_len_loop):
+    """(quantized profile rows, raw extrude row) of every profile of an extrude feature,
+    same values as Extrude.from_dict followed by CADSequence.normalize. Returns a reason string
+    instead if the extrude breaks the limits."""
+    extrude_entity = all_stat["entities"][extrude_id]
+    if extrude_entity["start_extent"]["type"] != "ProfilePlaneStartDefinition":
+        raise ValueError("start extent not supported: {}".format(extrude_entity["start_extent"]["type"]))
+    operation = EXTRUDE_OPERATIONS.index(extrude_entity["operation"])
+    extent_type = EXTENT_TYPE.index(extrude_entity["extent_type"])
+    extent_one = extrude_entity["extent_one"]["distance"]["value"] * scale
+    extent_two = 0.0
+    if extrude_entity["extent_type"] == "TwoSidesFeatureExtentType":
+        extent_two = extrude_entity["extent_two"]["distance"]["value"]
+    extent_two *= scale
+    if not (-2.0 <= extent_one <= 2.0 and -2.0 <= extent_two <= 2.0):
+        return "extent out of range"
+
+    all_rows = []
+    for i, item in enumerate(extrude_entity["profiles"]):
+        sket_entity = all_stat["entities"][item["sketch"]]
+        arrays = ProfileArrays.from_dict(sket_entity["profiles"][item["profile"]])
+        sket_plane = CoordSystem.from_dict(sket_entity["transform"])
+        sket_pos = (sket_plane.local2global(arrays.start_point) + 0.0) * scale
+        sket_size = arrays.bbox_size * scale
+        arrays.normalize(256)
+        arrays.numericalize(n)
+        profile_vec = arrays.to_vector(max_n_loops, max_len_loop, pad=False)
+        if profile_vec is None:
+            return "too many loops or curves in a profile"
+
+        ext_row = np.full(1 + N_ARGS, PAD_VAL, dtype=np.float64)
+        ext_row[0] = EXT_IDX
+        ext_row[_EXT_PLANE] = sket_plane.to_vector()[3:]
+        ext_row[_EXT_POS] = sket_pos
+        ext_row[_EXT_SIZE] = sket_size
+        ext_row[_EXT_EXTENT] = [extent_one, extent_two]
+        if i > 0 and operation == EXTRUDE_OPERATIONS.index("NewBodyFeatureOperation"):
+            ext_row[_EXT_OPERATION] = [EXTRUDE_OPERATIONS.index("JoinFeatureOperation"), extent_type]
+        else:
+            ext_row[_EXT_OPERATION] = [operation, extent_type]
+        all_rows.append(profile_vec[:-1])
+        all_rows.append(ext_row[np.newaxis])
+    return all_rows
+
+
+def _sequence_rows(all_stat, n, max_n_ext, max_n_loops, max_len_loop, max_total_len):
+    """rows of one json dict, profile rows quantized and extrude rows raw, or a reason string"""
+    bbox_info = all_stat["properties"]["bounding_box"]
+    bbox = [bbox_info[key][axis] for key in ["max_point", "min_point"] for axis in "xyz"]
+    scale = 1.0 * NORM_FACTOR / np.max(np.abs(bbox))
+
+    all_rows, n_ext = [], 0
+    for item in all_stat["sequence"]:
+        if item["type"] != "ExtrudeFeature":
+            continue
+        rows = _extrude_rows(all_stat, item["entity"], scale, n, max_n_loops, max_len_loop)
+        if isinstance(rows, str):
+            return rows
+        all_rows.extend(rows)
+        n_ext += len(rows) // 2
+    if n_ext > max_n_ext:
+        return "too many extrudes"
+    if n_ext == 0:
+        return "no extrude"
+    all_rows.append(EOS_VEC[np.newaxis])
+    if sum(len(rows) for rows in all_rows) > max_total_len:
+        return "sequence too long"
+    return all_rows
+
+
+def quantize_ext_rows(raw, n=ARGS_DIM):
+    """quantize raw extrude rows (R, 1 + N_ARGS), same math as Extrude.numericalize"""
+    out = np.full(raw.shape, PAD_VAL, dtype=int)
+    out[:, 0] = EXT_IDX
+    out[:, _EXT_PLANE] = ((raw[:, _EXT_PLANE] / np.pi + 1.0) / 2 * n).round().clip(min=0, max=n-1)
+    out[:, _EXT_POS] = ((raw[:, _EXT_POS] + 1.0) / 2 * n).round().clip(min=0, max=n-1)
+    out[:, _EXT_SIZE] = (raw[:, _EXT_SIZE] / 2 * n).round().clip(min=0, max=n-1)
+    out[:, _EXT_EXTENT] = ((raw[:, _EXT_EXTENT] + 1.0) / 2 * n).round().clip(min=0, max=n-1)
+    out[:, _EXT_OPERATION] = raw[:, _EXT_OPERATION]
+    return out
+
+
+def encode_batch(all_stats, n=ARGS_DIM, max_n_ext=MAX_N_EXT, max_n_loops=MAX_N_LOOPS,
+                 max_len_loop=MAX_N_CURVES, max_total_len=MAX_TOTAL_LEN, return_reasons=False):
+    """encode a list of json dicts into a padded batch.
+
+    Returns:
+        vecs (np.array): (N, max_total_len, 1 + N_ARGS) int, EOS padded
+        valid (np.array): (N,) bool, False for items that fail to parse or exceed the length limits
+        reasons (list): only if return_reasons, None for valid items, otherwise why the item was dropped
+    """
+    all_rows, lengths, reasons = [], [], []
+    for all_stat in all_stats:
+        try:
+            rows = _sequence_rows(all_stat, n, max_n_ext, max_n_loops, max_len_loop, max_total_len)
+        except PARSE_ERRORS as e:
+            rows = "{}: {}".format(type(e).__name__, e)
+        if isinstance(rows, str):
+            reasons.append(rows)
+            rows = []
+        else:
+            reasons.append(None)
+        all_rows.extend(rows)
+        lengths.append(sum(len(r) for r in rows))
+
+    lengths = np.array(lengths, dtype=int)
+    vecs = np.tile(EOS_VEC, (len(lengths), max_total_len, 1))
+    if len(all_rows) > 0:
+        flat = np.concatenate(all_rows, axis=0)
+        is_ext = flat[:, 0] == EXT_IDX
+        out = flat.astype(int)
+        out[is_ext] = quantize_ext_rows(flat[is_ext], n)
+        item_idx = np.repeat(np.arange(len(lengths)), lengths)
+        row_idx = np.arange(len(out)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        vecs[item_idx, row_idx] = out
+    if return_reasons:
+        return vecs, lengths > 0, reasons
+    return vecs, lengths > 0
+
+
+def decode_batch(vecs, n=ARGS_DIM):
+    """de-quantize a batch (N, L, 1 + N_ARGS), same math as denumericalize.
+    Sketch coordinates stay on the n x n grid, as in from_vector(is_numerical=True)."""
+    out = vecs.astype(np.float64)
+    cmd = vecs[..., 0]
+    is_arc = cmd == ARC_IDX
+    out[..., 3][is_arc] = vecs[..., 3][is_arc] / 256 * 2 * np.pi
+
+    is_ext = cmd == EXT_IDX
+    ext = out[is_ext]
+    ext[:, _EXT_PLANE] = (ext[:, _EXT_PLANE] / n * 2 - 1.0) * np.pi
+    ext[:, _EXT_POS] = ext[:, _EXT_POS] / n * 2 - 1.0
+    ext[:, _EXT_SIZE] = ext[:, _EXT_SIZE] / n * 2
+    ext[:, _EXT_EXTENT] = ext[:, _EXT_EXTENT] / n * 2 - 1.0
+    out[is_ext] = ext
+    return out
+
+
+def to_cad_sequences(vecs, n=ARGS_DIM, indices=None):
+    """lazily construct CADSequence objects from a quantized batch"""
+    decoded = decode_batch(vecs if indices is None else vecs[indices], n)
+    for vec in decoded:
+        yield CADSequence.from_vector(vec, is_numerical=False, n=n)
@@ -34,7 +34,10 @@ def construct_curve_from_vector(vec, start_point, is_numerical=True):
 
 #######################  base  #######################
 class CurveBase(object):
-    """Base class for curve. All types of curves shall inherit from this."""
+    """Base class for curve. All types of curves shall inherit from this.
+    Curves use __slots__ to keep large in-memory datasets compact."""
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -88,6 +91,8 @@ class CurveBase(object):
 
 ####################### curves #######################
 class Line(CurveBase):
+    __slots__ = ("start_point", "end_point")
+
     def __init__(self, start_point, end_point):
         super(Line, self).__init__()
         self.start_point = start_point
@@ -156,6 +161,9 @@ class Line(CurveBase):
 
 
 class Arc(CurveBase):
+    __slots__ = ("start_point", "end_point", "center", "radius", "normal",
+                 "start_angle", "end_angle", "ref_vec", "mid_point")
+
     def __init__(self, start_point, end_point, center, radius,
                  normal=None, start_angle=None, end_angle=None, ref_vec=None):
         super(Arc, self).__init__()
@@ -343,6 +351,8 @@ class Arc(CurveBase):
 
 
 class Circle(CurveBase):
+    __slots__ = ("center", "radius", "normal")
+
     def __init__(self, center, radius, normal=None):
         super(Circle, self).__init__()
         self.center = center
@@ -1,12 +1,16 @@
 import numpy as np
 import random
+import hashlib
 from .sketch import Profile
+from .curves import Line, Arc, Circle
 from .macro import *
 from .math_utils import cartesian2polar, polar2cartesian, polar_parameterization, polar_parameterization_inverse
 
 
 class CoordSystem(object):
     """Local coordinate system for sketch plane."""
+    __slots__ = ("origin", "_theta", "_phi", "_gamma", "_y_axis", "is_numerical", "_frame")
+
     def __init__(self, origin, theta, phi, gamma, y_axis=None, is_numerical=False):
         self.origin = origin
         self._theta = theta # 0~pi
@@ -14,21 +18,36 @@ class CoordSystem(object):
         self._gamma = gamma # -pi~pi
         self._y_axis = y_axis # (theta, phi)
         self.is_numerical = is_numerical
+        self._frame = None # cached (3, 3) [x_axis, y_axis, normal], reset whenever the angles change
+
+    @property
+    def frame(self):
+        """read-only 3x3 matrix with x_axis, y_axis and normal as rows"""
+        if self._frame is None:
+            normal_3d, x_axis_3d = polar_parameterization_inverse(self._theta, self._phi, self._gamma)
+            if self._y_axis is None:
+                y_axis_3d = np.cross(normal_3d, x_axis_3d)
+            else:
+                y_axis_3d = polar2cartesian(self._y_axis)
+            self._frame = np.stack([x_axis_3d, y_axis_3d, normal_3d], axis=0)
+            self._frame.flags.writeable = False
+        return self._frame
 
     @property
     def normal(self):
-        return polar2cartesian([self._theta, self._phi])
+        return self.frame[2]
 
     @property
     def x_axis(self):
-        normal_3d, x_axis_3d = polar_parameterization_inverse(self._theta, self._phi, self._gamma)
-        return x_axis_3d
+        return self.frame[0]
 
     @property
     def y_axis(self):
-        if self._y_axis is None:
-            return np.cross(self.normal, self.x_axis)
-        return polar2cartesian(self._y_axis)
+        return self.frame[1]
+
+    def local2global(self, points):
+        """convert (2,) or (N, 2) points in sketch plane coordinates to global 3D coordinates"""
+        return np.asarray(points) @ self.frame[:2] + self.origin
 
     @staticmethod
     def from_dict(stat):
@@ -62,21 +81,38 @@ class CoordSystem(object):
         tmp = np.array([self._theta, self._phi, self._gamma])
         self._theta, self._phi, self._gamma = ((tmp / np.pi + 1.0) / 2 * n).round().clip(
             min=0, max=n-1).astype(np.int)
+        self._frame = None
         self.is_numerical = True
 
     def denumericalize(self, n=256):
         self.origin = self.origin / n * 2 - 1.0
         tmp = np.array([self._theta, self._phi, self._gamma])
         self._theta, self._phi, self._gamma = (tmp / n * 2 - 1.0) * np.pi
+        self._frame = None
         self.is_numerical = False
 
     def to_vector(self):
         return np.array([*self.origin, self._theta, self._phi, self._gamma])
 
 
+def _curve_digest_params(curve):
+    """geometric parameters of a curve that determine the built edge"""
+    if isinstance(curve, Line):
+        return [LINE_IDX, *curve.start_point, *curve.end_point]
+    elif isinstance(curve, Arc):
+        return [ARC_IDX, *curve.start_point, *curve.mid_point, *curve.end_point]
+    elif isinstance(curve, Circle):
+        return [CIRCLE_IDX, *curve.center, curve.radius]
+    else:
+        raise NotImplementedError(type(curve))
+
+
 class Extrude(object):
     """Single extrude operation with corresponding a sketch profile.
     NOTE: only support single sketch profile. Extrusion with multiple profiles is decomposed."""
+    __slots__ = ("profile", "sketch_plane", "operation", "extent_type", "extent_one", "extent_two",
+                 "sketch_pos", "sketch_size")
+
     def __init__(self, profile: Profile, sketch_plane: CoordSystem,
                  operation, extent_type, extent_one, extent_two, sketch_pos, sketch_size):
         """
@@ -124,7 +160,7 @@ class Extrude(object):
             sket_plane = CoordSystem.from_dict(sket_entity["transform"])
             # normalize profile
             point = sket_profile.start_point
-            sket_pos = point[0] * sket_plane.x_axis + point[1] * sket_plane.y_axis + sket_plane.origin
+            sket_pos = sket_plane.local2global(point)
             sket_size = sket_profile.bbox_size
             sket_profile.normalize(sketch_dim)
             all_skets.append((sket_profile, sket_plane, sket_pos, sket_size))
@@ -210,6 +246,21 @@ class Extrude(object):
         self.profile.flip(axis)
         self.profile.normalize()
 
+    def digest(self, decimals=6):
+        """hash of everything `create_by_extrude` depends on, values rounded to `decimals`.
+        Two extrudes with the same digest build the same solid."""
+        params = [self.operation, self.extent_type, self.extent_one, self.extent_two, self.sketch_size,
+                  *self.sketch_pos, *self.sketch_plane.normal, *self.sketch_plane.x_axis, *self.sketch_plane.y_axis]
+        if self.profile.arrays is not None:
+            params.extend(self.profile.arrays.digest_params())
+        else:
+            for loop in self.profile.children:
+                params.append(-1) # loop separator
+                for curve in loop.children:
+                    params.extend(_curve_digest_params(curve))
+        arr = np.round(np.array(params, dtype=np.float64), decimals) + 0.0 # +0.0 turns -0.0 into 0.0
+        return hashlib.sha1(arr.tobytes()).hexdigest()
+
     def to_vector(self, max_n_loops=6, max_len_loop=15, pad=True):
         """vector representation: commands [SOL, ..., SOL, ..., EXT]"""
         profile_vec = self.profile.to_vector(max_n_loops, max_len_loop, pad=False)
@@ -228,6 +279,8 @@ class Extrude(object):
 
 class CADSequence(object):
     """A CAD modeling sequence, a series of extrude operations."""
+    __slots__ = ("seq", "bbox")
+
     def __init__(self, extrude_seq, bbox=None):
         self.seq = extrude_seq
         self.bbox = bbox
@@ -295,6 +348,13 @@ class CADSequence(object):
         for item in self.seq:
             item.numericalize(n)
 
+    def digest(self, decimals=6):
+        """content hash of the whole sequence, see Extrude.digest"""
+        h = hashlib.sha1()
+        for item in self.seq:
+            h.update(item.digest(decimals).encode())
+        return h.hexdigest()
+
     def flip_sketch(self, axis):
         for item in self.seq:
             item.flip_sketch(axis)
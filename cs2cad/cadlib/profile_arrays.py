@@ -0,0 +1,388 @@
+import numpy as np
+from .curves import Line, Arc, Circle
+from .macro import *
+
+# columns of ProfileArrays.geom, fields a curve type doesn't use hold zeros
+START = slice(0, 2)       # lines and arcs
+END = slice(2, 4)         # lines and arcs
+MID = slice(4, 6)         # arcs
+CENTER = slice(6, 8)      # arcs and circles
+REF_VEC = slice(8, 10)    # arcs
+RADIUS = 10               # arcs and circles
+START_ANGLE = 11          # arcs
+END_ANGLE = 12            # arcs
+N_COLUMNS = 13
+
+_POINTS = slice(0, 8) # start, end, mid and center, moved by transform
+
+
+def _close(a, b, rtol=1e-05, atol=1e-08):
+    """np.allclose for two 2D points given as floats"""
+    return abs(a[0] - b[0]) <= atol + rtol * abs(b[0]) and abs(a[1] - b[1]) <= atol + rtol * abs(b[1])
+
+
+def _angles(vec):
+    """angle_from_vector_to_x for (K, 2) unit vectors"""
+    x, y = vec[:, 0], vec[:, 1]
+    return np.where(x >= 0,
+                    np.where(y >= 0, np.arcsin(y), 2.0 * np.pi - np.arcsin(-y)),
+                    np.where(y >= 0, np.pi - np.arcsin(y), np.pi + np.arcsin(-y)))
+
+
+class _Row(object):
+    """a curve while the loop is being reordered, points are plain floats"""
+    __slots__ = ("cmd", "start_point", "end_point", "mid_point", "geom")
+
+    def __init__(self, cmd, start_point, end_point, geom):
+        self.cmd = cmd
+        self.start_point = start_point
+        self.end_point = end_point
+        self.mid_point = None # arcs, set by ProfileArrays.from_dict
+        self.geom = geom # center, radius, start/end angle, ref_vec
+
+    @staticmethod
+    def from_dict(stat):
+        def xy(p):
+            return (p['x'], p['y'])
+
+        if stat['type'] == "Line3D":
+            return _Row(LINE_IDX, xy(stat['start_point']), xy(stat['end_point']), None)
+        elif stat['type'] == "Arc3D":
+            return _Row(ARC_IDX, xy(stat['start_point']), xy(stat['end_point']),
+                        (xy(stat['center_point']), stat['radius'], stat['start_angle'], stat['end_angle'],
+                         xy(stat['reference_vector'])))
+        elif stat['type'] == "Circle3D":
+            center, radius = xy(stat['center_point']), stat['radius']
+            return _Row(CIRCLE_IDX, (center[0] - radius, center[1]), (center[0] + radius, center[1]),
+                        (center, radius, 0.0, 0.0, (0.0, 0.0)))
+        else:
+            raise NotImplementedError("curve type not supported yet: {}".format(stat['type']))
+
+    def reverse(self):
+        if self.cmd != CIRCLE_IDX:
+            self.start_point, self.end_point = self.end_point, self.start_point
+
+    def is_circle(self):
+        return self.cmd == CIRCLE_IDX
+
+    def direction(self, from_start=True):
+        """as Line.direction and Arc.direction"""
+        if self.mid_point is None:
+            a, b = self.start_point, self.end_point
+        elif from_start:
+            a, b = self.start_point, self.mid_point
+        else:
+            a, b = self.mid_point, self.end_point
+        return (b[0] - a[0], b[1] - a[1])
+
+
+def reorder_loop(curves, is_circle):
+    """reorder the curves of a loop by starting left most and counter-clockwise, returns the new list.
+
+    The implementation of Loop.reorder, also run on the _Row of ProfileArrays.from_dict. The curves
+    need start_point, end_point, reverse() and direction(); `is_circle(curve)` is True for circles.
+    """
+    if len(curves) <= 1:
+        return curves
+
+    # correct start-end point order
+    if _close(curves[0].start_point, curves[1].start_point) or _close(curves[0].start_point, curves[1].end_point):
+        curves[0].reverse()
+    for i in range(len(curves) - 1):
+        if _close(curves[i].end_point, curves[i + 1].end_point):
+            curves[i + 1].reverse()
+
+    # find left-most point
+    starts = np.round(np.array([curve.start_point for curve in curves], dtype=float), 6).tolist()
+    start_curve_idx, sx, sy = -1, 10000, 10000
+    for i, (x, y) in enumerate(starts):
+        if x < sx or (x == sx and y < sy):
+            start_curve_idx, sx, sy = i, x, y
+    curves = curves[start_curve_idx:] + curves[:start_curve_idx]
+
+    # ensure mostly counter-clock wise
+    if is_circle(curves[0]) or is_circle(curves[-1]): # FIXME: hard-coded
+        return curves
+    start_vec = curves[0].direction()
+    end_vec = curves[-1].direction(from_start=False)
+    if end_vec[0] * start_vec[1] - end_vec[1] * start_vec[0] <= 0: # np.cross(end_vec, start_vec)
+        for curve in curves:
+            curve.reverse()
+        curves.reverse()
+    return curves
+
+
+class ProfileArrays(object):
+    """Struct-of-arrays storage of a sketch profile, the array side of Profile.
+
+    One row of `geom` (K, N_COLUMNS) per curve, see the column slices above; `cmd` holds
+    the curve commands and `loop` the loop index of each curve (non-decreasing).
+    from_dict, transform, bbox, normalize, numericalize and to_vector are NumPy ops over
+    all curves and give the same results as the Profile/Loop/curve object methods.
+    """
+    __slots__ = ("cmd", "loop", "is_outer", "geom", "is_numerical")
+
+    def __init__(self, cmd, loop, geom, is_outer=None, is_numerical=False):
+        self.cmd = cmd              # (K,) LINE_IDX/ARC_IDX/CIRCLE_IDX
+        self.loop = loop            # (K,) loop index
+        self.geom = geom            # (K, N_COLUMNS) float
+        self.is_outer = is_outer    # (n_loops,) bool, None if unknown
+        self.is_numerical = is_numerical
+
+    def __len__(self):
+        return len(self.cmd)
+
+    def copy(self):
+        is_outer = None if self.is_outer is None else self.is_outer.copy()
+        return ProfileArrays(self.cmd.copy(), self.loop.copy(), self.geom.copy(), is_outer, self.is_numerical)
+
+    @property
+    def n_loops(self):
+        return int(self.loop[-1]) + 1 if len(self.loop) > 0 else 0
+
+    @property
+    def start(self):
+        return self.geom[:, START]
+
+    @property
+    def end(self):
+        return self.geom[:, END]
+
+    @property
+    def mid(self):
+        return self.geom[:, MID]
+
+    @property
+    def center(self):
+        return self.geom[:, CENTER]
+
+    @property
+    def ref_vec(self):
+        return self.geom[:, REF_VEC]
+
+    @property
+    def radius(self):
+        return self.geom[:, RADIUS]
+
+    @staticmethod
+    def from_dict(stat):
+        """construct from json data, curves and loops are reordered as in Profile.from_dict"""
+        all_rows = [[_Row.from_dict(item) for item in loop['profile_curves']] for loop in stat['loops']]
+
+        # arc mid points, as computed by Arc.get_mid_point before any transformation
+        arcs = [row for rows in all_rows for row in rows if row.cmd == ARC_IDX]
+        if len(arcs) > 0:
+            center = np.array([row.geom[0] for row in arcs])
+            radius = np.array([row.geom[1] for row in arcs])
+            mid_angle = (np.array([row.geom[2] for row in arcs]) + np.array([row.geom[3] for row in arcs])) / 2
+            ref_vec = np.array([row.geom[4] for row in arcs])
+            cos, sin = np.cos(mid_angle), np.sin(mid_angle)
+            mid_vec = np.stack([cos * ref_vec[:, 0] - sin * ref_vec[:, 1],
+                                sin * ref_vec[:, 0] + cos * ref_vec[:, 1]], axis=1)
+            for row, p in zip(arcs, (center + mid_vec * radius[:, np.newaxis]).tolist()):
+                row.mid_point = tuple(p)
+
+        all_rows = [reorder_loop(rows, _Row.is_circle) for rows in all_rows]
+        cmd = np.array([row.cmd for rows in all_rows for row in rows], dtype=int)
+        loop = np.repeat(np.arange(len(all_rows)), [len(rows) for rows in all_rows])
+        geom = np.zeros((len(cmd), N_COLUMNS))
+        j = 0
+        for rows in all_rows:
+            for row in rows:
+                if row.cmd != CIRCLE_IDX:
+                    geom[j, START], geom[j, END] = row.start_point, row.end_point
+                if row.cmd == ARC_IDX:
+                    geom[j, MID] = row.mid_point
+                if row.geom is not None:
+                    center, radius, start_angle, end_angle, ref_vec = row.geom
+                    geom[j, CENTER], geom[j, REF_VEC] = center, ref_vec
+                    geom[j, RADIUS], geom[j, START_ANGLE], geom[j, END_ANGLE] = radius, start_angle, end_angle
+                j += 1
+        arrays = ProfileArrays(cmd, loop, geom, np.array([item['is_outer'] for item in stat['loops']], dtype=bool))
+        arrays.reorder()
+        return arrays
+
+    def reorder(self):
+        """Profile.reorder: sort the loops by the lower left corner of their bounding boxes"""
+        n_loops = self.n_loops
+        if n_loops <= 1:
+            return
+        lo, _ = self.curve_bbox()
+        bounds = np.flatnonzero(np.diff(self.loop, prepend=-1))
+        loops_bbox_min = np.minimum.reduceat(lo, bounds, axis=0).round(6)
+        ind = np.lexsort(loops_bbox_min.transpose()[[1, 0]])
+        order = np.concatenate([np.flatnonzero(self.loop == i) for i in ind])
+        rank = np.empty(n_loops, dtype=int)
+        rank[ind] = np.arange(n_loops)
+        self.cmd, self.geom = self.cmd[order], self.geom[order]
+        self.loop = rank[self.loop[order]]
+        if self.is_outer is not None:
+            self.is_outer = self.is_outer[ind]
+
+    def to_curves(self):
+        """build the curve objects, one list per loop, in the types the object methods would leave them"""
+        if self.is_numerical:
+            def point(x):
+                return x.round().astype(int)
+        else:
+            def point(x):
+                return x.copy()
+        all_curves = [[] for _ in range(self.n_loops)]
+        for cmd, loop, row in zip(self.cmd, self.loop, self.geom):
+            if cmd == LINE_IDX:
+                curve = Line(point(row[START]), point(row[END]))
+            elif cmd == ARC_IDX:
+                start_angle, end_angle = row[START_ANGLE], row[END_ANGLE]
+                if self.is_numerical:
+                    start_angle, end_angle = np.array([start_angle, end_angle]).round().astype(int)
+                curve = Arc(point(row[START]), point(row[END]), point(row[CENTER]), row[RADIUS],
+                            start_angle=start_angle, end_angle=end_angle, ref_vec=row[REF_VEC].copy())
+                curve.mid_point = point(row[MID])
+            else:
+                radius = np.round(row[RADIUS]).astype(int) if self.is_numerical else row[RADIUS]
+                curve = Circle(point(row[CENTER]), radius)
+            all_curves[loop].append(curve)
+        return all_curves
+
+    def _starts(self):
+        """(K, 2) start point of every curve, circles start at their left most point"""
+        starts = self.start.copy()
+        is_circle = self.cmd == CIRCLE_IDX
+        starts[is_circle, 0] = self.center[is_circle, 0] - self.radius[is_circle]
+        starts[is_circle, 1] = self.center[is_circle, 1]
+        return starts
+
+    @property
+    def start_point(self):
+        return self._starts()[0]
+
+    @property
+    def end_point(self):
+        if self.cmd[-1] == CIRCLE_IDX:
+            return np.array([self.center[-1, 0] + self.radius[-1], self.center[-1, 1]])
+        return self.end[-1].copy()
+
+    def curve_bbox(self, eps=1e-8):
+        """(K, 2) lower and upper corners of every curve, same as the curve bbox properties"""
+        lo = np.minimum(self.start, self.end)
+        hi = np.maximum(self.start, self.end)
+
+        is_circle = self.cmd == CIRCLE_IDX
+        r = self.radius[:, np.newaxis]
+        lo[is_circle] = (self.center - r)[is_circle]
+        hi[is_circle] = (self.center + r)[is_circle]
+
+        is_arc = self.cmd == ARC_IDX
+        if np.any(is_arc):
+            # same quadrant tests as Arc.get_angles_counterclockwise and Arc.bbox
+            def angle(points):
+                vec = points[is_arc] - self.center[is_arc]
+                return _angles(vec / (np.linalg.norm(vec, axis=1, keepdims=True) + eps))
+
+            a_s, a_m, a_e = angle(self.start), angle(self.mid), angle(self.end)
+            a_s, a_e = np.minimum(a_s, a_e), np.maximum(a_s, a_e)
+            wrap = ~((a_s < a_m) & (a_m < a_e))
+            a_s, a_e = np.where(wrap, a_e - np.pi * 2, a_s), np.where(wrap, a_s, a_e)
+
+            def crosses(*angles):
+                hit = np.zeros(len(self), dtype=bool)
+                hit[is_arc] = np.any([(a_s < a) & (a < a_e) for a in angles], axis=0)
+                return hit
+
+            cx, cy, rad = self.center[:, 0], self.center[:, 1], self.radius
+            hit = crosses(0)
+            hi[hit, 0] = np.maximum(hi[hit, 0], (cx + rad)[hit])
+            hit = crosses(np.pi / 2, -np.pi / 2 * 3)
+            hi[hit, 1] = np.maximum(hi[hit, 1], (cy + rad)[hit])
+            hit = crosses(np.pi, -np.pi)
+            lo[hit, 0] = np.minimum(lo[hit, 0], (cx - rad)[hit])
+            hit = crosses(np.pi / 2 * 3, -np.pi / 2)
+            lo[hit, 1] = np.minimum(lo[hit, 1], (cy - rad)[hit])
+        return lo, hi
+
+    @property
+    def bbox(self):
+        """compute bounding box (min/max points) of all curves"""
+        lo, hi = self.curve_bbox()
+        return np.stack([lo.min(axis=0), hi.max(axis=0)], axis=0)
+
+    @property
+    def bbox_size(self):
+        """compute bounding box size (max of height and width)"""
+        return np.max(np.abs(self.bbox - self.start_point[np.newaxis]))
+
+    def transform(self, translate, scale):
+        """linear transformation, the curve values are floats afterwards as with the curve objects"""
+        points = self.geom[:, _POINTS].reshape(-1, 4, 2)
+        self.geom[:, _POINTS] = ((points + translate) * scale).reshape(-1, 8)
+        if np.ndim(scale) == 0:
+            is_arc = self.cmd == ARC_IDX
+            self.geom[:, RADIUS] = np.where(is_arc, np.abs(self.radius * scale), self.radius * scale)
+        self.is_numerical = False
+
+    def normalize(self, size=256):
+        """normalize within the given size, with start_point in the middle center"""
+        scale = (size / 2 * NORM_FACTOR - 1) / self.bbox_size
+        self.transform(-self.start_point, scale)
+        self.transform(np.array((size / 2, size / 2)), 1)
+
+    def denormalize(self, bbox_size, size=256):
+        """inverse procedure of normalize method"""
+        scale = bbox_size / (size / 2 * NORM_FACTOR - 1)
+        self.transform(-np.array((size / 2, size / 2)), scale)
+
+    def numericalize(self, n=256):
+        """quantize curve parameters into integers"""
+        self.geom[:, _POINTS] = self.geom[:, _POINTS].round().clip(min=0, max=n-1)
+        is_circle = self.cmd == CIRCLE_IDX
+        self.geom[is_circle, RADIUS] = np.round(self.geom[is_circle, RADIUS]).clip(min=1, max=n-1)
+        is_arc = self.cmd == ARC_IDX
+        angles = self.geom[is_arc][:, [START_ANGLE, END_ANGLE]]
+        self.geom[np.ix_(is_arc, [START_ANGLE, END_ANGLE])] = (angles / (2 * np.pi) * n).round().clip(min=0, max=n-1)
+        self.is_numerical = True
+
+    def digest_params(self):
+        """the per curve values of Extrude.digest, a -1 before every loop"""
+        params = []
+        last_loop = -1
+        for cmd, loop, row in zip(self.cmd.tolist(), self.loop.tolist(), self.geom.tolist()):
+            if loop != last_loop:
+                params.append(-1)
+                last_loop = loop
+            if cmd == LINE_IDX:
+                params.extend([LINE_IDX, *row[START], *row[END]])
+            elif cmd == ARC_IDX:
+                params.extend([ARC_IDX, *row[START], *row[MID], *row[END]])
+            else:
+                params.extend([CIRCLE_IDX, *row[CENTER], row[RADIUS]])
+        return params
+
+    def to_vector(self, max_n_loops=None, max_len_loop=None, pad=True):
+        """same output as Profile.to_vector"""
+        n_loops, k = self.n_loops, len(self)
+        loop_len = np.bincount(self.loop, minlength=n_loops) + 1 # with SOL
+        if max_n_loops is not None and n_loops > max_n_loops:
+            return None
+        if max_len_loop is not None and np.any(loop_len > max_len_loop):
+            return None
+
+        total = k + n_loops + 1
+        if pad:
+            total = max(total, max_n_loops * max_len_loop)
+        vec = np.full((total, 1 + N_ARGS), PAD_VAL, dtype=int if self.is_numerical else float)
+        vec[:, 0] = EOS_IDX
+        sol_pos = np.concatenate([[0], np.cumsum(loop_len)[:-1]])
+        vec[sol_pos, 0] = SOL_IDX
+
+        pos = np.arange(k) + self.loop + 1
+        vec[pos, 0] = self.cmd
+        is_circle = self.cmd == CIRCLE_IDX
+        vec[pos, 1:3] = np.where(is_circle[:, np.newaxis], self.center, self.end)
+        vec[pos[is_circle], 5] = self.radius[is_circle]
+
+        is_arc = self.cmd == ARC_IDX
+        sweep = np.abs(self.geom[:, START_ANGLE] - self.geom[:, END_ANGLE])
+        vec[pos[is_arc], 3] = np.maximum(sweep, 1)[is_arc]
+        s2m, s2e = self.mid - self.start, self.end - self.start
+        vec[pos[is_arc], 4] = ((s2m[:, 0] * s2e[:, 1] - s2m[:, 1] * s2e[:, 0]) >= 0)[is_arc]
+        return vec
@@ -4,11 +4,14 @@ matplotlib.use('TkAgg')
 import matplotlib.pyplot as plt
 from .curves import *
 from .macro import *
+from .profile_arrays import ProfileArrays, reorder_loop
 
 
 ##########################   base  ###########################
 class SketchBase(object):
     """Base class for sketch (a collection of curves). """
+    __slots__ = ("children",)
+
     def __init__(self, children, reorder=True):
         self.children = children
 
@@ -117,6 +120,8 @@ class SketchBase(object):
 ####################### loop & profile #######################
 class Loop(SketchBase):
     """Sketch loop, a sequence of connected curves."""
+    __slots__ = ("is_outer",)
+
     @staticmethod
     def from_dict(stat):
         all_curves = [construct_curve_from_dict(item) for item in stat['profile_curves']]
@@ -150,37 +155,7 @@ class Loop(SketchBase):
 
     def reorder(self):
         """reorder by starting left most and counter-clockwise"""
-        if len(self.children) <= 1:
-            return
-
-        start_curve_idx = -1
-        sx, sy = 10000, 10000
-
-        # correct start-end point order
-        if np.allclose(self.children[0].start_point, self.children[1].start_point) or \
-            np.allclose(self.children[0].start_point, self.children[1].end_point):
-            self.children[0].reverse()
-
-        # correct start-end point order and find left-most point
-        for i, curve in enumerate(self.children):
-            if i < len(self.children) - 1 and np.allclose(curve.end_point, self.children[i + 1].end_point):
-                self.children[i + 1].reverse()
-            if round(curve.start_point[0], 6) < round(sx, 6) or \
-                    (round(curve.start_point[0], 6) == round(sx, 6) and round(curve.start_point[1], 6) < round(sy, 6)):
-                start_curve_idx = i
-                sx, sy = curve.start_point
-
-        self.children = self.children[start_curve_idx:] + self.children[:start_curve_idx]
-
-        # ensure mostly counter-clock wise
-        if isinstance(self.children[0], Circle) or isinstance(self.children[-1], Circle): # FIXME: hard-coded
-            return
-        start_vec = self.children[0].direction()
-        end_vec = self.children[-1].direction(from_start=False)
-        if np.cross(end_vec, start_vec) <= 0:
-            for curve in self.children:
-                curve.reverse()
-            self.children.reverse()
+        self.children = reorder_loop(self.children, lambda curve: isinstance(curve, Circle))
 
     def to_vector(self, max_len=None, add_sol=True, add_eos=True):
         loop_vec = np.stack([curve.to_vector() for curve in self.children], axis=0)
@@ -210,14 +185,67 @@ class Loop(SketchBase):
 
 class Profile(SketchBase):
     """Sketch profile，a closed region formed by one or more loops. 
-    The outer-most loop is placed at first."""
+    The outer-most loop is placed at first.
+    A profile read from json keeps its curves in a ProfileArrays; the Loop and curve
+    objects are only built when `children` is first used."""
+    __slots__ = ("_children", "_arrays")
+
+    def __init__(self, children, reorder=True):
+        self._arrays = None
+        super(Profile, self).__init__(children, reorder)
+
+    @staticmethod
+    def from_arrays(arrays):
+        profile = Profile.__new__(Profile)
+        profile._children = None
+        profile._arrays = arrays
+        return profile
+
     @staticmethod
     def from_dict(stat):
-        all_loops = [Loop.from_dict(item) for item in stat['loops']]
-        return Profile(all_loops)
+        return Profile.from_arrays(ProfileArrays.from_dict(stat))
+
+    @property
+    def arrays(self):
+        """the ProfileArrays holding the curves, None once the curve objects are built"""
+        return self._arrays
+
+    @property
+    def children(self):
+        if self._arrays is not None:
+            self._children = self._build_loops(self._arrays)
+            self._arrays = None
+        return self._children
+
+    @children.setter
+    def children(self, children):
+        self._children = children
+        self._arrays = None
+
+    @staticmethod
+    def _build_loops(arrays):
+        all_loops = []
+        for is_outer, curves in zip(arrays.is_outer, arrays.to_curves()):
+            loop = Loop(curves, reorder=False)
+            loop.is_outer = bool(is_outer)
+            all_loops.append(loop)
+        return all_loops
+
+    def __copy__(self):
+        if self._arrays is not None:
+            return Profile.from_arrays(self._arrays.copy())
+        return Profile(self._children, reorder=False)
+
+    def __getstate__(self):
+        return {"_children": self._children, "_arrays": self._arrays}
+
+    def __setstate__(self, state):
+        self._children = state["_children"]
+        self._arrays = state["_arrays"]
 
     def __str__(self):
-        return "Profile:" + "\n    -".join([str(loop) for loop in self.children])
+        all_loops = self.children if self._arrays is None else self._build_loops(self._arrays)
+        return "Profile:" + "\n    -".join([str(loop) for loop in all_loops])
 
     @staticmethod
     def from_vector(vec, start_point=None, is_numerical=True):
@@ -233,18 +261,53 @@ class Profile(SketchBase):
         return Profile(all_loops)
 
     def reorder(self):
+        if self._arrays is not None:
+            self._arrays.reorder()
+            return
         if len(self.children) <= 1:
             return
         all_loops_bbox_min = np.stack([loop.bbox[0] for loop in self.children], axis=0).round(6)
         ind = np.lexsort(all_loops_bbox_min.transpose()[[1, 0]])
         self.children = [self.children[i] for i in ind]
 
+    @property
+    def start_point(self):
+        if self._arrays is not None:
+            return self._arrays.start_point
+        return self.children[0].start_point
+
+    @property
+    def end_point(self):
+        if self._arrays is not None:
+            return self._arrays.end_point
+        return self.children[-1].end_point
+
+    @property
+    def bbox(self):
+        if self._arrays is not None:
+            return self._arrays.bbox
+        return super(Profile, self).bbox
+
+    def transform(self, translate, scale):
+        if self._arrays is not None and np.ndim(scale) == 0:
+            self._arrays.transform(translate, scale)
+        else:
+            super(Profile, self).transform(translate, scale)
+
+    def numericalize(self, n=256):
+        if self._arrays is not None:
+            self._arrays.numericalize(n)
+        else:
+            super(Profile, self).numericalize(n)
+
     def draw(self, ax):
         for i, loop in enumerate(self.children):
             loop.draw(ax)
             ax.text(loop.start_point[0], loop.start_point[1], str(i))
 
     def to_vector(self, max_n_loops=None, max_len_loop=None, pad=True):
+        if self._arrays is not None:
+            return self._arrays.to_vector(max_n_loops, max_len_loop, pad)
         loop_vecs = [loop.to_vector(None, add_eos=False) for loop in self.children]
         if max_n_loops is not None and len(loop_vecs) > max_n_loops:
             return None
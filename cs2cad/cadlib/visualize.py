@@ -3,17 +3,19 @@ from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeEdge, BRepBuilderAPI_Mak
 from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakePrism
 from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse, BRepAlgoAPI_Common
 from OCC.Core.GC import GC_MakeArcOfCircle
-from OCC.Extend.DataExchange import write_stl_file
+from OCC.Core.TopTools import TopTools_ListOfShape
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopAbs import TopAbs_REVERSED
+from OCC.Extend.TopologyUtils import TopologyExplorer
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
 from copy import copy
+from collections import OrderedDict
 from .extrude import *
 from .sketch import Loop, Profile
 from .curves import *
-import os
-import trimesh
-from trimesh.sample import sample_surface
-import random
 
 
 def vec2CADsolid(vec, is_numerical=True, n=256):
@@ -22,31 +24,180 @@ def vec2CADsolid(vec, is_numerical=True, n=256):
     return cad
 
 
-def create_CAD(cad_seq: CADSequence):
-    """create a 3D CAD model from CADSequence. Only support extrude with boolean operation."""
-    body = create_by_extrude(cad_seq.seq[0])
-    for extrude_op in cad_seq.seq[1:]:
-        new_body = create_by_extrude(extrude_op)
-        if extrude_op.operation == EXTRUDE_OPERATIONS.index("NewBodyFeatureOperation") or \
-                extrude_op.operation == EXTRUDE_OPERATIONS.index("JoinFeatureOperation"):
-            body = BRepAlgoAPI_Fuse(body, new_body).Shape()
-        elif extrude_op.operation == EXTRUDE_OPERATIONS.index("CutFeatureOperation"):
-            body = BRepAlgoAPI_Cut(body, new_body).Shape()
-        elif extrude_op.operation == EXTRUDE_OPERATIONS.index("IntersectFeatureOperation"):
-            body = BRepAlgoAPI_Common(body, new_body).Shape()
+class PrefixShapeCache(object):
+    """Cache of intermediate solids built by create_CAD, keyed by sequence prefix.
+    A trie over Extrude.digest() values, so sequences sharing their first k extrudes
+    resume from the cached k-th body. Least recently used bodies are evicted once
+    more than max_shapes are held."""
+    def __init__(self, max_shapes=256):
+        self.max_shapes = max_shapes
+        self.root = {"children": {}, "shape": None}
+        self._lru = OrderedDict() # prefix (tuple of digests) -> trie node holding a shape
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._lru)
+
+    def lookup(self, digests):
+        """find the longest cached prefix of digests.
+
+        Returns:
+            (int, TopoDS_Shape): prefix length and its body, (0, None) if nothing is cached
+        """
+        node, n_done, shape = self.root, 0, None
+        for i, key in enumerate(digests):
+            node = node["children"].get(key)
+            if node is None:
+                break
+            if node["shape"] is not None:
+                n_done, shape = i + 1, node["shape"]
+        if shape is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._lru.move_to_end(tuple(digests[:n_done]))
+        return n_done, shape
+
+    def insert(self, prefix, shape):
+        prefix = tuple(prefix)
+        node = self.root
+        for key in prefix:
+            node = node["children"].setdefault(key, {"children": {}, "shape": None})
+        node["shape"] = shape
+        self._lru[prefix] = node
+        self._lru.move_to_end(prefix)
+        while len(self._lru) > self.max_shapes:
+            self._evict(*self._lru.popitem(last=False))
+
+    def _evict(self, prefix, node):
+        node["shape"] = None
+        # prune trie branches that no longer hold any shape
+        path = [self.root]
+        for key in prefix:
+            path.append(path[-1]["children"][key])
+        for i in range(len(prefix), 0, -1):
+            if path[i]["shape"] is not None or path[i]["children"]:
+                break
+            del path[i - 1]["children"][prefix[i - 1]]
+
+    def clear(self):
+        self.root = {"children": {}, "shape": None}
+        self._lru.clear()
+
+
+FUSE_MODES = ["linear", "tree", "multi"]
+
+
+def is_fuse_operation(operation):
+    return operation == EXTRUDE_OPERATIONS.index("NewBodyFeatureOperation") or \
+        operation == EXTRUDE_OPERATIONS.index("JoinFeatureOperation")
+
+
+def apply_boolean(body, new_body, operation):
+    """combine the current body with a new extruded body by the extrude operation"""
+    if is_fuse_operation(operation):
+        body = BRepAlgoAPI_Fuse(body, new_body).Shape()
+    elif operation == EXTRUDE_OPERATIONS.index("CutFeatureOperation"):
+        body = BRepAlgoAPI_Cut(body, new_body).Shape()
+    elif operation == EXTRUDE_OPERATIONS.index("IntersectFeatureOperation"):
+        body = BRepAlgoAPI_Common(body, new_body).Shape()
     return body
 
 
-def create_by_extrude(extrude_op: Extrude):
-    """create a solid body from Extrude instance."""
+def fuse_many(shapes, mode="tree"):
+    """fuse a list of shapes into one body.
+
+    Args:
+        shapes (list): TopoDS_Shape to be fused
+        mode (str): "linear" folds left to right, "tree" fuses pairwise as a balanced tree,
+            "multi" runs a single multi-argument BRepAlgoAPI_Fuse
+    """
+    if len(shapes) == 1:
+        return shapes[0]
+    if mode == "linear":
+        body = shapes[0]
+        for shape in shapes[1:]:
+            body = BRepAlgoAPI_Fuse(body, shape).Shape()
+        return body
+    elif mode == "tree":
+        while len(shapes) > 1:
+            fused = [BRepAlgoAPI_Fuse(shapes[i], shapes[i + 1]).Shape() for i in range(0, len(shapes) - 1, 2)]
+            if len(shapes) % 2 == 1:
+                fused.append(shapes[-1])
+            shapes = fused
+        return shapes[0]
+    elif mode == "multi":
+        arguments, tools = TopTools_ListOfShape(), TopTools_ListOfShape()
+        arguments.Append(shapes[0])
+        for shape in shapes[1:]:
+            tools.Append(shape)
+        builder = BRepAlgoAPI_Fuse()
+        builder.SetArguments(arguments)
+        builder.SetTools(tools)
+        builder.Build()
+        if not builder.IsDone():
+            raise RuntimeError("multi-argument fuse failed")
+        return builder.Shape()
+    else:
+        raise ValueError("fuse mode = {}".format(mode))
+
+
+def create_CAD(cad_seq: CADSequence, cache: PrefixShapeCache = None, fuse_mode="linear"):
+    """create a 3D CAD model from CADSequence. Only support extrude with boolean operation.
+
+    Args:
+        cad_seq (CADSequence): the sequence to build
+        cache (PrefixShapeCache, optional): resume from the longest already built prefix of the sequence
+        fuse_mode (str, optional): one of FUSE_MODES. Other than "linear", consecutive NewBody/Join
+            extrudes are fused together by fuse_many before being merged, Cut and Intersect keep their order.
+    """
+    seq = cad_seq.seq
+    digests = [extrude_op.digest() for extrude_op in seq] if cache is not None else None
+
+    n_done, body = cache.lookup(digests) if cache is not None else (0, None)
+    i = n_done
+    while i < len(seq):
+        j = i + 1
+        if fuse_mode != "linear" and (body is None or is_fuse_operation(seq[i].operation)):
+            while j < len(seq) and is_fuse_operation(seq[j].operation):
+                j += 1
+            shapes = [create_by_extrude(extrude_op) for extrude_op in seq[i:j]]
+            body = fuse_many(shapes if body is None else [body] + shapes, fuse_mode)
+        elif body is None:
+            body = create_by_extrude(seq[i])
+        else:
+            body = apply_boolean(body, create_by_extrude(seq[i]), seq[i].operation)
+        if cache is not None:
+            cache.insert(digests[:j], body)
+        i = j
+    return body
+
+
+def create_by_extrude(extrude_op: Extrude, single_prism=True):
+    """create a solid body from Extrude instance.
+
+    Symmetric and two-sided extrudes cover one contiguous interval along the normal, so with
+    single_prism they are swept as one prism from the offset face instead of fusing two prisms.
+    """
     profile = copy(extrude_op.profile) # use copy to prevent changing extrude_op internally
     profile.denormalize(extrude_op.sketch_size)
 
     sketch_plane = copy(extrude_op.sketch_plane)
     sketch_plane.origin = extrude_op.sketch_pos
 
-    face = create_profile_face(profile, sketch_plane)
     normal = gp_Dir(*extrude_op.sketch_plane.normal)
+    if single_prism and extrude_op.extent_type != EXTENT_TYPE.index("OneSideFeatureExtentType"):
+        if extrude_op.extent_type == EXTENT_TYPE.index("SymmetricFeatureExtentType"):
+            start, end = -abs(extrude_op.extent_one), abs(extrude_op.extent_one)
+        else:
+            start = min(0.0, extrude_op.extent_one, -extrude_op.extent_two)
+            end = max(0.0, extrude_op.extent_one, -extrude_op.extent_two)
+        sketch_plane.origin = extrude_op.sketch_pos + start * extrude_op.sketch_plane.normal
+        face = create_profile_face(profile, sketch_plane)
+        return BRepPrimAPI_MakePrism(face, gp_Vec(normal).Multiplied(end - start)).Shape()
+
+    face = create_profile_face(profile, sketch_plane)
     ext_vec = gp_Vec(normal).Multiplied(extrude_op.extent_one)
     body = BRepPrimAPI_MakePrism(face, ext_vec).Shape()
     if extrude_op.extent_type == EXTENT_TYPE.index("SymmetricFeatureExtentType"):
@@ -73,36 +224,49 @@ def create_profile_face(profile: Profile, sketch_plane: CoordSystem):
     return topo_face.Face()
 
 
+def _curve_local_points(curve: CurveBase):
+    """points of a curve in sketch plane coordinates that create_edge_3d maps to 3D"""
+    if isinstance(curve, Line):
+        return np.stack([curve.start_point, curve.end_point], axis=0)
+    elif isinstance(curve, Circle):
+        return np.asarray(curve.center)[np.newaxis]
+    elif isinstance(curve, Arc):
+        return np.stack([curve.start_point, curve.mid_point, curve.end_point], axis=0)
+    else:
+        raise NotImplementedError(type(curve))
+
+
 def create_loop_3d(loop: Loop, sketch_plane: CoordSystem):
     """create a 3D sketch loop"""
+    local_points = [_curve_local_points(curve) for curve in loop.children]
+    global_points = point_local2global(np.concatenate(local_points, axis=0), sketch_plane, to_gp_Pnt=False)
+    offsets = np.cumsum([0] + [len(points) for points in local_points])
+
     topo_wire = BRepBuilderAPI_MakeWire()
-    for curve in loop.children:
-        topo_edge = create_edge_3d(curve, sketch_plane)
+    for i, curve in enumerate(loop.children):
+        topo_edge = create_edge_3d(curve, sketch_plane, global_points[offsets[i]:offsets[i + 1]])
         if topo_edge == -1: # omitted
             continue
         topo_wire.Add(topo_edge)
     return topo_wire.Wire()
 
 
-def create_edge_3d(curve: CurveBase, sketch_plane: CoordSystem):
-    """create a 3D edge"""
+def create_edge_3d(curve: CurveBase, sketch_plane: CoordSystem, global_points=None):
+    """create a 3D edge. global_points optionally holds the curve points already mapped to 3D"""
+    if global_points is None:
+        global_points = point_local2global(_curve_local_points(curve), sketch_plane, to_gp_Pnt=False)
+    points = [gp_Pnt(*p) for p in global_points]
     if isinstance(curve, Line):
         if np.allclose(curve.start_point, curve.end_point):
             return -1
-        start_point = point_local2global(curve.start_point, sketch_plane)
-        end_point = point_local2global(curve.end_point, sketch_plane)
-        topo_edge = BRepBuilderAPI_MakeEdge(start_point, end_point)
+        topo_edge = BRepBuilderAPI_MakeEdge(points[0], points[1])
     elif isinstance(curve, Circle):
-        center = point_local2global(curve.center, sketch_plane)
         axis = gp_Dir(*sketch_plane.normal)
-        gp_circle = gp_Circ(gp_Ax2(center, axis), abs(float(curve.radius)))
+        gp_circle = gp_Circ(gp_Ax2(points[0], axis), abs(float(curve.radius)))
         topo_edge = BRepBuilderAPI_MakeEdge(gp_circle)
     elif isinstance(curve, Arc):
         # print(curve.start_point, curve.mid_point, curve.end_point)
-        start_point = point_local2global(curve.start_point, sketch_plane)
-        mid_point = point_local2global(curve.mid_point, sketch_plane)
-        end_point = point_local2global(curve.end_point, sketch_plane)
-        arc = GC_MakeArcOfCircle(start_point, mid_point, end_point).Value()
+        arc = GC_MakeArcOfCircle(points[0], points[1], points[2]).Value()
         topo_edge = BRepBuilderAPI_MakeEdge(arc)
     else:
         raise NotImplementedError(type(curve))
@@ -110,24 +274,104 @@ def create_edge_3d(curve: CurveBase, sketch_plane: CoordSystem):
 
 
 def point_local2global(point, sketch_plane: CoordSystem, to_gp_Pnt=True):
-    """convert point in sketch plane local coordinates to global coordinates"""
-    g_point = point[0] * sketch_plane.x_axis + point[1] * sketch_plane.y_axis + sketch_plane.origin
+    """convert point(s) in sketch plane local coordinates to global coordinates.
+    point can be (2,) or (N, 2), the latter is mapped in one matmul"""
+    g_point = sketch_plane.local2global(point)
     if to_gp_Pnt:
+        if g_point.ndim == 2:
+            return [gp_Pnt(*p) for p in g_point]
         return gp_Pnt(*g_point)
     return g_point
 
 
-def CADsolid2pc(shape, n_points, name=None):
-    """convert opencascade solid to point clouds"""
+def shape2mesh(shape, linear_deflection=0.9, angular_deflection=0.5):
+    """triangulate an opencascade shape in memory, with the deflections write_stl_file uses.
+
+    Returns:
+        vertices (np.array): (V, 3) float64
+        triangles (np.array): (T, 3) int64 vertex indices, oriented as their B-rep face
+        face_ids (np.array): (T,) int64 index of the B-rep face each triangle comes from
+    """
+    BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True)
+    vertices, triangles, face_ids = [], [], []
+    n_vertices = 0
+    for i, face in enumerate(TopologyExplorer(shape).faces()):
+        loc = TopLoc_Location()
+        poly = BRep_Tool.Triangulation(face, loc)
+        if poly is None or poly.IsNull():
+            continue
+        trsf = loc.Transformation()
+        nodes = np.array([poly.Node(j).Transformed(trsf).Coord() for j in range(1, poly.NbNodes() + 1)])
+        tris = np.array([poly.Triangle(j).Get() for j in range(1, poly.NbTriangles() + 1)], dtype=np.int64)
+        tris += n_vertices - 1 # 1-based, per face
+        if face.Orientation() == TopAbs_REVERSED:
+            tris = tris[:, [0, 2, 1]]
+        vertices.append(nodes)
+        triangles.append(tris)
+        face_ids.append(np.full(len(tris), i, dtype=np.int64))
+        n_vertices += len(nodes)
+    if len(triangles) == 0:
+        raise ValueError("shape has no triangulation")
+    return np.concatenate(vertices, axis=0), np.concatenate(triangles, axis=0), np.concatenate(face_ids)
+
+
+def sample_mesh(vertices, triangles, n_points, face_ids=None, rng=None):
+    """draw n_points uniformly from the surface of a triangle mesh, all at once.
+    Triangles are picked by area through one searchsorted over the cumulative areas,
+    so the cost is linear in n_points and the number of triangles.
+
+    Args:
+        vertices (np.array): (V, 3)
+        triangles (np.array): (T, 3) vertex indices
+        n_points (int): number of points
+        face_ids (np.array, optional): (T,) id of each triangle, e.g. the B-rep face from shape2mesh
+        rng (optional): np.random.Generator, the global np.random state if None
+
+    Returns:
+        points (np.array): (n_points, 3)
+        normals (np.array): (n_points, 3) unit normals of the sampled triangles
+        point_face_ids (np.array): (n_points,) face_ids of the sampled triangles, None without face_ids
+    """
+    rng = np.random if rng is None else rng
+    corners = vertices[triangles]
+    origin = corners[:, 0]
+    edge_1 = corners[:, 1] - origin
+    edge_2 = corners[:, 2] - origin
+    cross = np.cross(edge_1, edge_2)
+    double_area = np.linalg.norm(cross, axis=1)
+    cum_area = np.cumsum(double_area)
+    if len(cum_area) == 0 or cum_area[-1] <= 0:
+        raise ValueError("mesh has no area")
+    # side="right" never lands on a zero-area triangle; a draw rounded up to the total area
+    # would land past the end and goes to the last triangle with an area instead
+    tri_idx = np.searchsorted(cum_area, rng.random(n_points) * cum_area[-1], side="right")
+    tri_idx = np.minimum(tri_idx, np.flatnonzero(double_area)[-1])
+
+    # uniform barycentric coordinates, points beyond the diagonal are folded back
+    uv = rng.random((n_points, 2))
+    outside = uv.sum(axis=1) > 1
+    uv[outside] = 1 - uv[outside]
+    points = origin[tri_idx] + uv[:, :1] * edge_1[tri_idx] + uv[:, 1:] * edge_2[tri_idx]
+    normals = cross[tri_idx] / double_area[tri_idx, np.newaxis]
+    point_face_ids = None if face_ids is None else np.asarray(face_ids)[tri_idx]
+    return points, normals, point_face_ids
+
+
+def CADsolid2pc(shape, n_points, name=None, with_normal=False, with_face_id=False):
+    """convert opencascade solid to point clouds. name is unused, the mesh never touches the disk
+
+    Returns:
+        out_pc (np.array): (n_points, 3), or a tuple (out_pc, normals, face_ids) with
+            the (n_points, 3) unit normals and the (n_points,) B-rep face index of each point
+            for with_normal and with_face_id respectively
+    """
     bbox = Bnd_Box()
     brepbndlib_Add(shape, bbox)
     if bbox.IsVoid():
         raise ValueError("box check failed")
 
-    if name is None:
-        name = random.randint(100000, 999999)
-    write_stl_file(shape, "tmp_out_{}.stl".format(name))
-    out_mesh = trimesh.load("tmp_out_{}.stl".format(name))
-    os.system("rm tmp_out_{}.stl".format(name))
-    out_pc, _ = sample_surface(out_mesh, n_points)
-    return out_pc
+    vertices, triangles, face_ids = shape2mesh(shape)
+    out_pc, normals, point_face_ids = sample_mesh(vertices, triangles, n_points, face_ids)
+    if not with_normal and not with_face_id:
+        return out_pc
+    return (out_pc,) + ((normals,) if with_normal else ()) + ((point_face_ids,) if with_face_id else ())
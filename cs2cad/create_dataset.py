@@ -1,19 +1,23 @@
-import numpy as np
 from typing import Sequence
 
 from joblib import Parallel, delayed
 
-from cs2cad import cs2cad
+from cs2cad import cs2cad_many
 from cs2cad.onshape_parser.my_client import MyClient
 from cs2cad.onshape_parser import process_many, ParsingStatistic
 
 
-def create_dataset(query: str, limit: int = 200) -> tuple[ParsingStatistic, int]:
+def create_dataset(
+    query: str, limit: int = 200, n_workers: int = -1
+) -> tuple[ParsingStatistic, int]:
     file_path = MyClient(logging=False).query2yml(query=query, limit=limit)
     json_path, st = process_many(file_path)
-    cs2cad_error = int(np.sum(
-        np.array([cs2cad(file, json_path) for file in json_path.iterdir()]) == False
-    ))
+
+    cs2cad_error = 0
+    for res in cs2cad_many(json_path.glob("*.json"), json_path, n_workers=n_workers):
+        if not res.ok:
+            print(f"cs2cad ERROR: {res}")
+            cs2cad_error += 1
 
     return st, cs2cad_error
 
@@ -21,11 +25,12 @@ def create_dataset(query: str, limit: int = 200) -> tuple[ParsingStatistic, int]
 def create_datasets(queries: Sequence[tuple[str, int] | str], n_jobs: int = -1):
     func_list = []
 
+    # the queries already run in parallel, convert each one's models in its own process
     for query in queries:
         if isinstance(query, str):
-            func_list.append(delayed(create_dataset)(query))
+            func_list.append(delayed(create_dataset)(query, n_workers=1))
         else:
-            func_list.append(delayed(create_dataset)(query[0], query[1]))
+            func_list.append(delayed(create_dataset)(query[0], query[1], n_workers=1))
 
     results = Parallel(n_jobs, verbose=2)(func_list)
 
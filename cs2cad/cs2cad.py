@@ -1,23 +1,53 @@
 import os
 import json
+import time
 from pathlib import Path
-from typing import Literal
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Literal
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 from OCC.Extend.DataExchange import write_step_file
 
 from cs2cad.cadlib.extrude import CADSequence
 from cs2cad.cadlib.visualize import create_CAD
+from cs2cad.step_cache import StepCache
 
 from terminal_app.env import PROJECT_CONFIG
 from terminal_app.naming import generate_path
 
 
-def cs2cad(
+@dataclass
+class ConversionResult:
+    """Outcome of converting one CAD sequence into a STEP file.
+
+    `stage` is the last stage reached: "load", "parse", "create", "write",
+    "skip" (file already exists in "continue" mode), "cache" (served from
+    the STEP cache) or "done".
+    """
+
+    name: str
+    ok: bool
+    stage: str
+    error: str | None = None
+    time: float = 0.0
+    save_file: Path | None = None
+
+    def __str__(self) -> str:
+        status = "ok" if self.ok else "failed"
+        s = "{}: {} at {} ({:.3f}s)".format(self.name, status, self.stage, self.time)
+        if self.error is not None:
+            s += ", {}".format(self.error)
+        return s
+
+
+def _convert(
     json_file: Path | str | dict,
     save_path: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
     name: str | None = None,
     mode: Literal["new", "replace", "continue"] = "continue",
-) -> bool:
+    cache: StepCache | Path | str | None = None,
+) -> ConversionResult:
+    start = time.perf_counter()
     naming: bool = name is None
     name = "cs2cad" if name is None else name
 
@@ -27,8 +57,21 @@ def cs2cad(
     if isinstance(save_path, str):
         save_path = Path(save_path)
 
+    if cache is not None and not isinstance(cache, StepCache):
+        cache = StepCache(cache)
+
     assert not save_path.suffix, "cs2cad ERROR: save_path should be dir"
 
+    def result(ok: bool, stage: str, error: Exception | None = None, save_file=None):
+        return ConversionResult(
+            name=name,
+            ok=ok,
+            stage=stage,
+            error=None if error is None else "{}: {}".format(type(error).__name__, error),
+            time=time.perf_counter() - start,
+            save_file=save_file,
+        )
+
     if isinstance(json_file, Path):
         if naming:
             name = Path(json_file).stem
@@ -37,8 +80,7 @@ def cs2cad(
             with open(json_file, "r") as f:
                 data = json.load(f)
         except Exception as ex:
-            print(f"cs2cad ERROR: {json_file}, {ex}")
-            return False
+            return result(False, "load", ex)
     else:
         data = json_file
 
@@ -47,21 +89,101 @@ def cs2cad(
     match mode:
         case "continue":
             if save_file.exists():
-                return True
+                return result(True, "skip", save_file=save_file)
         case "new":
             save_file = generate_path(save_file, create=False)
 
     try:
         cad_seq = CADSequence.from_dict(data)
         cad_seq.normalize()
+    except Exception as ex:
+        return result(False, "parse", ex)
+
+    key = None
+    if cache is not None:
+        try:
+            key = cache.key(cad_seq)
+            if cache.get(key, save_file):
+                return result(True, "cache", save_file=save_file)
+        except Exception as ex:
+            return result(False, "cache", ex)
+
+    try:
         out_shape = create_CAD(cad_seq)
+    except Exception as ex:
+        return result(False, "create", ex)
 
-    except:
-        print("cs2cad ERROR: Load and create failed.")
-        return False
+    try:
+        if not save_path.exists():
+            os.makedirs(save_path, exist_ok=True)
+
+        if key is not None and save_file.exists():
+            save_file.unlink()  # may be a hardlink into the cache, never write through it
+        write_step_file(out_shape, save_file.as_posix())
+        if key is not None:
+            cache.put(key, save_file)
+    except Exception as ex:
+        return result(False, "write", ex)
 
-    if not save_path.exists():
-        os.mkdir(save_path)
+    return result(True, "done", save_file=save_file)
 
-    write_step_file(out_shape, save_file.as_posix())
-    return True
+
+def cs2cad(
+    json_file: Path | str | dict,
+    save_path: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    name: str | None = None,
+    mode: Literal["new", "replace", "continue"] = "continue",
+    cache: StepCache | Path | str | None = None,
+) -> bool:
+    res = _convert(json_file, save_path, name, mode, cache)
+    if not res.ok:
+        print(f"cs2cad ERROR: {res}")
+    return res.ok
+
+
+def cs2cad_many(
+    paths: Iterable[Path | str],
+    save_path: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    n_workers: int = -1,
+    mode: Literal["new", "replace", "continue"] = "continue",
+    cache: StepCache | Path | str | None = None,
+) -> Iterator[ConversionResult]:
+    """Convert many JSON files into STEP files using a process pool.
+
+    Results are yielded in completion order, one per input path.
+
+    Args:
+        paths (Iterable[Path | str]): json files to convert
+        save_path (Path | str): output dir for the STEP files
+        n_workers (int, optional): number of processes, -1 for all cores, 1 to run in-process. Defaults to -1.
+        mode (str, optional): same as in `cs2cad`. Defaults to "continue".
+        cache (StepCache | Path | str, optional): STEP cache (or its dir) shared by all workers. Defaults to None.
+
+    Yields:
+        ConversionResult: per-item result
+    """
+    paths = [Path(p) for p in paths]
+    if cache is not None and not isinstance(cache, StepCache):
+        cache = StepCache(cache)
+    if n_workers < 0:
+        n_workers = os.cpu_count() or 1
+
+    if n_workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield _convert(path, save_path, mode=mode, cache=cache)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(paths))) as executor:
+        futures = {
+            executor.submit(_convert, path, save_path, None, mode, cache): path for path in paths
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as ex:  # worker crashed, e.g. segfault inside OCC
+                yield ConversionResult(
+                    name=futures[future].stem,
+                    ok=False,
+                    stage="worker",
+                    error="{}: {}".format(type(ex).__name__, ex),
+                )
@@ -1,3 +1,6 @@
-__all__ = ["process_one", "process_many", "ParsingStatistic"]
+__all__ = ["process_one", "process_many", "ParsingStatistic", "CrawlJournal", "DocumentContext", "prefilter"]
 
 from .process import process_one, process_many, ParsingStatistic
+from .journal import CrawlJournal
+from .context import DocumentContext
+from .prefilter import prefilter
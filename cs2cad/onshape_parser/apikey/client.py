@@ -28,17 +28,36 @@ class Client:
         - logging (bool, default=True): Turn logging on or off
     """
 
-    def __init__(self, stack="https://cad.onshape.com", logging=True):
+    def __init__(
+        self,
+        stack="https://cad.onshape.com",
+        logging=True,
+        pool_size=10,
+        keep_alive=True,
+        scheduler=None,
+        cache=None,
+    ):
         """
         Instantiates a new Onshape client.
 
         Args:
             - stack (str, default='https://cad.onshape.com'): Base URL
             - logging (bool, default=True): Turn logging on or off
+            - pool_size (int, default=10): Max number of kept-alive connections per host
+            - keep_alive (bool, default=True): Reuse connections across requests
+            - scheduler (RequestScheduler, default=None): Rate limit and retries of 429/5xx
+            - cache (ResponseCache, default=None): Persistent cache of read-only responses
         """
 
         self._stack = stack
-        self._api = Onshape(stack=stack, logging=logging)
+        self._api = Onshape(
+            stack=stack,
+            logging=logging,
+            pool_size=pool_size,
+            keep_alive=keep_alive,
+            scheduler=scheduler,
+            cache=cache,
+        )
 
     def new_document(self, name="Test Document", owner_type=0, public=False):
         """
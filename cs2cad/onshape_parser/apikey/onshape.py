@@ -6,6 +6,8 @@ Provides access to the Onshape REST API
 """
 
 from . import utils
+from .scheduler import RequestScheduler
+from .response_cache import ResponseCache, CacheMiss
 
 import os
 import json
@@ -17,6 +19,7 @@ import hashlib
 import datetime
 
 import requests
+import requests.adapters
 import urllib.parse
 import urllib.error
 import urllib.request
@@ -38,6 +41,10 @@ class Onshape:
         - stack (str): Base URL
         - creds (str, default='./sketchgraphs/onshape/creds/creds.json'): Credentials location
         - logging (bool, default=True): Turn logging on or off
+        - pool_size (int, default=10): Max number of kept-alive connections per host
+        - keep_alive (bool, default=True): Reuse connections through a pooled requests.Session
+        - scheduler (RequestScheduler, default=None): Rate limit and retries, retries only if None
+        - cache (ResponseCache, default=None): Persistent cache of read-only responses
     """
 
     # def __init__(self, stack, creds='./sketchgraphs/onshape/creds/creds.json', logging=True):
@@ -47,6 +54,10 @@ class Onshape:
         creds=PROJECT_CONFIG.CONFIG_DIR / "creds.json",
         logging: bool = True,
         url_logging: bool = True,
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        scheduler: RequestScheduler | None = None,
+        cache: ResponseCache | None = None,
     ):
         """
         Instantiates an instance of the Onshape class. Reads credentials from a JSON file
@@ -66,8 +77,20 @@ class Onshape:
         Args:
             - stack (str): Base URL
             - creds (str, default='./sketchgraphs/onshape/creds/creds.json'): Credentials location
+            - pool_size (int, default=10): Max number of kept-alive connections per host
+            - keep_alive (bool, default=True): Reuse connections through a pooled requests.Session
+            - scheduler (RequestScheduler, default=None): Rate limit and retries, retries only if None
+            - cache (ResponseCache, default=None): Persistent cache of read-only responses
         """
 
+        self.cache = cache
+        self._microversions = {}
+        self.scheduler = RequestScheduler() if scheduler is None else scheduler
+        self._pool_size = pool_size
+        self._keep_alive = keep_alive
+        self._session = None
+        self._session_pid = None
+
         if not os.path.isfile(creds):
             raise IOError("%s is not a file" % creds)
 
@@ -91,6 +114,44 @@ class Onshape:
                 % (self._url, self._access_key)
             )
 
+    def __getstate__(self):
+        # sessions hold sockets, every process (e.g. joblib worker) opens its own
+        state = self.__dict__.copy()
+        state["_session"] = None
+        state["_session_pid"] = None
+        return state
+
+    @property
+    def session(self):
+        """
+        Pooled session of the current process, created on first use and
+        recreated after a fork so that sockets are never shared between workers.
+
+        Returns:
+            - requests.Session: Session with keep-alive connection pools
+        """
+
+        if self._session is None or self._session_pid != os.getpid():
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self._pool_size, pool_maxsize=self._pool_size
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+            self._session_pid = os.getpid()
+        return self._session
+
+    def close(self):
+        """
+        Close the pooled connections of the current process
+        """
+
+        if self._session is not None and self._session_pid == os.getpid():
+            self._session.close()
+        self._session = None
+        self._session_pid = None
+
     def _make_nonce(self):
         """
         Generate a unique ID for the request, 25 chars in length
@@ -234,15 +295,76 @@ class Onshape:
             - requests.Response: Object containing the response from Onshape
         """
 
-        req_headers = self._make_headers(method, path, params, headers)
+        if self.cache is None or not self.cache.cacheable(method, path):
+            return self._request(
+                method, path, params, headers, body, base_url, timeout, check_status
+            )
+
+        microversion = self._microversion(path)
+        key = self.cache.key(method, path, params, body, microversion)
+        url = (self._url if base_url is None else base_url) + path
+        res = self.cache.get(key, url)
+        if res is not None:
+            return res
+        if self.cache.offline:
+            raise CacheMiss("not in response cache: " + url)
+
+        res = self._request(
+            method, path, params, headers, body, base_url, timeout, check_status
+        )
+        if 200 <= res.status_code < 300:
+            self.cache.put(key, res.status_code, self._cache_headers(res), res.content)
+        return res
+
+    @staticmethod
+    def _cache_headers(res):
+        return {"Content-Type": res.headers.get("Content-Type", "application/json")}
+
+    def _microversion(self, path):
+        """
+        Current microversion of the document workspace in path, requested once
+        per process; the last known one from the cache in offline mode
+
+        Returns:
+            - str | None: Microversion ID, None for paths outside a document workspace
+        """
+
+        doc = self.cache.document(path)
+        if doc is None:
+            return None
+        if doc not in self._microversions:
+            if self.cache.offline:
+                microversion = self.cache.get_microversion(*doc)
+            else:
+                res = self._request(
+                    "get", "/api/documents/d/%s/w/%s/currentmicroversion" % doc
+                )
+                microversion = res.json()["microversion"]
+                self.cache.put_microversion(*doc, microversion)
+            self._microversions[doc] = microversion
+        return self._microversions[doc]
+
+    def _request(
+        self,
+        method,
+        path,
+        params={},
+        headers={},
+        body={},
+        base_url=None,
+        timeout=None,
+        check_status=True,
+    ):
+        """
+        Issues a request to Onshape, without the response cache; same arguments as request
+        """
+
         if base_url is None:
             base_url = self._url
         url = base_url + path + "?" + urllib.parse.urlencode(params)
 
         if self._logging:
             utils.log(body)
-            utils.log(req_headers)
-            utils.log("request url: " + url)
 
         if not self._logging and self._url_logging:
             utils.log("request url: " + url)
@@ -250,17 +372,27 @@ class Onshape:
         # only parse as json string if we have to
         body = json.dumps(body) if type(body) == dict else body
 
-        res = requests.request(
-            method,
-            url,
-            headers=req_headers,
-            data=body,
-            allow_redirects=False,
-            stream=True,
-            timeout=timeout,
-        )
+        def send():
+            # signed on every attempt, a retry needs a fresh date and nonce
+            req_headers = self._make_headers(method, path, params, headers)
+            if self._logging:
+                utils.log(req_headers)
+                utils.log("request url: " + url)
+            send_request = self.session.request if self._keep_alive else requests.request
+            return send_request(
+                method,
+                url,
+                headers=req_headers,
+                data=body,
+                allow_redirects=False,
+                stream=True,
+                timeout=timeout,
+            )
+
+        res = self.scheduler.send(send)
 
         if res.status_code == 307:
+            res.close()  # hand the connection back to the pool
             location = urlparse(res.headers["Location"])
             querystring = parse_qs(location.query)
 
@@ -274,7 +406,7 @@ class Onshape:
                 # won't work for repeated query params
                 new_query[key] = querystring[key][0]
 
-            return self.request(
+            return self._request(
                 method,
                 location.path,
                 params=new_query,
@@ -0,0 +1,200 @@
+"""
+response_cache
+==============
+
+Persistent SQLite cache of Onshape API responses
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import urllib.parse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+__all__ = ["ResponseCache", "CacheMiss"]
+
+_DOC_PATH = re.compile(r"/d/(?P<did>\w+)/w/(?P<wid>\w+)")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    status INTEGER,
+    headers TEXT,
+    body BLOB,
+    size INTEGER,
+    created REAL,
+    accessed REAL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS microversions (
+    did TEXT,
+    wid TEXT,
+    microversion TEXT,
+    PRIMARY KEY (did, wid)
+);
+"""
+
+
+class CacheMiss(requests.ConnectionError):
+    """
+    Raised in offline mode for a request that is not cached; a ConnectionError,
+    so the crawl journal keeps the document for a later online run
+    """
+
+
+class ResponseCache:
+    """
+    Responses of read-only calls (GET and FeatureScript evaluations) keyed by method,
+    path, params, body hash and the microversion of the document workspace in the
+    path, so an edited document is fetched again.
+
+    Attributes:
+        - path (str): SQLite database file, shared by all processes
+        - ttl (float, default=None): Seconds an entry stays valid, forever if None
+        - max_bytes (int, default=None): Size limit of the stored bodies, least recently used are evicted
+        - offline (bool, default=False): Cache-only mode, a miss raises CacheMiss instead of a request
+    """
+
+    EVICT_EVERY = 100  # puts between size checks
+
+    def __init__(self, path, ttl=None, max_bytes=None, offline=False):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._puts = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        """connection of the current process and thread (the async client calls from worker threads)"""
+        local = self._local
+        if getattr(local, "conn", None) is None or local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    @staticmethod
+    def cacheable(method, path):
+        """only calls without side effects are cached"""
+        method = method.lower()
+        return method == "get" or (method == "post" and path.endswith("/featurescript"))
+
+    @staticmethod
+    def document(path):
+        """
+        Returns:
+            - tuple | None: (did, wid) of a document workspace path
+        """
+        m = _DOC_PATH.search(path)
+        return None if m is None else (m.group("did"), m.group("wid"))
+
+    @staticmethod
+    def key(method, path, params, body, microversion=None):
+        body = body if isinstance(body, (bytes, str)) else json.dumps(body, sort_keys=True)
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        parts = [
+            method.lower(),
+            path,
+            urllib.parse.urlencode(sorted(params.items())),
+            hashlib.sha1(body).hexdigest(),
+            microversion or "",
+        ]
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key, url=None):
+        """
+        Returns:
+            - requests.Response | None: Cached response, None on a miss
+        """
+        row = self.conn.execute(
+            "SELECT status, headers, body, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is not None and self.ttl is not None and row[3] + self.ttl < now:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+
+        res = requests.Response()
+        res.status_code = row[0]
+        res.headers = CaseInsensitiveDict(json.loads(row[1]))
+        res._content = row[2]
+        res.url = url
+        res.encoding = requests.utils.get_encoding_from_headers(res.headers) or "utf-8"
+        return res
+
+    def put(self, key, status, headers, body):
+        """headers (dict) should only hold what describes the body, e.g. Content-Type"""
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, status, json.dumps(headers), body, len(body), now, now),
+        )
+        self._puts += 1
+        if self._puts % self.EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """drop expired entries, then least recently used ones down to 90% of max_bytes"""
+        conn = self.conn
+        if self.ttl is not None:
+            conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        if self.max_bytes is None:
+            return
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * 0.9)
+        keys, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+
+    def get_microversion(self, did, wid):
+        row = self.conn.execute(
+            "SELECT microversion FROM microversions WHERE did = ? AND wid = ?", (did, wid)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def put_microversion(self, did, wid, microversion):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO microversions VALUES (?, ?, ?)", (did, wid, microversion)
+        )
+
+    def close(self):
+        """close the connection of the calling thread"""
+        local = self._local
+        if getattr(local, "conn", None) is not None and local.pid == os.getpid():
+            local.conn.close()
+        local.conn = None
+        local.pid = None
@@ -0,0 +1,248 @@
+"""
+scheduler
+=========
+
+Throttling and retries under Onshape.request
+"""
+
+import os
+import json
+import time
+import fcntl
+import random
+import asyncio
+import threading
+import datetime
+from email.utils import parsedate_to_datetime
+
+import requests
+
+__all__ = ["TokenBucket", "RequestScheduler", "RETRY_STATUS"]
+
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+COUNTERS = ["requests", "retries", "throttled", "throttled_time", "gave_up"]
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the request rate. With a state file, the bucket is shared by
+    every process that opens the same file (e.g. joblib workers); the file is guarded
+    by an exclusive flock for each token taken.
+
+    Attributes:
+        - rate (float): Tokens (requests) added per second
+        - burst (int): Bucket capacity
+        - path (str, default=None): State file shared across processes, in-process bucket if None
+    """
+
+    def __init__(self, rate, burst=None, path=None):
+        self.rate = rate
+        self.burst = max(1, int(rate)) if burst is None else burst
+        self.path = None if path is None else str(path)
+        self._state = None
+        self._lock = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+
+    def _update(self, fn):
+        """apply fn to the state dict under the lock, returns what fn returns"""
+        if self.path is None:
+            if self._lock is None:
+                self._lock = threading.Lock()
+            with self._lock:
+                if self._state is None:
+                    self._state = self._initial()
+                return fn(self._state)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = os.read(fd, 1 << 16)
+            try:
+                state = json.loads(raw) if raw else self._initial()
+            except json.JSONDecodeError:
+                state = self._initial()
+            out = fn(state)
+            data = json.dumps(state).encode("utf-8")
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+            return out
+        finally:
+            os.close(fd)
+
+    def _initial(self):
+        return {"tokens": float(self.burst), "time": time.time()}
+
+    def reserve(self):
+        """
+        Take a token, going into debt if the bucket is empty
+
+        Returns:
+            - float: Seconds to wait before the request may be sent
+        """
+
+        def take(state):
+            now = time.time()
+            tokens = min(self.burst, state["tokens"] + (now - state["time"]) * self.rate)
+            state["tokens"] = tokens - 1
+            state["time"] = now
+            return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+        return self._update(take)
+
+
+class RequestScheduler:
+    """
+    Sends requests through a token bucket and retries 429/5xx responses and network
+    errors with exponential backoff and full jitter, honoring Retry-After.
+
+    Counters are kept in memory by each scheduler. Workers of other processes count
+    on their own copy (see `child`); their counters are added back with `merge`.
+
+    Attributes:
+        - bucket (TokenBucket, default=None): Shared rate limiter; no rate limit if None
+        - max_retries (int, default=5): Retries before the last response/error is returned/raised
+        - backoff (float, default=0.5): Base delay in seconds, doubled on every retry
+        - max_backoff (float, default=60): Cap of a single delay
+    """
+
+    def __init__(self, bucket=None, max_retries=5, backoff=0.5, max_backoff=60.0):
+        self.bucket = TokenBucket(float("inf"), burst=1) if bucket is None else bucket
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._counts = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def child(self):
+        """
+        Returns:
+            - RequestScheduler: Same bucket and retry settings, counters starting at zero
+        """
+        return RequestScheduler(self.bucket, self.max_retries, self.backoff, self.max_backoff)
+
+    def count(self, **deltas):
+        with self._lock:
+            for k, v in deltas.items():
+                self._counts[k] += v
+
+    def merge(self, counters):
+        """add the counters of another scheduler (e.g. a child used in a worker process)"""
+        self.count(**counters)
+
+    def counters(self):
+        """
+        Returns:
+            - dict: requests, retries, throttled (429 responses), throttled_time (seconds spent
+              waiting for tokens or backing off) and gave_up (requests that ran out of retries)
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    def _reserve(self):
+        if self.bucket.rate == float("inf"):
+            return 0.0
+        return self.bucket.reserve()
+
+    async def _areserve(self):
+        if self.bucket.rate == float("inf"):
+            return 0.0
+        if self.bucket.path is None:
+            return self.bucket.reserve()
+        # the shared bucket blocks on a file lock, keep it off the event loop
+        return await asyncio.to_thread(self.bucket.reserve)
+
+    def _delay(self, attempt, res=None):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+        retry_after = None if res is None else res.headers.get("Retry-After")
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    now = datetime.datetime.now(datetime.timezone.utc)
+                    delay = max(delay, (when - now).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+        return delay
+
+    def _should_retry(self, attempt, res=None, ex=None):
+        """
+        Returns:
+            - float | None: Backoff before the next attempt, None to stop
+        """
+        if ex is not None:
+            if not isinstance(ex, (requests.ConnectionError, requests.Timeout)):
+                return None
+        elif res.status_code not in RETRY_STATUS:
+            return None
+        if attempt >= self.max_retries:
+            self.count(gave_up=1)
+            return None
+        delay = self._delay(attempt, res)
+        throttled = 1 if res is not None and res.status_code == 429 else 0
+        self.count(retries=1, throttled=throttled, throttled_time=delay)
+        return delay
+
+    def send(self, fn):
+        """
+        Call fn() (which signs and sends one request) until it succeeds or the retries run out
+
+        Returns:
+            - requests.Response: Last response
+        """
+        attempt = 0
+        while True:
+            wait = self._reserve()
+            if wait > 0:
+                time.sleep(wait)
+            self.count(requests=1, throttled_time=wait)
+            try:
+                res = fn()
+            except Exception as ex:
+                delay = self._should_retry(attempt, ex=ex)
+                if delay is None:
+                    raise
+            else:
+                delay = self._should_retry(attempt, res=res)
+                if delay is None:
+                    return res
+                res.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def asend(self, fn):
+        """same as send for a coroutine function fn"""
+        attempt = 0
+        while True:
+            wait = await self._areserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.count(requests=1, throttled_time=wait)
+            try:
+                res = await fn()
+            except Exception as ex:
+                delay = self._should_retry(attempt, ex=ex)
+                if delay is None:
+                    raise
+            else:
+                delay = self._should_retry(attempt, res=res)
+                if delay is None:
+                    return res
+            await asyncio.sleep(delay)
+            attempt += 1
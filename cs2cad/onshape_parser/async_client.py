@@ -0,0 +1,239 @@
+"""asyncio variant of the OnShape client (needs httpx).
+
+Requests are signed exactly like `Onshape.request`, but sent through one shared
+httpx.AsyncClient, so a single process can keep hundreds of requests in flight.
+`max_in_flight` is a global limit over all coroutines using the same client.
+HTTP and network errors are raised as the matching `requests` exceptions, so
+`is_transient` and the crawl journal treat both clients alike. The SQLite response
+cache is read and written in worker threads, off the event loop.
+"""
+import json
+import asyncio
+import urllib.parse
+from urllib.parse import urlparse, parse_qs
+
+import httpx
+import requests
+
+from .apikey import utils
+from .apikey.onshape import Onshape
+from .apikey.response_cache import CacheMiss
+from .my_client import MyClient
+from . import btmessage
+
+
+class AsyncOnshape(Onshape):
+    """Onshape with an async `request`, limited to `max_in_flight` concurrent requests"""
+
+    def __init__(self, stack, max_in_flight: int = 256, timeout: float | None = 60.0, **kwargs):
+        super().__init__(stack, **kwargs)
+        self._max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._client = None
+        self._limit = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state["_client"] = None
+        state["_limit"] = None
+        return state
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self._max_in_flight,
+                max_keepalive_connections=self._max_in_flight,
+            )
+            self._client = httpx.AsyncClient(limits=limits, timeout=self._timeout)
+            self._limit = asyncio.Semaphore(self._max_in_flight)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._limit = None
+
+    async def request(
+        self,
+        method,
+        path,
+        params={},
+        headers={},
+        body={},
+        base_url=None,
+        timeout=None,
+        check_status=True,
+    ):
+        """same arguments as Onshape.request, returns a httpx.Response
+        (a requests.Response when served from the response cache)"""
+        if self.cache is None or not self.cache.cacheable(method, path):
+            return await self._request(
+                method, path, params, headers, body, base_url, timeout, check_status
+            )
+
+        microversion = await self._microversion(path)
+        key = self.cache.key(method, path, params, body, microversion)
+        url = (self._url if base_url is None else base_url) + path
+        res = await asyncio.to_thread(self.cache.get, key, url)
+        if res is not None:
+            return res
+        if self.cache.offline:
+            raise CacheMiss("not in response cache: " + url)
+
+        res = await self._request(
+            method, path, params, headers, body, base_url, timeout, check_status
+        )
+        if 200 <= res.status_code < 300:
+            await asyncio.to_thread(
+                self.cache.put, key, res.status_code, self._cache_headers(res), res.content
+            )
+        return res
+
+    async def _microversion(self, path):
+        doc = self.cache.document(path)
+        if doc is None:
+            return None
+        if doc not in self._microversions:
+            if self.cache.offline:
+                microversion = await asyncio.to_thread(self.cache.get_microversion, *doc)
+            else:
+                res = await self._request(
+                    "get", "/api/documents/d/%s/w/%s/currentmicroversion" % doc
+                )
+                microversion = res.json()["microversion"]
+                await asyncio.to_thread(self.cache.put_microversion, *doc, microversion)
+            self._microversions[doc] = microversion
+        return self._microversions[doc]
+
+    async def _request(
+        self,
+        method,
+        path,
+        params={},
+        headers={},
+        body={},
+        base_url=None,
+        timeout=None,
+        check_status=True,
+    ):
+        if base_url is None:
+            base_url = self._url
+        url = base_url + path + "?" + urllib.parse.urlencode(params)
+
+        if self._logging:
+            utils.log(body)
+
+        if not self._logging and self._url_logging:
+            utils.log("request url: " + url)
+
+        body = json.dumps(body) if type(body) == dict else body
+
+        client = self.client
+
+        async def send():
+            req_headers = self._make_headers(method, path, params, headers)
+            if self._logging:
+                utils.log(req_headers)
+                utils.log("request url: " + url)
+            try:
+                async with self._limit:
+                    return await client.request(
+                        method,
+                        url,
+                        headers=req_headers,
+                        content=body,
+                        follow_redirects=False,
+                        timeout=self._timeout if timeout is None else timeout,
+                    )
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(str(e)) from e
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(str(e)) from e
+
+        res = await self.scheduler.asend(send)
+
+        if res.status_code == 307:
+            location = urlparse(res.headers["Location"])
+            querystring = parse_qs(location.query)
+
+            if self._logging:
+                utils.log("request redirected to: " + location.geturl())
+
+            new_query = {key: querystring[key][0] for key in querystring}
+            new_base_url = location.scheme + "://" + location.netloc
+
+            return await self._request(
+                method,
+                location.path,
+                params=new_query,
+                headers=headers,
+                base_url=new_base_url,
+            )
+        elif not 200 <= res.status_code <= 206:
+            if self._logging:
+                utils.log("request failed, details: " + res.text, level=1)
+        else:
+            if self._logging:
+                utils.log("request succeeded, details: " + res.text)
+        if check_status and not 200 <= res.status_code < 300:
+            raise requests.HTTPError(
+                "{} Error for url: {}".format(res.status_code, url), response=res
+            )
+        return res
+
+
+class AsyncMyClient(object):
+    """async counterpart of the MyClient requests used by the parser,
+    request bodies and response parsing are shared with MyClient.
+    """
+
+    def __init__(self, stack="https://cad.onshape.com", logging=False, max_in_flight=256, **kwargs):
+        self._stack = stack
+        self._api = AsyncOnshape(stack=stack, logging=logging, max_in_flight=max_in_flight, **kwargs)
+
+    async def aclose(self):
+        await self._api.aclose()
+
+    async def _featurescript(self, did, wid, eid, body):
+        res = await self._api.request(
+            "post", MyClient.featurescript_path(did, wid, eid), body=body
+        )
+        return btmessage.loads(res.content)
+
+    async def get_features(self, did, wid, eid):
+        """feature list json of a part studio"""
+        res = await self._api.request(
+            "get", "/api/partstudios/d/" + did + "/w/" + wid + "/e/" + eid + "/features"
+        )
+        return res.json()
+
+    async def get_plane(self, did, wid, eid, geo_id):
+        """parameters of the sketch plane face"""
+        res_json = await self._featurescript(
+            did, wid, eid, MyClient.entity_by_id_body([geo_id], "FACE")
+        )
+        return MyClient.parse_face_msg(res_json["result"]["message"]["value"])[0]
+
+    async def eval_sketch_topology_by_adjacency(self, did, wid, eid, feat_id):
+        res_json = await self._featurescript(
+            did, wid, eid, MyClient.sketch_topology_body(feat_id)
+        )
+        return btmessage.sketch_topology(res_json)
+
+    async def eval_boundingBox(self, did, wid, eid):
+        res_json = await self._featurescript(did, wid, eid, MyClient.boundingBox_body())
+        return MyClient.parse_boundingBox(res_json)
+
+    async def eval_document(self, did, wid, eid, sketches, exprs):
+        res_json = await self._featurescript(
+            did, wid, eid, MyClient.document_body(sketches, exprs)
+        )
+        return MyClient.parse_document(res_json, sketches, exprs)
+
+    async def exprs2meter(self, did, wid, eid, exprs):
+        if len(exprs) == 0:
+            return []
+        res_json = await self._featurescript(did, wid, eid, MyClient.exprs2meter_body(exprs))
+        return MyClient.parse_exprs2meter(res_json)
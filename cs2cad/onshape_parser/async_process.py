@@ -0,0 +1,208 @@
+"""Concurrent crawling with the asyncio client (needs httpx).
+
+Within a document everything after the feature list is evaluated by a single
+merged featurescript. If that fails, the bounding box, the plane and topology
+of every sketch and the remote depth expressions are requested concurrently
+instead. The fetched responses are handed to FeatureListParser, which runs
+unchanged. Documents are crawled concurrently in one process, bounded by the
+client's global `max_in_flight` request limit.
+"""
+import os
+import json
+import asyncio
+from pathlib import Path
+
+from terminal_app.env import PROJECT_CONFIG
+
+from .async_client import AsyncMyClient
+from .parser import FeatureListParser
+from .journal import CrawlJournal, is_transient
+from .context import DocumentContext
+from .prefilter import prefilter
+from .apikey.response_cache import ResponseCache
+from .process import (
+    ParsingStatistic,
+    load_todo,
+    make_scheduler,
+    save_result,
+)
+
+
+def _discard(task: asyncio.Future):
+    """cancel a prefetch that is no longer needed, without 'exception never retrieved' warnings"""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def _fetch_sketch(client: AsyncMyClient, did, wid, eid, feat_data):
+    """(plane, topology) of a sketch feature, failed requests are returned as exceptions"""
+
+    async def plane():
+        param_dict = FeatureListParser.parse_feature_param(feat_data["parameters"])
+        return await client.get_plane(did, wid, eid, param_dict["sketchPlane"][0])
+
+    topo = client.eval_sketch_topology_by_adjacency(did, wid, eid, feat_data["featureId"])
+    return tuple(await asyncio.gather(plane(), topo, return_exceptions=True))
+
+
+async def parse_document(
+    client: AsyncMyClient,
+    ctx: DocumentContext,
+    bbox: asyncio.Future | None = None,
+    merged: bool = True,
+) -> dict:
+    """async counterpart of FeatureListParser.from_context(client, ctx).parse()"""
+    did, wid, eid = ctx.did, ctx.wid, ctx.eid
+    if bbox is None and not merged:
+        bbox = asyncio.ensure_future(client.eval_boundingBox(did, wid, eid))
+    if ctx.feature_list is None:
+        try:
+            ctx.feature_list = await client.get_features(did, wid, eid)
+        except BaseException:
+            if bbox is not None:
+                _discard(bbox)
+            raise
+
+    parser = FeatureListParser.from_context(None, ctx, merged=False)
+    if merged:
+        try:
+            doc = await client.eval_document(
+                did, wid, eid, parser._sketch_planes(), parser._remote_exprs()
+            )
+        except Exception as e:
+            if is_transient(e):
+                raise
+            print(ctx.data_id, "merged evaluation failed, one request per item:", e)
+        else:
+            ctx.bbox_info = doc["bbox"]
+            ctx.expr_values = doc["exprs"]
+            ctx.sketch_data = doc["sketches"]
+            return parser.parse()
+        if bbox is None:
+            bbox = asyncio.ensure_future(client.eval_boundingBox(did, wid, eid))
+
+    sketches = [
+        item["message"]
+        for item in ctx.feature_list["features"]
+        if item["message"]["featureType"] == "newSketch"
+    ]
+    exprs = parser._remote_exprs()
+
+    bbox_info, expr_values, *sketch_data = await asyncio.gather(
+        bbox,
+        client.exprs2meter(did, wid, eid, exprs),
+        *[_fetch_sketch(client, did, wid, eid, feat_data) for feat_data in sketches],
+        return_exceptions=True,
+    )
+    ctx.bbox_info = bbox_info
+    ctx.expr_values = (
+        expr_values if isinstance(expr_values, BaseException) else dict(zip(exprs, expr_values))
+    )
+    ctx.sketch_data = {
+        feat_data["featureId"]: data for feat_data, data in zip(sketches, sketch_data)
+    }
+    return parser.parse()
+
+
+async def process_one_async(
+    client: AsyncMyClient,
+    data_id: str,
+    link: str,
+    save_dir: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    journal: CrawlJournal | None = None,
+    merged: bool = True,
+) -> int:
+    """same steps and journal records as process_one"""
+    save_path = os.path.join(save_dir, "{}.json".format(data_id))
+    if os.path.exists(save_path):
+        if journal is not None:
+            with open(save_path, "r") as fp:
+                n = len(json.load(fp)["sequence"])
+            journal.record(data_id, "parsed", n=n)
+            return n
+        return 1
+
+    ctx = DocumentContext.from_link(link, data_id=data_id)
+
+    # without the merged script, the bounding box is fetched in parallel with the feature list
+    bbox = (
+        None if merged else asyncio.ensure_future(client.eval_boundingBox(ctx.did, ctx.wid, ctx.eid))
+    )
+    try:
+        ctx.feature_list = await client.get_features(ctx.did, ctx.wid, ctx.eid)
+        rejected = prefilter(ctx.feature_list)
+        if rejected is not None:
+            if bbox is not None:
+                _discard(bbox)
+            if journal is not None:
+                journal.fail(data_id, "rejected {}: {}".format(*rejected), rule=rejected[0])
+            return 0
+    except Exception as e:
+        if bbox is not None:
+            _discard(bbox)
+        print("[{}], contain unsupported features:".format(data_id), e)
+        if journal is not None:
+            journal.fail(data_id, "get features", e)
+        return 0
+
+    if journal is not None:
+        journal.record(data_id, "fetched")
+
+    try:
+        result = await parse_document(client, ctx, bbox=bbox, merged=merged)
+    except Exception as e:
+        print("[{}], feature parsing fails:".format(data_id), e)
+        if journal is not None:
+            journal.fail(data_id, "feature parsing", e)
+        return 0
+    return save_result(data_id, result, save_path, journal)
+
+
+async def _crawl(client: AsyncMyClient, todo: dict[str, str], save_dir: Path, journal, max_documents: int):
+    documents = asyncio.Semaphore(max_documents)
+
+    async def one(data_id, link):
+        async with documents:
+            return await process_one_async(client, data_id, link, save_dir, journal)
+
+    try:
+        return await asyncio.gather(*[one(data_id, link) for data_id, link in todo.items()])
+    finally:
+        await client.aclose()
+
+
+def process_many_async(
+    links_yml_file: Path | str,
+    truck_id: str | None = None,
+    max_in_flight: int = 256,
+    max_documents: int | None = None,
+    save_dir: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    retry_transient: bool = True,
+    rate_limit: float | None = None,
+    response_cache: ResponseCache | None = None,
+) -> tuple[Path, ParsingStatistic]:
+    """process_many from a single process with up to `max_in_flight` concurrent requests.
+
+    Args:
+        max_in_flight: global limit of concurrent requests
+        max_documents: number of documents crawled at the same time, defaults to max_in_flight
+        rate_limit: requests per second, unlimited if None
+        response_cache: persistent cache of the responses
+    """
+    save_dir, truck_id, dwe_data, journal, todo = load_todo(
+        links_yml_file, truck_id, save_dir, retry_transient
+    )
+    print(f"max_in_flight: {max_in_flight}")
+
+    scheduler = make_scheduler(save_dir, rate_limit, shared=False)  # one process
+    client = AsyncMyClient(
+        logging=False, max_in_flight=max_in_flight, scheduler=scheduler, cache=response_cache
+    )
+    max_documents = max_in_flight if max_documents is None else max_documents
+    asyncio.run(_crawl(client, todo, save_dir, journal, max_documents))
+    print("requests: {}".format(scheduler.counters()))
+
+    statistic = ParsingStatistic.from_counts(
+        truck_id, journal.counts(dwe_data.keys()), journal.rejections(dwe_data.keys())
+    )
+    return save_dir, statistic
@@ -0,0 +1,109 @@
+"""Fast decoding of Onshape BTMessage (typed message tree) responses.
+
+Every value of a featurescript result is wrapped as {"typeTag": ..., "message": {"value": ...}}.
+`loads` decodes the raw body with orjson (stdlib json if it is not installed) and
+`sketch_topology` builds the vertex/edge/face tables of MyClient.parse_sketch_topology
+in a single pass, without the per-item list wrapping and dict updates of the
+parse_*_msg helpers. The output is identical.
+
+A large response decodes to millions of small containers; the cyclic garbage
+collector would rescan them over and over while they are created, so both steps
+run with it paused (the trees hold no cycles).
+"""
+import gc
+import json
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@contextmanager
+def gc_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def loads(content: bytes | str):
+    """decode a response body"""
+    with gc_paused():
+        if orjson is not None:
+            return orjson.loads(content)
+        return json.loads(content)
+
+
+def _vertex(node):
+    msg = node["message"]
+    values = msg["value"]
+    unit = values[0]["message"]["unitToPower"][0]
+    return {
+        msg["typeTag"]: tuple([round(x["message"]["value"], 8) for x in values]),
+        "unit": (unit["key"], unit["value"]),
+    }
+
+
+def _geometry(node):
+    """curve or surface definition, same as MyClient.parse_edge_msg / parse_face_msg"""
+    msg = node["message"]
+    param = {"type": msg["typeTag"]}
+    for entry in msg["value"]:
+        entry = entry["message"]
+        k = entry["key"]["message"]["value"]
+        v = entry["value"]["message"]["value"]
+        if k == "coordSystem":
+            v = {
+                item["message"]["key"]["message"]["value"]: [
+                    round(x["message"]["value"], 8)
+                    for x in item["message"]["value"]["message"]["value"]
+                ]
+                for item in v
+            }
+        elif isinstance(v, list):
+            v = [round(x["message"]["value"], 8) for x in v]
+        elif isinstance(v, float):
+            v = round(v, 8)
+        param[k] = v
+    return param
+
+
+_PARAM_PARSERS = {"faces": _geometry, "edges": _geometry, "vertices": _vertex}
+
+
+def sketch_topology(res_json):
+    """same output as MyClient.parse_sketch_topology"""
+    with gc_paused():
+        return _sketch_topology(res_json)
+
+
+def _sketch_topology(res_json):
+    topo = {}
+    for item in res_json["result"]["message"]["value"]:
+        item_msg = item["message"]
+        k_str = item_msg["key"]["message"]["value"]
+        parse_param = _PARAM_PARSERS.get(k_str)
+        table = []
+        for item_x in item_msg["value"]["message"]["value"]:
+            geo_dict = {}
+            for item_y in item_x["message"]["value"]:
+                item_y = item_y["message"]
+                k = item_y["key"]["message"]["value"]
+                v_msg = item_y["value"]
+                if k == "param":
+                    if parse_param is None:
+                        raise ValueError(k_str)
+                    geo_dict[k] = parse_param(v_msg)
+                    continue
+                v = v_msg["message"]["value"]
+                if isinstance(v, list):
+                    v = [a["message"]["value"] for a in v]
+                geo_dict[k] = v
+            table.append(geo_dict)
+        topo[k_str] = table
+    return topo
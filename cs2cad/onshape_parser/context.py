@@ -0,0 +1,32 @@
+from dataclasses import dataclass, field
+
+
+class MissingContextData(Exception):
+    """A stage without a client needs a value the DocumentContext doesn't hold"""
+
+
+@dataclass
+class DocumentContext:
+    """State of one part studio passed along the crawl stages
+    (fetch features -> filter -> evaluate -> parse), so that no stage
+    requests what an earlier one already has.
+
+    Fetched values may hold the exception of a failed request; it is
+    raised by the stage that uses the value.
+    """
+
+    did: str
+    wid: str
+    eid: str
+    data_id: str | None = None
+    feature_list: dict | None = None
+    bbox_info: dict | BaseException | None = None  # {"maxCorner": [...], "minCorner": [...]}
+    sketch_data: dict = field(default_factory=dict)  # {feat_id: (plane, geo_topo)}
+    expr_values: dict | BaseException | None = None  # {expr: meter}
+    bbox: dict | None = None  # parsed bounding box
+    sketches: dict = field(default_factory=dict)  # {feat_id: parsed sketch entity}
+
+    @staticmethod
+    def from_link(link: str, data_id: str | None = None) -> "DocumentContext":
+        v_list = link.split("/")
+        return DocumentContext(v_list[-5], v_list[-3], v_list[-1], data_id=data_id)
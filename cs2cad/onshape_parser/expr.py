@@ -0,0 +1,146 @@
+"""Local evaluation of Onshape length expressions such as "25 mm", "1 in" or "(10 + 2.5) * mm".
+
+Only literals, length units and + - * / ^ with parentheses are supported. Anything
+else (variables like "#depth", functions, unit-less results) raises ValueError so the
+caller can fall back to a FeatureScript evaluation.
+"""
+import re
+
+# length units to meter
+LENGTH_UNITS = {
+    "m": 1.0,
+    "meter": 1.0,
+    "meters": 1.0,
+    "mm": 1e-3,
+    "millimeter": 1e-3,
+    "millimeters": 1e-3,
+    "cm": 1e-2,
+    "centimeter": 1e-2,
+    "centimeters": 1e-2,
+    "um": 1e-6,
+    "µm": 1e-6,
+    "micrometer": 1e-6,
+    "micrometers": 1e-6,
+    "in": 0.0254,
+    "inch": 0.0254,
+    "inches": 0.0254,
+    "ft": 0.3048,
+    "foot": 0.3048,
+    "feet": 0.3048,
+    "yd": 0.9144,
+    "yard": 0.9144,
+    "yards": 0.9144,
+}
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)|(?P<name>[A-Za-zµ_][A-Za-z0-9_]*)|(?P<op>[-+*/^()]))"
+)
+
+
+def _tokenize(expr: str) -> list[tuple[str, str]]:
+    tokens, pos = [], 0
+    expr = expr.strip()
+    while pos < len(expr):
+        m = _TOKEN.match(expr, pos)
+        if m is None or m.end() == pos:
+            raise ValueError("unsupported expression: {}".format(expr))
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """recursive descent over (value, length exponent) pairs"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.i = 0
+
+    def peek(self):
+        return self.tokens[self.i] if self.i < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.i += 1
+        return token
+
+    def expr(self):
+        value, dim = self.term()
+        while self.peek() in [("op", "+"), ("op", "-")]:
+            op = self.take()[1]
+            rvalue, rdim = self.term()
+            if rdim != dim:
+                raise ValueError("unit mismatch")
+            value = value + rvalue if op == "+" else value - rvalue
+        return value, dim
+
+    def term(self):
+        value, dim = self.unary()
+        while True:
+            kind, tok = self.peek()
+            if (kind, tok) in [("op", "*"), ("op", "/")]:
+                self.take()
+                rvalue, rdim = self.unary()
+                if tok == "*":
+                    value, dim = value * rvalue, dim + rdim
+                else:
+                    value, dim = value / rvalue, dim - rdim
+            else:
+                return value, dim
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            value, dim = self.unary()
+            return -value, dim
+        if self.peek() == ("op", "+"):
+            self.take()
+        return self.power()
+
+    def power(self):
+        value, dim = self.atom()
+        if self.peek() == ("op", "^"):
+            self.take()
+            exp, exp_dim = self.unary()
+            if exp_dim != 0:
+                raise ValueError("exponent with units")
+            value, dim = value ** exp, dim * exp
+        return value, dim
+
+    def atom(self):
+        kind, tok = self.take()
+        if kind == "number":
+            value = float(tok)
+            if self.peek()[0] == "name" or self.peek() == ("op", "("):
+                # implicit multiplication only binds a number to a unit or a parenthesised
+                # expression, e.g. "25 mm" or "2 (3 mm)"; "1 in 2" is left to FeatureScript
+                rvalue, rdim = self.power()
+                return value * rvalue, rdim
+            return value, 0
+        if kind == "name":
+            if tok not in LENGTH_UNITS:
+                raise ValueError("unknown name: {}".format(tok))
+            return LENGTH_UNITS[tok], 1
+        if (kind, tok) == ("op", "("):
+            value = self.expr()
+            if self.take() != ("op", ")"):
+                raise ValueError("unbalanced parentheses")
+            return value
+        raise ValueError("unexpected token: {}".format(tok))
+
+
+def eval_length_expr(expr: str) -> float:
+    """evaluate an Onshape length expression to meters, ValueError if it needs FeatureScript"""
+    if not isinstance(expr, str):
+        raise ValueError("not an expression: {}".format(expr))
+    parser = _Parser(_tokenize(expr))
+    try:
+        value, dim = parser.expr()
+    except (ZeroDivisionError, OverflowError) as e:
+        raise ValueError("{}: {}".format(expr, e))
+    if parser.i != len(parser.tokens):
+        raise ValueError("trailing tokens in: {}".format(expr))
+    if dim != 1:
+        raise ValueError("not a length: {}".format(expr))
+    return value
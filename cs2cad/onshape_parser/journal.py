@@ -0,0 +1,142 @@
+import os
+import json
+import time
+from pathlib import Path
+
+import requests
+
+
+STATES = ["pending", "fetched", "parsed", "failed"]
+
+
+def is_transient(ex: Exception) -> bool:
+    """network errors, 429 and 5xx responses are worth retrying"""
+    if isinstance(ex, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(ex, requests.HTTPError) and ex.response is not None:
+        return ex.response.status_code == 429 or ex.response.status_code >= 500
+    return False
+
+
+class CrawlJournal:
+    """Append-only JSONL journal of the crawl state of every data_id.
+
+    Each line is one state transition:
+        {"data_id": ..., "state": "pending" | "fetched" | "parsed" | "failed",
+         "n": <sequence length, parsed only>, "reason": ..., "transient": bool,
+         "rule": <pre-filter rule that rejected it, failed only>, "time": ...}
+    The latest line of a data_id is its current state. Lines are written with a
+    single append, so parallel workers can share one journal file.
+    """
+
+    def __init__(self, path: Path | str, max_attempts: int = 3):
+        self.path = Path(path)
+        self.max_attempts = max_attempts
+
+    def record(
+        self,
+        data_id: str,
+        state: str,
+        n: int = 0,
+        reason: str | None = None,
+        transient: bool = False,
+        rule: str | None = None,
+    ):
+        assert state in STATES, state
+        item = {
+            "data_id": data_id,
+            "state": state,
+            "n": n,
+            "reason": reason,
+            "transient": transient,
+            "rule": rule,
+            "time": time.time(),
+        }
+        self._append([item])
+
+    def record_many(self, data_ids, state: str):
+        assert state in STATES, state
+        now = time.time()
+        self._append(
+            [
+                {"data_id": d, "state": state, "n": 0, "reason": None, "transient": False, "time": now}
+                for d in data_ids
+            ]
+        )
+
+    def fail(
+        self,
+        data_id: str,
+        reason: str,
+        ex: Exception | None = None,
+        rule: str | None = None,
+    ):
+        transient = ex is not None and is_transient(ex)
+        if ex is not None:
+            reason = "{}: {}".format(reason, ex)
+        self.record(data_id, "failed", reason=reason, transient=transient, rule=rule)
+
+    def _append(self, items: list[dict]):
+        if not items:
+            return
+        lines = "".join(json.dumps(item) + "\n" for item in items)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, lines.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def load(self) -> dict[str, dict]:
+        """latest record per data_id, with the number of transient failures in "attempts" """
+        states: dict[str, dict] = {}
+        if not self.path.exists():
+            return states
+        with open(self.path, "r") as fp:
+            for line in fp:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:  # torn last line after a crash
+                    continue
+                prev = states.get(item["data_id"])
+                attempts = 0 if prev is None else prev["attempts"]
+                if item["state"] == "failed" and item["transient"]:
+                    attempts += 1
+                item["attempts"] = attempts
+                states[item["data_id"]] = item
+        return states
+
+    def needs_work(self, item: dict | None, retry_transient: bool = True) -> bool:
+        if item is None or item["state"] in ["pending", "fetched"]:
+            return True
+        if item["state"] == "failed" and item["transient"]:
+            return retry_transient and item["attempts"] < self.max_attempts
+        return False
+
+    def counts(self, data_ids=None) -> dict[str, int]:
+        """sequence length per data_id, 0 for anything not parsed"""
+        states = self.load()
+        if data_ids is None:
+            data_ids = states.keys()
+        return {
+            d: states[d]["n"] if d in states and states[d]["state"] == "parsed" else 0
+            for d in data_ids
+        }
+
+    def rejections(self, data_ids=None) -> dict[str, int]:
+        """number of documents rejected by each pre-filter rule"""
+        states = self.load()
+        if data_ids is None:
+            data_ids = states.keys()
+        hist: dict[str, int] = {}
+        for d in data_ids:
+            rule = states[d].get("rule") if d in states else None
+            if rule is not None and states[d]["state"] == "failed":
+                hist[rule] = hist.get(rule, 0) + 1
+        return hist
+
+    def failures(self) -> dict[str, str]:
+        """failure reason per failed data_id"""
+        return {
+            d: item["reason"] for d, item in self.load().items() if item["state"] == "failed"
+        }
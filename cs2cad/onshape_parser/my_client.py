@@ -4,6 +4,65 @@ from pathlib import Path
 from terminal_app.env import PROJECT_CONFIG
 
 from .apikey.client import Client
+from . import btmessage
+
+
+# featurescript statements computing `topo` of the sketch with feature id `sketch_id`
+_SKETCH_TOPOLOGY_FS = (
+    "   var topo = {};"
+    "   topo.faces = [];"
+    "   topo.edges = [];"
+    "   topo.vertices = [];"
+    "   var all_edge_ids = [];"
+    "   var all_vertex_ids = [];"
+    "                           "
+    "   var q_face = qSketchRegion(makeId(sketch_id));"
+    # "   var q_face = qCreatedBy(makeId(sketch_id), EntityType.FACE);"
+    "   var face_arr = evaluateQuery(context, q_face);"
+    "   for (var i = 0; i < size(face_arr); i += 1) {"
+    "       var face_topo = {};"
+    "       const face_id = transientQueriesToStrings(face_arr[i]);"
+    "       face_topo.id = face_id;"
+    "       face_topo.edges = [];"
+    "       face_topo.param = evSurfaceDefinition(context, {face: face_arr[i]});"
+    "                            "
+    # "       var q_edge = qLoopEdges(q_face);"
+    "       var q_edge = qAdjacent(face_arr[i], AdjacencyType.EDGE, EntityType.EDGE);"
+    "       var edge_arr = evaluateQuery(context, q_edge);"
+    "       for (var j = 0; j < size(edge_arr); j += 1) {"
+    "           var edge_topo = {};"
+    "           const edge_id = transientQueriesToStrings(edge_arr[j]);"
+    "           edge_topo.id = edge_id;"
+    "           edge_topo.vertices = [];"
+    "           edge_topo.param = evCurveDefinition(context, {edge: edge_arr[j]});"  #
+    '           edge_topo.midpoint = evEdgeTangentLine(context, {"edge": edge_arr[j], "parameter": 0.5}).origin;'
+    "           face_topo.edges = append(face_topo.edges, edge_id);"
+    "                                  "
+    "           var q_vertex = qAdjacent(edge_arr[j], AdjacencyType.VERTEX, EntityType.VERTEX);"
+    "           var vertex_arr = evaluateQuery(context, q_vertex);"
+    "           for (var k = 0; k < size(vertex_arr); k += 1) {"
+    "               var vertex_topo = {};"
+    "               const vertex_id = transientQueriesToStrings(vertex_arr[k]);"
+    "               vertex_topo.id = vertex_id;"
+    "               vertex_topo.param = evVertexPoint(context, {vertex: vertex_arr[k]});"
+    "               edge_topo.vertices = append(edge_topo.vertices, vertex_id);"
+    "               if (isIn(vertex_id, all_vertex_ids)){continue;}"
+    "               all_vertex_ids = append(all_vertex_ids, vertex_id);"
+    "               topo.vertices = append(topo.vertices, vertex_topo);"
+    "           }"
+    "           if (isIn(edge_id, all_edge_ids)){continue;}"
+    "           all_edge_ids = append(all_edge_ids, edge_id);"
+    "           topo.edges = append(topo.edges, edge_topo);"
+    "       }"
+    "       topo.faces = append(topo.faces, face_topo);"
+    "   }"
+)
+
+# featurescript statements computing `bbox` of all solid bodies
+_BOUNDING_BOX_FS = (
+    "   var q_body = qBodyType(qEverything(EntityType.BODY), BodyType.SOLID);"
+    "   var bbox = evBox3d(context, {'topology': q_body});"
+)
 
 
 class MyClient(Client):
@@ -77,12 +136,27 @@ class MyClient(Client):
         Returns:
             - requests.Response: OnShape response data
         """
+        res = self._api.request(
+            "post",
+            self.featurescript_path(did, wid, eid),
+            body=self.entity_by_id_body(geo_id, entity_type),
+        )
+
+        return res
+
+    @staticmethod
+    def featurescript_path(did, wid, eid):
+        return "/api/partstudios/d/" + did + "/w/" + wid + "/e/" + eid + "/featurescript"
+
+    @staticmethod
+    def entity_by_id_body(geo_id, entity_type):
+        """featurescript request body of get_entity_by_id"""
         func_dict = {
             "VERTEX": ("evVertexPoint", "vertex"),
             "EDGE": ("evCurveDefinition", "edge"),
             "FACE": ("evSurfaceDefinition", "face"),
         }
-        body = {
+        return {
             "script": "function(context is Context, queries) { "
             + "   var res_list = [];"
             "   var q_arr = evaluateQuery(context, queries.id);"
@@ -95,17 +169,11 @@ class MyClient(Client):
             "}",
             "queries": [{"key": "id", "value": geo_id}],
         }
-        res = self._api.request(
-            "post",
-            "/api/partstudios/d/" + did + "/w/" + wid + "/e/" + eid + "/featurescript",
-            body=body,
-        )
-
-        return res
 
     def eval_sketch_topology_by_adjacency(self, did, wid, eid, feat_id):
         """parse the hierarchical parametric geometry&topology (face -> edges -> vertex)
-        from a specified sketch feature ID.
+        from a specified sketch feature ID. Each edge also carries its midpoint
+        (global coordinates), so arcs need no extra request.
 
         Args:
             - did (str): Document ID
@@ -116,65 +184,30 @@ class MyClient(Client):
         Returns:
             - dict: a hierarchical parametric representation
         """
-        body = {
+        res = self._api.request(
+            "post",
+            self.featurescript_path(did, wid, eid),
+            body=self.sketch_topology_body(feat_id),
+        )
+        return btmessage.sketch_topology(btmessage.loads(res.content))
+
+    @staticmethod
+    def sketch_topology_body(feat_id):
+        """featurescript request body of eval_sketch_topology_by_adjacency"""
+        return {
             "script": "function(context is Context, queries) { "
-            "   var topo = {};"
-            "   topo.faces = [];"
-            "   topo.edges = [];"
-            "   topo.vertices = [];"
-            "   var all_edge_ids = [];"
-            "   var all_vertex_ids = [];"
-            "                           "
-            '   var q_face = qSketchRegion(makeId("%s"));' % feat_id +
-            # "   var q_face = qCreatedBy(makeId(\"%s\"), EntityType.FACE);" % feat_id +
-            "   var face_arr = evaluateQuery(context, q_face);"
-            "   for (var i = 0; i < size(face_arr); i += 1) {"
-            "       var face_topo = {};"
-            "       const face_id = transientQueriesToStrings(face_arr[i]);"
-            "       face_topo.id = face_id;"
-            "       face_topo.edges = [];"
-            "       face_topo.param = evSurfaceDefinition(context, {face: face_arr[i]});"
-            "                            "
-            # "       var q_edge = qLoopEdges(q_face);"
-            "       var q_edge = qAdjacent(face_arr[i], AdjacencyType.EDGE, EntityType.EDGE);"
-            "       var edge_arr = evaluateQuery(context, q_edge);"
-            "       for (var j = 0; j < size(edge_arr); j += 1) {"
-            "           var edge_topo = {};"
-            "           const edge_id = transientQueriesToStrings(edge_arr[j]);"
-            "           edge_topo.id = edge_id;"
-            "           edge_topo.vertices = [];"
-            "           edge_topo.param = evCurveDefinition(context, {edge: edge_arr[j]});"  #
-            "           face_topo.edges = append(face_topo.edges, edge_id);"
-            "                                  "
-            "           var q_vertex = qAdjacent(edge_arr[j], AdjacencyType.VERTEX, EntityType.VERTEX);"
-            "           var vertex_arr = evaluateQuery(context, q_vertex);"
-            "           for (var k = 0; k < size(vertex_arr); k += 1) {"
-            "               var vertex_topo = {};"
-            "               const vertex_id = transientQueriesToStrings(vertex_arr[k]);"
-            "               vertex_topo.id = vertex_id;"
-            "               vertex_topo.param = evVertexPoint(context, {vertex: vertex_arr[k]});"
-            "               edge_topo.vertices = append(edge_topo.vertices, vertex_id);"
-            "               if (isIn(vertex_id, all_vertex_ids)){continue;}"
-            "               all_vertex_ids = append(all_vertex_ids, vertex_id);"
-            "               topo.vertices = append(topo.vertices, vertex_topo);"
-            "           }"
-            "           if (isIn(edge_id, all_edge_ids)){continue;}"
-            "           all_edge_ids = append(all_edge_ids, edge_id);"
-            "           topo.edges = append(topo.edges, edge_topo);"
-            "       }"
-            "       topo.faces = append(topo.faces, face_topo);"
-            "   }"
-            "   return topo;"
+            '   var sketch_id = "%s";' % feat_id
+            + _SKETCH_TOPOLOGY_FS
+            + "   return topo;"
             "}",
             "queries": [],
         }
-        res = self._api.request(
-            "post",
-            "/api/partstudios/d/" + did + "/w/" + wid + "/e/" + eid + "/featurescript",
-            body=body,
-        )
 
-        res_msg = res.json()["result"]["message"]["value"]
+    @staticmethod
+    def parse_sketch_topology(res_json):
+        """hierarchical representation from the json response of sketch_topology_body,
+        btmessage.sketch_topology gives the same output faster"""
+        res_msg = res_json["result"]["message"]["value"]
         topo = {}
         for item in res_msg:
             item_msg = item["message"]
@@ -370,20 +403,27 @@ class MyClient(Client):
         Returns:
             - dict: {'maxCorner': [], 'minCorner': []}
         """
-        body = {
+        response = self._api.request(
+            "post",
+            self.featurescript_path(did, wid, eid),
+            body=self.boundingBox_body(),
+        )
+        return self.parse_boundingBox(response.json())
+
+    @staticmethod
+    def boundingBox_body():
+        """featurescript request body of eval_boundingBox"""
+        return {
             "script": "function(context is Context, queries) { "
-            + "   var q_body = qBodyType(qEverything(EntityType.BODY), BodyType.SOLID);"
-            "   var bbox = evBox3d(context, {'topology': q_body});"
-            "   return bbox;"
+            + _BOUNDING_BOX_FS
+            + "   return bbox;"
             "}",
             "queries": [],
         }
-        response = self._api.request(
-            "post",
-            "/api/partstudios/d/" + did + "/w/" + wid + "/e/" + eid + "/featurescript",
-            body=body,
-        )
-        bbox_values = response.json()["result"]["message"]["value"]
+
+    @staticmethod
+    def parse_boundingBox(res_json):
+        bbox_values = res_json["result"]["message"]["value"]
         result = {}
         for item in bbox_values:
             k = item["message"]["key"]["message"]["value"]
@@ -449,3 +489,105 @@ class MyClient(Client):
             body=body,
         ).json()
         return res["result"]["message"]["value"]
+
+    def exprs2meter(self, did, wid, eid, exprs):
+        """convert a list of value expressions to meter unit in one call"""
+        if len(exprs) == 0:
+            return []
+        res = self._api.request(
+            "post",
+            self.featurescript_path(did, wid, eid),
+            body=self.exprs2meter_body(exprs),
+        ).json()
+        return self.parse_exprs2meter(res)
+
+    @staticmethod
+    def exprs2meter_body(exprs):
+        """featurescript request body of exprs2meter"""
+        return {
+            "script": "function(context is Context, queries) { "
+            + "   return [%s];"
+            % ", ".join('lookupTableEvaluate("%s") * meter' % expr for expr in exprs)
+            + "}",
+            "queries": [],
+        }
+
+    @staticmethod
+    def parse_exprs2meter(res_json):
+        return [x["message"]["value"] for x in res_json["result"]["message"]["value"]]
+
+    def eval_document(self, did, wid, eid, sketches, exprs):
+        """evaluate everything the parser needs from a part studio with a single
+        featurescript: bounding box, expression values, and plane and topology
+        (with edge midpoints) of every sketch.
+
+        Args:
+            - did (str): Document ID
+            - wid (str): Workspace ID
+            - eid (str): Element ID
+            - sketches (list): (feature ID, sketch plane geometry ID) of every sketch
+            - exprs (list): value expressions to convert to meter
+
+        Returns:
+            - dict: {"bbox": {...}, "exprs": {expr: value}, "sketches": {feat_id: (plane, topo)}}
+        """
+        res = self._api.request(
+            "post",
+            self.featurescript_path(did, wid, eid),
+            body=self.document_body(sketches, exprs),
+        )
+        return self.parse_document(btmessage.loads(res.content), sketches, exprs)
+
+    @staticmethod
+    def document_body(sketches, exprs):
+        """featurescript request body of eval_document"""
+        script = (
+            "function(context is Context, queries) { "
+            + _BOUNDING_BOX_FS
+            + "   var planes = [];"
+            "   var topos = [];"
+        )
+        for i, (feat_id, _) in enumerate(sketches):
+            script += (
+                "   {"
+                "   var q_plane = evaluateQuery(context, queries.p%d);" % i
+                + '   planes = append(planes, evSurfaceDefinition(context, {"face": q_plane[0]}));'
+                '   var sketch_id = "%s";' % feat_id
+                + _SKETCH_TOPOLOGY_FS
+                + "   topos = append(topos, topo);"
+                "   }"
+            )
+        script += (
+            "   var exprs = [%s];"
+            % ", ".join('lookupTableEvaluate("%s") * meter' % expr for expr in exprs)
+            + '   return {"bbox": bbox, "exprs": exprs, "planes": planes, "topos": topos};'
+            "}"
+        )
+        queries = [
+            {"key": "p%d" % i, "value": [plane_id]}
+            for i, (_, plane_id) in enumerate(sketches)
+        ]
+        return {"script": script, "queries": queries}
+
+    @staticmethod
+    def parse_document(res_json, sketches, exprs):
+        """split the response of document_body, each part is read by the
+        parser of the corresponding single request"""
+        parts = {}
+        for item in res_json["result"]["message"]["value"]:
+            k = item["message"]["key"]["message"]["value"]
+            parts[k] = item["message"]["value"]
+
+        planes = [MyClient.parse_face_msg(x)[0] for x in parts["planes"]["message"]["value"]]
+        topos = [
+            btmessage.sketch_topology({"result": x})
+            for x in parts["topos"]["message"]["value"]
+        ]
+        return {
+            "bbox": MyClient.parse_boundingBox({"result": parts["bbox"]}),
+            "exprs": dict(zip(exprs, MyClient.parse_exprs2meter({"result": parts["exprs"]}))),
+            "sketches": {
+                feat_id: (plane, topo)
+                for (feat_id, _), plane, topo in zip(sketches, planes, topos)
+            },
+        }
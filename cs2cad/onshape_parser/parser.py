@@ -3,6 +3,9 @@ import numpy as np
 from collections import OrderedDict
 
 from .utils import xyz_list2dict, angle_from_vector_to_x
+from .journal import is_transient
+from .expr import eval_length_expr
+from .context import DocumentContext, MissingContextData
 
 # OnShape naming to Fusion360 naming format
 EXTENT_TYPE_MAP = {
@@ -17,21 +20,61 @@ OPERATION_MAP = {
 }
 
 
-class FeatureListParser(object):
-    """A parser for OnShape feature list (construction sequence)"""
+def _resolve(value):
+    """prefetched results hold the exception if the request failed, raise it where the value is used"""
+    if isinstance(value, BaseException):
+        raise value
+    return value
+
+
+def _require(client, what):
+    """the client to request `what`, which is missing from the context"""
+    if client is None:
+        raise MissingContextData("no client to request {}".format(what))
+    return client
 
-    def __init__(self, client, did, wid, eid, data_id=None):
+
+class FeatureListParser(object):
+    """A parser for OnShape feature list (construction sequence)
+
+    Everything already fetched by earlier stages (e.g. the feature list of the
+    filter stage, or responses fetched concurrently by the async client) is taken
+    from the DocumentContext `ctx`; anything missing is requested through `client`.
+    Without a client (None), missing data raises MissingContextData.
+    With `merged`, bbox, expressions and sketches are all evaluated by one
+    featurescript (MyClient.eval_document) before parsing, and requested one by
+    one only if that script fails. The parsed bbox and sketches are stored back
+    into the context.
+    """
+
+    def __init__(self, client, did, wid, eid, data_id=None, merged=True, ctx=None):
         self.c = client
+        self.merged = merged
 
         self.did = did
         self.wid = wid
         self.eid = eid
         self.data_id = data_id
 
-        self.feature_list = self.c.get_features(did, wid, eid).json()
+        if ctx is None:
+            ctx = DocumentContext(did, wid, eid, data_id=data_id)
+        if ctx.feature_list is None:
+            client = _require(self.c, "the feature list")
+            ctx.feature_list = client.get_features(did, wid, eid).json()
+        self.ctx = ctx
 
         self.profile2sketch = {}
 
+    @staticmethod
+    def from_context(client, ctx: DocumentContext, merged=True):
+        return FeatureListParser(
+            client, ctx.did, ctx.wid, ctx.eid, data_id=ctx.data_id, merged=merged, ctx=ctx
+        )
+
+    @property
+    def feature_list(self):
+        return self.ctx.feature_list
+
     @staticmethod
     def parse_feature_param(feat_param_data):
         param_dict = {}
@@ -55,12 +98,76 @@ class FeatureListParser(object):
         return param_dict
 
     def _parse_sketch(self, feature_data):
-        sket_parser = SketchParser(self.c, feature_data, self.did, self.wid, self.eid)
+        plane, geo_topo = self.ctx.sketch_data.get(feature_data["featureId"], (None, None))
+        sket_parser = SketchParser(
+            self.c,
+            feature_data,
+            self.did,
+            self.wid,
+            self.eid,
+            plane=_resolve(plane),
+            geo_topo=_resolve(geo_topo),
+        )
         save_dict = sket_parser.parse_to_fusion360_format()
         return save_dict
 
+    def _sketch_planes(self):
+        """(feature ID, sketch plane geometry ID) of every sketch"""
+        sketches = []
+        for feat_item in self.ctx.feature_list["features"]:
+            feat_data = feat_item["message"]
+            if feat_data["featureType"] != "newSketch":
+                continue
+            param_dict = self.parse_feature_param(feat_data["parameters"])
+            if len(param_dict.get("sketchPlane", [])) > 0:
+                sketches.append((feat_data["featureId"], param_dict["sketchPlane"][0]))
+        return sketches
+
+    def prefetch(self):
+        """evaluate bbox, expressions and all sketches with a single request"""
+        sketches = self._sketch_planes()
+        exprs = self._remote_exprs()
+        client = _require(self.c, "the document evaluation")
+        doc = client.eval_document(self.did, self.wid, self.eid, sketches, exprs)
+        self.ctx.bbox_info = doc["bbox"]
+        self.ctx.expr_values = doc["exprs"]
+        self.ctx.sketch_data = doc["sketches"]
+
+    def _remote_exprs(self):
+        """depth expressions of all extrudes that can not be evaluated locally"""
+        exprs = []
+        for feat_item in self.ctx.feature_list["features"]:
+            feat_data = feat_item["message"]
+            if feat_data["featureType"] != "extrude":
+                continue
+            param_dict = self.parse_feature_param(feat_data["parameters"])
+            for key in ["depth", "secondDirectionDepth"]:
+                expr = param_dict.get(key)
+                if not isinstance(expr, str) or expr in exprs:
+                    continue
+                try:
+                    eval_length_expr(expr)
+                except ValueError:
+                    exprs.append(expr)
+        return exprs
+
     def _expr2meter(self, expr):
-        return self.c.expr2meter(self.did, self.wid, self.eid, expr)
+        """evaluate locally if possible, otherwise all remaining expressions
+        of the document are evaluated by a single FeatureScript call"""
+        try:
+            return eval_length_expr(expr)
+        except ValueError:
+            pass
+        if self.ctx.expr_values is None:
+            exprs = self._remote_exprs()
+            client = _require(self.c, "expression values")
+            values = client.exprs2meter(self.did, self.wid, self.eid, exprs)
+            self.ctx.expr_values = dict(zip(exprs, values))
+        self.ctx.expr_values = _resolve(self.ctx.expr_values)
+        if expr not in self.ctx.expr_values:
+            client = _require(self.c, "expression {}".format(expr))
+            self.ctx.expr_values[expr] = client.expr2meter(self.did, self.wid, self.eid, expr)
+        return self.ctx.expr_values[expr]
 
     def _locateSketchProfile(self, geo_ids):
         return [{"profile": k, "sketch": self.profile2sketch[k]} for k in geo_ids]
@@ -151,7 +258,11 @@ class FeatureListParser(object):
         return save_dict
 
     def _parse_boundingBox(self):
-        bbox_info = self.c.eval_boundingBox(self.did, self.wid, self.eid)
+        if self.ctx.bbox_info is not None:
+            bbox_info = _resolve(self.ctx.bbox_info)
+        else:
+            client = _require(self.c, "the bounding box")
+            bbox_info = client.eval_boundingBox(self.did, self.wid, self.eid)
         result = {
             "type": "BoundingBox3D",
             "max_point": xyz_list2dict(bbox_info["maxCorner"]),
@@ -164,14 +275,24 @@ class FeatureListParser(object):
         only sketch and extrusion are supported.
         """
         result = {"entities": OrderedDict(), "properties": {}, "sequence": []}
+        if self.merged and self.ctx.bbox_info is None:
+            try:
+                self.prefetch()
+            except Exception as e:
+                if is_transient(e):
+                    raise
+                print(self.data_id, "merged evaluation failed, one request per item:", e)
         try:
             bbox = self._parse_boundingBox()
         except Exception as e:
+            if is_transient(e) or isinstance(e, MissingContextData):
+                raise
             print(self.data_id, "bounding box failed:", e)
             return result
+        self.ctx.bbox = bbox
         result["properties"].update({"bounding_box": bbox})
 
-        for i, feat_item in enumerate(self.feature_list["features"]):
+        for i, feat_item in enumerate(self.ctx.feature_list["features"]):
             feat_data = feat_item["message"]
             feat_type = feat_data["featureType"]
             feat_Id = feat_data["featureId"]
@@ -179,6 +300,7 @@ class FeatureListParser(object):
             try:
                 if feat_type == "newSketch":
                     feat_dict = self._parse_sketch(feat_data)
+                    self.ctx.sketches[feat_Id] = feat_dict
                     for k in feat_dict["profiles"].keys():
                         self.profile2sketch.update({k: feat_Id})
                 elif feat_type == "extrude":
@@ -188,6 +310,9 @@ class FeatureListParser(object):
                         self.data_id, "unsupported feature type: {}".format(feat_type)
                     )
             except Exception as e:
+                # don't save a truncated sequence for a network error or missing context data
+                if is_transient(e) or isinstance(e, MissingContextData):
+                    raise
                 print(self.data_id, "parse feature failed:", e)
                 break
             result["entities"].update({feat_Id: feat_dict})
@@ -200,7 +325,9 @@ class FeatureListParser(object):
 class SketchParser(object):
     """A parser for OnShape sketch feature list"""
 
-    def __init__(self, client, feat_data, did, wid, eid, data_id=None):
+    def __init__(
+        self, client, feat_data, did, wid, eid, data_id=None, plane=None, geo_topo=None
+    ):
         self.c = client
         self.feat_id = feat_data["featureId"]
         self.feat_name = feat_data["name"]
@@ -211,15 +338,20 @@ class SketchParser(object):
         self.eid = eid
         self.data_id = data_id
 
-        geo_id = self.feat_param["sketchPlane"][0]
-        response = self.c.get_entity_by_id(did, wid, eid, [geo_id], "FACE")
-        self.plane = self.c.parse_face_msg(
-            response.json()["result"]["message"]["value"]
-        )[0]
-
-        self.geo_topo = self.c.eval_sketch_topology_by_adjacency(
-            did, wid, eid, self.feat_id
-        )
+        if plane is None:
+            geo_id = self.feat_param["sketchPlane"][0]
+            client = _require(self.c, "the sketch plane")
+            response = client.get_entity_by_id(did, wid, eid, [geo_id], "FACE")
+            plane = client.parse_face_msg(
+                response.json()["result"]["message"]["value"]
+            )[0]
+        self.plane = plane
+
+        if geo_topo is None:
+            geo_topo = _require(self.c, "the sketch topology").eval_sketch_topology_by_adjacency(
+                did, wid, eid, self.feat_id
+            )
+        self.geo_topo = geo_topo
         self._to_local_coordinates()
         self._build_lookup()
 
@@ -351,8 +483,12 @@ class SketchParser(object):
             #     sweep_angle = 2 * np.pi - sweep_angle
             #     start_vec = end_vec
 
-            # decide direction by middle point
-            midpoint = self.c.eval_curve_midpoint(self.did, self.wid, self.eid, edge_id)
+            # decide direction by middle point, evaluated along with the sketch topology
+            midpoint = edge_data.get("midpoint")
+            if midpoint is None:
+                midpoint = _require(self.c, "the curve midpoint").eval_curve_midpoint(
+                    self.did, self.wid, self.eid, edge_id
+                )
             mid_vec = np.array(midpoint) - self.origin
             mid_vec = np.array(
                 [
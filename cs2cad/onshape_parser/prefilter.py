@@ -0,0 +1,47 @@
+from .parser import FeatureListParser
+
+SUPPORTED_FEATURES = ["newSketch", "extrude"]
+SUPPORTED_END_BOUNDS = ["BLIND", "SYMMETRIC"]
+MIN_SEQUENCE_LEN = 2
+
+
+def extrude_rule(feat_data: dict) -> str | None:
+    """name of the rule an extrude breaks (FeatureListParser._parse_extrude would raise), None if it is fine"""
+    try:
+        param_dict = FeatureListParser.parse_feature_param(feat_data["parameters"])
+    except NotImplementedError:
+        return "unknown_parameter"
+    if param_dict.get("hasOffset") is True:
+        return "offset"
+    if param_dict.get("endBound") not in SUPPORTED_END_BOUNDS:
+        return "end_bound"
+    if (
+        param_dict.get("hasSecondDirection") is True
+        and param_dict.get("secondDirectionBound") != "BLIND"
+    ):
+        return "second_direction_bound"
+    return None
+
+
+def prefilter(feature_list: dict, min_len: int = MIN_SEQUENCE_LEN) -> tuple[str, str] | None:
+    """Reject a document from its feature list alone, before any geometry request.
+
+    The parser keeps the features before the first one it fails on, so a broken
+    extrude only rejects the document if fewer than `min_len` features precede it.
+
+    Returns:
+        (rule, detail) of the first rule that rejects the document, None if it may succeed
+    """
+    features = [item["message"] for item in feature_list["features"]]
+    for feat_data in features:
+        if feat_data["featureType"] not in SUPPORTED_FEATURES:
+            return "unsupported_feature", feat_data["featureType"]
+    if len(features) < min_len:
+        return "too_few_features", str(len(features))
+    for feat_data in features[:min_len]:
+        if feat_data["featureType"] != "extrude":
+            continue
+        rule = extrude_rule(feat_data)
+        if rule is not None:
+            return rule, feat_data["name"]
+    return None
@@ -5,15 +5,21 @@ import numpy as np
 from joblib import Parallel, delayed
 
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from terminal_app.env import PROJECT_CONFIG
 
 from .my_client import MyClient
 from .parser import FeatureListParser
+from .journal import CrawlJournal
+from .context import DocumentContext
+from .prefilter import prefilter
+from .apikey.scheduler import TokenBucket, RequestScheduler
+from .apikey.response_cache import ResponseCache
 
 
 # create instance of the OnShape client; change key to test on another stack
+# every joblib worker keeps its own pooled keep-alive session across documents
 c = MyClient(logging=False)
 
 
@@ -23,47 +29,118 @@ class ParsingStatistic:
     total: int
     valid: int
     distribution: list[tuple[int, int]]
+    rejections: dict[str, int] = field(default_factory=dict)  # pre-filter rule -> documents
 
     def __str__(self) -> str:
-        return "Total: {}\nValid: {}\nDistribution: {}".format(
+        return "Total: {}\nValid: {}\nDistribution: {}\nRejected: {}".format(
             self.total,
             self.valid,
             "\n".join(f"{n}: {cnt}" for n, cnt in self.distribution),
+            "\n".join(f"{rule}: {cnt}" for rule, cnt in sorted(self.rejections.items())),
         )
 
+    @staticmethod
+    def from_counts(
+        truck_id: str, counts: dict[str, int], rejections: dict[str, int] | None = None
+    ) -> "ParsingStatistic":
+        count = np.array(list(counts.values()), dtype=int)
+        return ParsingStatistic(
+            truck_id=truck_id,
+            total=len(count),
+            valid=int(np.sum(count > 0)),
+            distribution=[(int(n), int(np.sum(count == n))) for n in np.unique(count)],
+            rejections={} if rejections is None else rejections,
+        )
+
+    @staticmethod
+    def from_journal(
+        journal_file: Path | str, truck_id: str | None = None, data_ids=None
+    ) -> "ParsingStatistic":
+        """rebuild statistic from a crawl journal without touching the network"""
+        journal_file = Path(journal_file)
+        truck_id = journal_file.parent.name if truck_id is None else truck_id
+        journal = CrawlJournal(journal_file)
+        return ParsingStatistic.from_counts(
+            truck_id, journal.counts(data_ids), journal.rejections(data_ids)
+        )
+
+
+def save_result(
+    data_id: str, result: dict, save_path: str, journal: CrawlJournal | None = None
+) -> int:
+    if len(result["sequence"]) < 2:
+        if journal is not None:
+            journal.fail(data_id, "sequence too short: {}".format(len(result["sequence"])))
+        return 0
+    with open(save_path, "w") as fp:
+        json.dump(result, fp, indent=1)
+    if journal is not None:
+        journal.record(data_id, "parsed", n=len(result["sequence"]))
+    return len(result["sequence"])
+
 
 def process_one(
-    data_id: str, link: str, save_dir: Path | str = PROJECT_CONFIG.DOCUMENT_DIR
+    data_id: str,
+    link: str,
+    save_dir: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    journal: CrawlJournal | None = None,
+    scheduler: RequestScheduler | None = None,
+    response_cache: ResponseCache | None = None,
+) -> int:
+    # the client is shared by every call in this process, restore what it used before
+    previous = c._api.scheduler, c._api.cache
+    if scheduler is not None:
+        c._api.scheduler = scheduler
+    if response_cache is not None:
+        c._api.cache = response_cache
+    try:
+        return _process_one(data_id, link, save_dir, journal)
+    finally:
+        c._api.scheduler, c._api.cache = previous
+
+
+def _process_one(
+    data_id: str, link: str, save_dir: Path | str, journal: CrawlJournal | None
 ) -> int:
     save_path = os.path.join(save_dir, "{}.json".format(data_id))
     if os.path.exists(save_path):
+        if journal is not None:
+            with open(save_path, "r") as fp:
+                n = len(json.load(fp)["sequence"])
+            journal.record(data_id, "parsed", n=n)
+            return n
         return 1
 
-    v_list = link.split("/")
-    did, wid, eid = v_list[-5], v_list[-3], v_list[-1]
+    ctx = DocumentContext.from_link(link, data_id=data_id)
 
-    # filter data that use operations other than sketch + extrude
+    # reject data that can't be parsed (e.g. operations other than sketch + extrude)
+    # from the feature list alone; the list is handed on to the parser through ctx
     try:
-        ofs_data = c.get_features(did, wid, eid).json()
-        for item in ofs_data["features"]:
-            if item["message"]["featureType"] not in ["newSketch", "extrude"]:
-                return 0
+        ctx.feature_list = c.get_features(ctx.did, ctx.wid, ctx.eid).json()
+        rejected = prefilter(ctx.feature_list)
+        if rejected is not None:
+            if journal is not None:
+                journal.fail(data_id, "rejected {}: {}".format(*rejected), rule=rejected[0])
+            return 0
     except Exception as e:
         print("[{}], contain unsupported features:".format(data_id), e)
+        if journal is not None:
+            journal.fail(data_id, "get features", e)
         return 0
 
+    if journal is not None:
+        journal.record(data_id, "fetched")
+
     # parse detailed cad operations
     try:
-        parser = FeatureListParser(c, did, wid, eid, data_id=data_id)
+        parser = FeatureListParser.from_context(c, ctx)
         result = parser.parse()
     except Exception as e:
         print("[{}], feature parsing fails:".format(data_id), e)
+        if journal is not None:
+            journal.fail(data_id, "feature parsing", e)
         return 0
-    if len(result["sequence"]) < 2:
-        return 0
-    with open(save_path, "w") as fp:
-        json.dump(result, fp, indent=1)
-    return len(result["sequence"])
+    return save_result(data_id, result, save_path, journal)
 
 
 def process_many(
@@ -71,7 +148,77 @@ def process_many(
     truck_id: str | None = None,
     n_jobs: int = -1,
     save_dir: Path | str = PROJECT_CONFIG.DOCUMENT_DIR,
+    retry_transient: bool = True,
+    rate_limit: float | None = None,
+    response_cache: ResponseCache | None = None,
 ) -> tuple[Path, ParsingStatistic]:
+    """Crawl and parse every link of a yml file into `save_dir/truck_id`.
+
+    Progress is kept in `save_dir/truck_id/journal.jsonl`: a rerun only processes
+    links that were never finished or failed with a transient (network) error.
+    With `rate_limit` (requests per second) all workers share one token bucket;
+    429/5xx responses are retried with backoff in any case.
+    With a `response_cache`, unchanged documents are re-parsed from disk
+    (or only from disk if the cache is offline).
+    """
+    save_dir, truck_id, dwe_data, journal, todo = load_todo(
+        links_yml_file, truck_id, save_dir, retry_transient
+    )
+
+    print(f"n_jobs: {n_jobs}")
+
+    scheduler = make_scheduler(save_dir, rate_limit)
+    all_counters = Parallel(n_jobs=n_jobs, verbose=2)(
+        delayed(process_counted)(data_id, link, save_dir, journal, scheduler, response_cache)
+        for data_id, link in todo.items()
+    )
+    for counters in all_counters:
+        scheduler.merge(counters)
+    print("requests: {}".format(scheduler.counters()))
+
+    statistic = ParsingStatistic.from_counts(
+        truck_id, journal.counts(dwe_data.keys()), journal.rejections(dwe_data.keys())
+    )
+
+    return save_dir, statistic
+
+
+def process_counted(
+    data_id: str,
+    link: str,
+    save_dir: Path | str,
+    journal: CrawlJournal | None,
+    scheduler: RequestScheduler,
+    response_cache: ResponseCache | None = None,
+) -> dict[str, float]:
+    """process_one on a child of `scheduler`, returns the request counters to merge into it"""
+    child = scheduler.child()
+    process_one(data_id, link, save_dir, journal, child, response_cache)
+    return child.counters()
+
+
+def make_scheduler(
+    save_dir: Path, rate_limit: float | None = None, shared: bool = True
+) -> RequestScheduler:
+    """scheduler of a crawl; with `rate_limit` and `shared` its token bucket is shared by
+    every worker process through `save_dir/scheduler.json`, otherwise no file is used"""
+    if rate_limit is None:
+        return RequestScheduler()
+    if not shared:
+        return RequestScheduler(TokenBucket(rate_limit))
+    state_file = save_dir / "scheduler.json"
+    if state_file.exists():
+        state_file.unlink()  # tokens of this run only
+    return RequestScheduler(TokenBucket(rate_limit, path=state_file))
+
+
+def load_todo(
+    links_yml_file: Path | str,
+    truck_id: str | None,
+    save_dir: Path | str,
+    retry_transient: bool = True,
+) -> tuple[Path, str, dict[str, str], CrawlJournal, dict[str, str]]:
+    """read the links of a truck and select the ones its journal still needs"""
     if isinstance(links_yml_file, str):
         links_yml_file = Path(links_yml_file)
 
@@ -92,21 +239,17 @@ def process_many(
 
     total_n = len(dwe_data)
 
-    print("Processing truck: {}".format(truck_id))
-    print(f"n_jobs: {n_jobs}")
-    print(f"total_n: {total_n}")
-
-    count = Parallel(n_jobs=n_jobs, verbose=2)(
-        delayed(process_one)(data_id, link, save_dir)
+    journal = CrawlJournal(save_dir / "journal.jsonl")
+    states = journal.load()
+    todo = {
+        data_id: link
         for data_id, link in dwe_data.items()
-    )
-    count = np.array(count)
+        if journal.needs_work(states.get(data_id), retry_transient)
+    }
+    journal.record_many([d for d in todo if d not in states], "pending")
 
-    statistic = ParsingStatistic(
-        truck_id=truck_id,
-        total=total_n,
-        valid=int(np.sum(count > 0)),
-        distribution=[(int(n), int(np.sum(count == n))) for n in np.unique(count)],
-    )
+    print("Processing truck: {}".format(truck_id))
+    print(f"total_n: {total_n}")
+    print(f"todo: {len(todo)}")
 
-    return save_dir, statistic
+    return save_dir, truck_id, dwe_data, journal, todo
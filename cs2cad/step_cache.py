@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from cs2cad.cadlib.extrude import CADSequence
+
+
+class StepCache:
+    """Content-addressed store of built STEP files.
+
+    Files are keyed by `CADSequence.digest()` of the normalized sequence, so
+    duplicated part studios are built once and then served by hardlink
+    (or by copy when the cache and the target are on different devices).
+
+    Layout: `<cache_dir>/<key[:2]>/<key>.step`
+    """
+
+    def __init__(self, cache_dir: Path | str, link: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(cad_seq: CADSequence) -> str:
+        return cad_seq.digest()
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.step"
+
+    def __contains__(self, key: str) -> bool:
+        return self.path(key).exists()
+
+    def _place(self, src: Path, dst: Path):
+        """hardlink or copy src to dst, replacing dst atomically"""
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dst.parent, suffix=".tmp")
+        os.close(fd)
+        os.remove(tmp)
+        try:
+            if self.link:
+                try:
+                    os.link(src, tmp)
+                except OSError:
+                    shutil.copyfile(src, tmp)
+            else:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get(self, key: str, save_file: Path | str) -> bool:
+        """serve a cached model to save_file. Returns False on miss."""
+        cached = self.path(key)
+        if not cached.exists():
+            self.misses += 1
+            return False
+        self._place(cached, Path(save_file))
+        self.hits += 1
+        return True
+
+    def put(self, key: str, save_file: Path | str):
+        """store a freshly built STEP file under key"""
+        cached = self.path(key)
+        if cached.exists():
+            return
+        self._place(Path(save_file), cached)
@@ -3,17 +3,17 @@ from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeEdge, BRepBuilderAPI_Mak
 from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakePrism
 from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse, BRepAlgoAPI_Common
 from OCC.Core.GC import GC_MakeArcOfCircle
-from OCC.Extend.DataExchange import write_stl_file
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopAbs import TopAbs_REVERSED
+from OCC.Extend.TopologyUtils import TopologyExplorer
 from OCC.Core.Bnd import Bnd_Box
 from OCC.Core.BRepBndLib import brepbndlib_Add
 from copy import copy
 from .extrude import *
 from .sketch import Loop, Profile
 from .curves import *
-import os
-import trimesh
-from trimesh.sample import sample_surface
-import random
 
 
 def vec2CADsolid(vec, is_numerical=True, n=256):
@@ -117,17 +117,94 @@ def point_local2global(point, sketch_plane: CoordSystem, to_gp_Pnt=True):
     return g_point
 
 
-def CADsolid2pc(shape, n_points, name=None):
-    """convert opencascade solid to point clouds"""
+def shape2mesh(shape, linear_deflection=0.9, angular_deflection=0.5):
+    """triangulate an opencascade shape in memory, with the deflections write_stl_file uses.
+
+    Returns:
+        vertices (np.array): (V, 3) float64
+        triangles (np.array): (T, 3) int64 vertex indices, oriented as their B-rep face
+        face_ids (np.array): (T,) int64 index of the B-rep face each triangle comes from
+    """
+    BRepMesh_IncrementalMesh(shape, linear_deflection, False, angular_deflection, True)
+    vertices, triangles, face_ids = [], [], []
+    n_vertices = 0
+    for i, face in enumerate(TopologyExplorer(shape).faces()):
+        loc = TopLoc_Location()
+        poly = BRep_Tool.Triangulation(face, loc)
+        if poly is None or poly.IsNull():
+            continue
+        trsf = loc.Transformation()
+        nodes = np.array([poly.Node(j).Transformed(trsf).Coord() for j in range(1, poly.NbNodes() + 1)])
+        tris = np.array([poly.Triangle(j).Get() for j in range(1, poly.NbTriangles() + 1)], dtype=np.int64)
+        tris += n_vertices - 1 # 1-based, per face
+        if face.Orientation() == TopAbs_REVERSED:
+            tris = tris[:, [0, 2, 1]]
+        vertices.append(nodes)
+        triangles.append(tris)
+        face_ids.append(np.full(len(tris), i, dtype=np.int64))
+        n_vertices += len(nodes)
+    if len(triangles) == 0:
+        raise ValueError("shape has no triangulation")
+    return np.concatenate(vertices, axis=0), np.concatenate(triangles, axis=0), np.concatenate(face_ids)
+
+
+def sample_mesh(vertices, triangles, n_points, face_ids=None, rng=None):
+    """draw n_points uniformly from the surface of a triangle mesh, all at once.
+    Triangles are picked by area through one searchsorted over the cumulative areas,
+    so the cost is linear in n_points and the number of triangles.
+
+    Args:
+        vertices (np.array): (V, 3)
+        triangles (np.array): (T, 3) vertex indices
+        n_points (int): number of points
+        face_ids (np.array, optional): (T,) id of each triangle, e.g. the B-rep face from shape2mesh
+        rng (optional): np.random.Generator, the global np.random state if None
+
+    Returns:
+        points (np.array): (n_points, 3)
+        normals (np.array): (n_points, 3) unit normals of the sampled triangles
+        point_face_ids (np.array): (n_points,) face_ids of the sampled triangles, None without face_ids
+    """
+    rng = np.random if rng is None else rng
+    corners = vertices[triangles]
+    origin = corners[:, 0]
+    edge_1 = corners[:, 1] - origin
+    edge_2 = corners[:, 2] - origin
+    cross = np.cross(edge_1, edge_2)
+    double_area = np.linalg.norm(cross, axis=1)
+    cum_area = np.cumsum(double_area)
+    if len(cum_area) == 0 or cum_area[-1] <= 0:
+        raise ValueError("mesh has no area")
+    # side="right" never lands on a zero-area triangle; a draw rounded up to the total area
+    # would land past the end and goes to the last triangle with an area instead
+    tri_idx = np.searchsorted(cum_area, rng.random(n_points) * cum_area[-1], side="right")
+    tri_idx = np.minimum(tri_idx, np.flatnonzero(double_area)[-1])
+
+    # uniform barycentric coordinates, points beyond the diagonal are folded back
+    uv = rng.random((n_points, 2))
+    outside = uv.sum(axis=1) > 1
+    uv[outside] = 1 - uv[outside]
+    points = origin[tri_idx] + uv[:, :1] * edge_1[tri_idx] + uv[:, 1:] * edge_2[tri_idx]
+    normals = cross[tri_idx] / double_area[tri_idx, np.newaxis]
+    point_face_ids = None if face_ids is None else np.asarray(face_ids)[tri_idx]
+    return points, normals, point_face_ids
+
+
+def CADsolid2pc(shape, n_points, name=None, with_normal=False, with_face_id=False):
+    """convert opencascade solid to point clouds. name is unused, the mesh never touches the disk
+
+    Returns:
+        out_pc (np.array): (n_points, 3), or a tuple (out_pc, normals, face_ids) with
+            the (n_points, 3) unit normals and the (n_points,) B-rep face index of each point
+            for with_normal and with_face_id respectively
+    """
     bbox = Bnd_Box()
     brepbndlib_Add(shape, bbox)
     if bbox.IsVoid():
         raise ValueError("box check failed")
 
-    if name is None:
-        name = random.randint(100000, 999999)
-    write_stl_file(shape, "tmp_out_{}.stl".format(name))
-    out_mesh = trimesh.load("tmp_out_{}.stl".format(name))
-    os.system("rm tmp_out_{}.stl".format(name))
-    out_pc, _ = sample_surface(out_mesh, n_points)
-    return out_pc
+    vertices, triangles, face_ids = shape2mesh(shape)
+    out_pc, normals, point_face_ids = sample_mesh(vertices, triangles, n_points, face_ids)
+    if not with_normal and not with_face_id:
+        return out_pc
+    return (out_pc,) + ((normals,) if with_normal else ()) + ((point_face_ids,) if with_face_id else ())
@@ -5,13 +5,13 @@ import numpy as np
 import random
 import h5py
 from joblib import Parallel, delayed
-from trimesh.sample import sample_surface
 import argparse
 import sys
 sys.path.append("..")
 from cadlib.extrude import CADSequence
 from cadlib.visualize import CADsolid2pc, create_CAD
 from utils.pc_utils import write_ply, read_ply
+from utils.pc_store import PointCloudStore
 
 DATA_ROOT = "../data"
 RAW_DATA = os.path.join(DATA_ROOT, "cad_json")
@@ -22,6 +22,8 @@ WRITE_NORMAL = False
 SAVE_DIR = os.path.join(DATA_ROOT, "pc_cad")
 if not os.path.exists(SAVE_DIR):
     os.makedirs(SAVE_DIR)
+STORE_DIR = os.path.join(DATA_ROOT, "pc_cad_store") # used with --store, points only
+STORE = None
 
 INVALID_IDS = []
 
@@ -50,17 +52,24 @@ def process_one(data_id):
         return None
 
     try:
-        out_pc = CADsolid2pc(shape, N_POINTS, data_id.split("/")[-1])
+        if WRITE_NORMAL:
+            out_pc, normals = CADsolid2pc(shape, N_POINTS, data_id.split("/")[-1], with_normal=True)
+        else:
+            out_pc, normals = CADsolid2pc(shape, N_POINTS, data_id.split("/")[-1]), None
     except Exception as e:
         print("convert point cloud failed:", data_id)
         return None
 
+    if STORE is not None:
+        STORE.append(data_id, out_pc)
+        return
+
     save_path = os.path.join(SAVE_DIR, data_id + ".ply")
     truck_dir = os.path.dirname(save_path)
     if not os.path.exists(truck_dir):
         os.makedirs(truck_dir)
 
-    write_ply(out_pc, save_path)
+    write_ply(out_pc, save_path, normals=normals)
 
 
 with open(RECORD_FILE, "r") as fp:
@@ -71,7 +80,10 @@ with open(RECORD_FILE, "r") as fp:
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--only_test', action="store_true", help="only convert test data")
+parser.add_argument('--store', action="store_true", help="append to one point cloud store instead of a ply per model")
 args = parser.parse_args()
+if args.store:
+    STORE = PointCloudStore(STORE_DIR, N_POINTS)
 
 if not args.only_test:
     Parallel(n_jobs=10, verbose=2)(delayed(process_one)(x) for x in all_data["train"])
@@ -3,52 +3,147 @@ import glob
 import h5py
 import numpy as np
 import argparse
-from joblib import Parallel, delayed
-import random
+from multiprocessing import Pool
+try:
+    from multiprocessing import shared_memory
+except ImportError: # python < 3.8, forked pool workers inherit the ground truth instead
+    shared_memory = None
+from functools import lru_cache, partial
 from scipy.spatial import cKDTree as KDTree
 import time
 import sys
 sys.path.append("..")
-from utils import read_ply
+from utils import read_ply, PointCloudStore
 from cadlib.visualize import vec2CADsolid, CADsolid2pc
 
 
 PC_ROOT = "../data/pc_cad"
+PC_STORE = "../data/pc_cad_store" # read instead of PC_ROOT if it exists
 # data that is unable to process
 SKIP_DATA = [""]
 
+# subsampled ground truth of the evaluated ids, (M, n_points, 3) float32 in shared memory if available
+GT_INDEX = {} # data_id -> row of GT_PCS
+GT_PCS = None
+QUERY_WORKERS = -1 # cKDTree query threads, one per process in a pool
+_gt_shm = None
+gt_store = None # PointCloudStore of the ground truth, opened by the main process if PC_STORE exists
 
-def chamfer_dist(gt_points, gen_points, offset=0, scale=1):
+
+def _query_kwarg():
+    """name of the cKDTree.query thread count argument, `n_jobs` before scipy 1.6"""
+    try:
+        KDTree(np.zeros((1, 3))).query(np.zeros((1, 3)), workers=1)
+    except TypeError:
+        return "n_jobs"
+    return "workers"
+
+
+QUERY_KWARG = _query_kwarg()
+
+
+def chamfer_dist(gt_points, gen_points, offset=0, scale=1, gt_points_kd_tree=None):
     gen_points = gen_points / scale - offset
 
     # one direction
     gen_points_kd_tree = KDTree(gen_points)
-    one_distances, one_vertex_ids = gen_points_kd_tree.query(gt_points)
+    one_distances, one_vertex_ids = gen_points_kd_tree.query(gt_points, **{QUERY_KWARG: QUERY_WORKERS})
     gt_to_gen_chamfer = np.mean(np.square(one_distances))
 
     # other direction
-    gt_points_kd_tree = KDTree(gt_points)
-    two_distances, two_vertex_ids = gt_points_kd_tree.query(gen_points)
+    if gt_points_kd_tree is None:
+        gt_points_kd_tree = KDTree(gt_points)
+    two_distances, two_vertex_ids = gt_points_kd_tree.query(gen_points, **{QUERY_KWARG: QUERY_WORKERS})
     gen_to_gt_chamfer = np.mean(np.square(two_distances))
 
     return gt_to_gen_chamfer + gen_to_gt_chamfer
 
 
+def path2id(path):
+    data_id = path.split('/')[-1].split('.')[0][:8]
+    return data_id[:4], data_id
+
+
+def read_gt_pc(truck_id, data_id):
+    if gt_store is not None:
+        return gt_store.get(truck_id + '/' + data_id)
+    gt_pc_path = os.path.join(PC_ROOT, truck_id, data_id + '.ply')
+    if not os.path.exists(gt_pc_path):
+        return None
+    return read_ply(gt_pc_path)
+
+
+def load_gt_pcs(filepaths, n_points):
+    """read and subsample the ground truth of every path once, into one shared memory block
+
+    Returns:
+        shm (SharedMemory): holds the clouds, to be unlinked by the caller. None on python < 3.8
+        index (dict): data_id -> row
+        gt_pcs (np.array): (M, n_points, 3) float32 clouds, a view of shm if there is one
+    """
+    index, pcs = {}, []
+    for path in filepaths:
+        truck_id, data_id = path2id(path)
+        if data_id in index:
+            continue
+        gt_pc = read_gt_pc(truck_id, data_id)
+        if gt_pc is None:
+            continue
+        sample_idx = np.random.choice(gt_pc.shape[0], n_points, replace=False)
+        index[data_id] = len(pcs)
+        pcs.append(gt_pc[sample_idx])
+
+    shape = (len(pcs), n_points, 3)
+    if shared_memory is None:
+        shm, gt_pcs = None, np.empty(shape, dtype=np.float32)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 4))
+        gt_pcs = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+    for i, pc in enumerate(pcs):
+        gt_pcs[i] = pc
+    return shm, index, gt_pcs
+
+
+def attach_gt_pcs(shm_name, index, n_points, query_workers):
+    """pool initializer: map the ground truth block of the parent process.
+    Without a block (shm_name None) GT_PCS was set before the pool forked and is inherited."""
+    global GT_INDEX, GT_PCS, QUERY_WORKERS, _gt_shm
+    if shm_name is not None:
+        _gt_shm = shared_memory.SharedMemory(name=shm_name) # keep a reference, GT_PCS views its buffer
+        GT_PCS = np.ndarray((len(index), n_points, 3), dtype=np.float32, buffer=_gt_shm.buf)
+    GT_INDEX = index
+    QUERY_WORKERS = query_workers
+    gt_kd_tree.cache_clear()
+
+
+def detach_gt_pcs():
+    global GT_PCS, _gt_shm
+    gt_kd_tree.cache_clear()
+    GT_PCS = None # drop the view before closing the buffer
+    if _gt_shm is not None:
+        _gt_shm.close()
+        _gt_shm = None
+
+
+@lru_cache(maxsize=1024)
+def gt_kd_tree(data_id):
+    """KD-tree of a subsampled ground truth, built once per id and process"""
+    return KDTree(GT_PCS[GT_INDEX[data_id]])
+
+
 def normalize_pc(points):
     scale = np.max(np.abs(points))
     points = points / scale
     return points
 
 
-def process_one(path):
+def process_one(path, n_points):
     with h5py.File(path, 'r') as fp:
         out_vec = fp["out_vec"][:].astype(np.float)
         # gt_vec = fp["gt_vec"][:].astype(np.float)
 
-    data_id = path.split('/')[-1].split('.')[0][:8]
-    truck_id = data_id[:4]
-    gt_pc_path = os.path.join(PC_ROOT, truck_id, data_id + '.ply')
-    if not os.path.exists(gt_pc_path):
+    truck_id, data_id = path2id(path)
+    if data_id not in GT_INDEX:
         return None
 
     try:
@@ -58,7 +153,7 @@ def process_one(path):
         return None
     
     try:
-        out_pc = CADsolid2pc(shape, args.n_points, data_id)
+        out_pc = CADsolid2pc(shape, n_points, data_id)
     except Exception as e:
         print("convert pc failed:", data_id)
         return None
@@ -66,15 +161,39 @@ def process_one(path):
     if np.max(np.abs(out_pc)) > 2: # normalize out-of-bound data
         out_pc = normalize_pc(out_pc)
 
-    gt_pc = read_ply(gt_pc_path)
-    sample_idx = random.sample(list(range(gt_pc.shape[0])), args.n_points)
-    gt_pc = gt_pc[sample_idx]
-
-    cd = chamfer_dist(gt_pc, out_pc)
+    gt_pc = GT_PCS[GT_INDEX[data_id]]
+    cd = chamfer_dist(gt_pc, out_pc, gt_points_kd_tree=gt_kd_tree(data_id))
     return cd
 
 
+def evaluate_sequential(filepaths, save_path, record_res, n_points):
+    """evaluate one by one, resuming from and appending to the record file"""
+    n_processed = len(record_res) - 3 if record_res is not None else 0
+    dists = []
+    for i in range(len(filepaths)):
+        print("processing[{}] {}".format(i, filepaths[i]))
+        data_id = filepaths[i].split('/')[-1].split('.')[0]
+
+        if record_res is not None and i < n_processed:
+            record_dist = record_res[i].split('\t')[-1][:-1]
+            record_dist = None if record_dist == 'None' else eval(record_dist)
+            dists.append(record_dist)
+            continue
+
+        if data_id in SKIP_DATA:
+            print("skip {}".format(data_id))
+            res = None
+        else:
+            res = process_one(filepaths[i], n_points)
+        with open(save_path, 'a') as fp:
+            print("{}\t{}\t{}".format(i, data_id, res), file=fp)
+        dists.append(res)
+
+    return dists
+
+
 def run(args):
+    global GT_PCS
     filepaths = sorted(glob.glob(os.path.join(args.src, "*.h5")))
     if args.num != -1:
         filepaths = filepaths[:args.num]
@@ -89,30 +208,26 @@ def run(args):
         else:
             with open(save_path, 'r') as fp:
                 record_res = fp.readlines()
-                n_processed = len(record_res) - 3
 
-    if args.parallel:
-        dists = Parallel(n_jobs=8, verbose=2)(delayed(process_one)(x) for x in filepaths)
+    shm, index, gt_pcs = load_gt_pcs(filepaths, args.n_points)
+    shm_name = None
+    if shm is None:
+        GT_PCS = gt_pcs # set before the pool forks
     else:
-        dists = []
-        for i in range(len(filepaths)):
-            print("processing[{}] {}".format(i, filepaths[i]))
-            data_id = filepaths[i].split('/')[-1].split('.')[0]
-
-            if record_res is not None and i < n_processed:
-                record_dist = record_res[i].split('\t')[-1][:-1]
-                record_dist = None if record_dist == 'None' else eval(record_dist)
-                dists.append(record_dist)
-                continue
-
-            if data_id in SKIP_DATA:
-                print("skip {}".format(data_id))
-                res = None
-            else:
-                res = process_one(filepaths[i])
-            with open(save_path, 'a') as fp:
-                print("{}\t{}\t{}".format(i, data_id, res), file=fp)
-            dists.append(res)
+        shm_name = shm.name
+    try:
+        if args.parallel:
+            # one query thread per worker, the pool already fills the cores
+            with Pool(8, initializer=attach_gt_pcs, initargs=(shm_name, index, args.n_points, 1)) as pool:
+                dists = pool.map(partial(process_one, n_points=args.n_points), filepaths, chunksize=16)
+        else:
+            attach_gt_pcs(shm_name, index, args.n_points, -1)
+            dists = evaluate_sequential(filepaths, save_path, record_res, args.n_points)
+    finally:
+        detach_gt_pcs()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
 
     valid_dists = [x for x in dists if x is not None]
     valid_dists = sorted(valid_dists)
@@ -136,16 +251,19 @@ def run(args):
               file=fp)
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--src', type=str, default=None, required=True)
-parser.add_argument('--n_points', type=int, default=2000)
-parser.add_argument('--num', type=int, default=-1)
-parser.add_argument('--parallel', action='store_true', help="use parallelization")
-args = parser.parse_args()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--src', type=str, default=None, required=True)
+    parser.add_argument('--n_points', type=int, default=2000)
+    parser.add_argument('--num', type=int, default=-1)
+    parser.add_argument('--parallel', action='store_true', help="use parallelization")
+    args = parser.parse_args()
+
+    gt_store = PointCloudStore(PC_STORE) if os.path.exists(os.path.join(PC_STORE, "meta.json")) else None
 
-print(args.src)
-print("SKIP DATA:", SKIP_DATA)
-since = time.time()
-run(args)
-end = time.time()
-print("running time: {}s".format(end - since))
+    print(args.src)
+    print("SKIP DATA:", SKIP_DATA)
+    since = time.time()
+    run(args)
+    end = time.time()
+    print("running time: {}s".format(end - since))
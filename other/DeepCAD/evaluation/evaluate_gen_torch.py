@@ -12,13 +12,14 @@ from scipy.stats import entropy
 from sklearn.neighbors import NearestNeighbors
 import sys
 sys.path.append("..")
-from utils import read_ply
+from utils import read_ply, PointCloudStore
 
 N_POINTS = 2000
 
 random.seed(1234)
 
 PC_ROOT = "../data/pc_cad"
+PC_STORE = "../data/pc_cad_store" # read instead of PC_ROOT if it exists
 RECORD_FILE = "../data/train_val_test_split.json"
 
 
@@ -222,12 +223,19 @@ def collect_test_set_pcs(args):
     select_idx = random.sample(list(range(len(all_data))), args.n_test + 5)
     all_data = [all_data[x] for x in select_idx]
 
+    store = PointCloudStore(PC_STORE) if os.path.exists(os.path.join(PC_STORE, "meta.json")) else None
+
     ref_pcs = []
     for data_id in all_data:
-        pc_path = os.path.join(PC_ROOT, data_id + '.ply')
-        if not os.path.exists(pc_path):
-            continue
-        pc = read_ply(pc_path)
+        if store is not None:
+            pc = store.get(data_id)
+            if pc is None:
+                continue
+        else:
+            pc_path = os.path.join(PC_ROOT, data_id + '.ply')
+            if not os.path.exists(pc_path):
+                continue
+            pc = read_ply(pc_path)
         if pc.shape[0] > N_POINTS:
             pc = downsample_pc(pc, N_POINTS)
 
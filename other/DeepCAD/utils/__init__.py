@@ -1,2 +1,3 @@
 from .file_utils import *
 from .pc_utils import *
+from .pc_store import *
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import socket
+import numpy as np
+
+
+class PointCloudStore(object):
+    """Point clouds of a whole dataset in a few memory-mapped float32 files.
+
+    Every writer appends to a shard of its own, so parallel workers need no locking:
+        root/meta.json          {"n_points": P}
+        root/<shard>.f32        raw little-endian float32, (n, P, 3)
+        root/<shard>.ids        one data id per line, line i names row i of the .f32 file
+    Shards are named <creation time in ns>_<hostname>_<pid>, a writer creates a new one
+    whenever it is opened. Rows are written before their id, a reader only sees complete
+    clouds and ignores what a crashed writer left half written. Readers map each shard
+    once; store[data_id] is a (P, 3) view into the map, nothing is copied. If an id was
+    appended more than once, the latest write wins.
+    """
+    def __init__(self, root, n_points=None):
+        self.root = root
+        meta_path = os.path.join(root, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as fp:
+                self.n_points = json.load(fp)["n_points"]
+            if n_points is not None and n_points != self.n_points:
+                raise ValueError("store has {} points per cloud, not {}".format(self.n_points, n_points))
+        elif n_points is None:
+            raise FileNotFoundError(meta_path)
+        else:
+            os.makedirs(root, exist_ok=True)
+            tmp_path = meta_path + ".{}".format(os.getpid())
+            with open(tmp_path, "w") as fp:
+                json.dump({"n_points": n_points}, fp)
+            os.replace(tmp_path, meta_path)
+            self.n_points = n_points
+        self._maps = None
+        self._index = None
+        self._writer = None
+        self._writer_pid = None
+
+    def __getstate__(self):
+        # maps and file handles are reopened in the process that uses them
+        state = self.__dict__.copy()
+        state.update(_maps=None, _index=None, _writer=None, _writer_pid=None)
+        return state
+
+    @property
+    def row_bytes(self):
+        return self.n_points * 3 * 4
+
+    def _shards(self):
+        """shard names in creation order"""
+        return sorted(name[:-len(".ids")] for name in os.listdir(self.root) if name.endswith(".ids"))
+
+    def _load(self):
+        maps, index = {}, {}
+        for shard in self._shards():
+            with open(os.path.join(self.root, shard + ".ids"), "r") as fp:
+                lines = fp.read().split("\n")[:-1] # a last line without newline is still being written
+            if len(lines) == 0:
+                continue
+            maps[shard] = np.memmap(os.path.join(self.root, shard + ".f32"), dtype="<f4", mode="r",
+                                    shape=(len(lines), self.n_points, 3))
+            index.update({data_id: (shard, i) for i, data_id in enumerate(lines)})
+        self._maps, self._index = maps, index
+
+    @property
+    def index(self):
+        """data id -> (shard, row)"""
+        if self._index is None:
+            self._load()
+        return self._index
+
+    def refresh(self):
+        """pick up clouds appended since the store was opened"""
+        self._maps = None
+        self._index = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, data_id):
+        return data_id in self.index
+
+    def ids(self):
+        return list(self.index.keys())
+
+    def __getitem__(self, data_id):
+        shard, i = self.index[data_id]
+        return self._maps[shard][i]
+
+    def get(self, data_id, default=None):
+        if data_id not in self.index:
+            return default
+        return self[data_id]
+
+    def _open_writer(self):
+        shard = "{:020d}_{}_{}".format(time.time_ns(), socket.gethostname(), os.getpid())
+        self._writer = (open(os.path.join(self.root, shard + ".f32"), "ab"),
+                        open(os.path.join(self.root, shard + ".ids"), "a"))
+        self._writer_pid = os.getpid()
+
+    def append(self, data_id, points):
+        """add a (n_points, 3) cloud from this process"""
+        points = np.ascontiguousarray(points, dtype="<f4")
+        if points.shape != (self.n_points, 3):
+            raise ValueError("expected ({}, 3) points, got {}".format(self.n_points, points.shape))
+        if "\n" in data_id:
+            raise ValueError("data id contains a newline: {!r}".format(data_id))
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._open_writer()
+        data_fp, ids_fp = self._writer
+        data_fp.write(points.tobytes())
+        data_fp.flush()
+        ids_fp.write(data_id + "\n")
+        ids_fp.flush()
+
+    def close(self):
+        if self._writer is not None and self._writer_pid == os.getpid():
+            for fp in self._writer:
+                fp.close()
+        self._writer = None
+        self._writer_pid = None
+        self.refresh()
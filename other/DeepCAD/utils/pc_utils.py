@@ -1,21 +1,86 @@
 import numpy as np
 from plyfile import PlyData, PlyElement
 
+VERTEX_PROPERTIES = ['x', 'y', 'z']
+NORMAL_PROPERTIES = ['nx', 'ny', 'nz']
+_FLOAT_TYPES = ['float', 'float32']
 
-def read_ply(path):
+
+def _read_header(f):
+    """vertex count and property names of a binary little-endian PLY holding only float vertices,
+    None for anything else (the file is then read by plyfile). f is left at the start of the body."""
+    if f.readline().strip() != b'ply':
+        return None
+    n_vertices, names, element = None, [], None
+    while True:
+        line = f.readline()
+        if not line:
+            return None
+        words = line.split()
+        if len(words) == 0 or words[0] in [b'comment', b'obj_info']:
+            continue
+        if words[0] == b'end_header':
+            break
+        if words[0] == b'format':
+            if words[1] != b'binary_little_endian':
+                return None
+        elif words[0] == b'element':
+            if element is not None or words[1] != b'vertex':
+                return None
+            element = words[1]
+            n_vertices = int(words[2])
+        elif words[0] == b'property':
+            if element is None or words[1].decode() not in _FLOAT_TYPES:
+                return None
+            names.append(words[2].decode())
+        else:
+            return None
+    if n_vertices is None or names[:3] != VERTEX_PROPERTIES:
+        return None
+    return n_vertices, names
+
+
+def read_ply(path, with_normal=False):
+    """ output: Nx3 (Nx6 with normals) float32 points of a PLY file.
+    Binary little-endian float vertices are read in one np.fromfile, other files by plyfile. """
+    columns = VERTEX_PROPERTIES + NORMAL_PROPERTIES if with_normal else VERTEX_PROPERTIES
     with open(path, 'rb') as f:
+        header = _read_header(f)
+        if header is not None and all(c in header[1] for c in columns):
+            n_vertices, names = header
+            body = np.fromfile(f, dtype='<f4', count=n_vertices * len(names))
+            if body.size != n_vertices * len(names):
+                raise ValueError("truncated PLY body: {}".format(path))
+            body = body.reshape(n_vertices, len(names))
+            if names[:len(columns)] == columns:
+                return np.ascontiguousarray(body[:, :len(columns)])
+            return body[:, [names.index(c) for c in columns]]
+
+        f.seek(0)
         plydata = PlyData.read(f)
-        x = np.array(plydata['vertex']['x'])
-        y = np.array(plydata['vertex']['y'])
-        z = np.array(plydata['vertex']['z'])
-        vertex = np.stack([x, y, z], axis=1)
+        vertex = np.stack([np.asarray(plydata['vertex'][c]) for c in columns], axis=1)
     return vertex
 
 
-def write_ply(points, filename, text=False):
-    """ input: Nx3, write points to filename as PLY format. """
-    points = [(points[i,0], points[i,1], points[i,2]) for i in range(points.shape[0])]
-    vertex = np.array(points, dtype=[('x', 'f4'), ('y', 'f4'),('z', 'f4')])
-    el = PlyElement.describe(vertex, 'vertex', comments=['vertices'])
+def write_ply(points, filename, text=False, normals=None):
+    """ input: Nx3 (and Nx3 normals), write points to filename as PLY format.
+    The binary file is the same as plyfile writes, but the header and the point buffer
+    are written directly. """
+    names = VERTEX_PROPERTIES if normals is None else VERTEX_PROPERTIES + NORMAL_PROPERTIES
+    if normals is not None:
+        points = np.concatenate([points, normals], axis=1)
+    points = np.ascontiguousarray(points, dtype='<f4')
+    if text:
+        # zero-copy view as one record per point
+        vertex = points.view([(name, '<f4') for name in names]).reshape(-1)
+        el = PlyElement.describe(vertex, 'vertex', comments=['vertices'])
+        with open(filename, mode='wb') as f:
+            PlyData([el], text=text).write(f)
+        return
+
+    header = "ply\nformat binary_little_endian 1.0\nelement vertex {}\ncomment vertices\n".format(len(points))
+    header += "".join("property float {}\n".format(name) for name in names)
+    header += "end_header\n"
     with open(filename, mode='wb') as f:
-        PlyData([el], text=text).write(f)
+        f.write(header.encode('ascii'))
+        f.write(points.data)
@@ -21,6 +21,7 @@ setup(
         "trimesh",
         "PyYAML",
         "joblib",
+        "httpx",
         "terminal_app @ git+https://github.com/antonio-projects-studio/terminal_app.git",
     ],
 )
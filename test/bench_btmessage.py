@@ -0,0 +1,131 @@
+"""Parse time and peak memory of a sketch topology response: json + MyClient.parse_sketch_topology
+against orjson + btmessage.sketch_topology.
+
+Recorded response bodies (raw `res.content` of eval_sketch_topology_by_adjacency) can be given
+as arguments; otherwise a synthetic response of a large sketch is generated in the same format.
+"""
+import sys
+import json
+import time
+import random
+import tracemalloc
+from pathlib import Path
+
+from cs2cad.onshape_parser import btmessage
+from cs2cad.onshape_parser.my_client import MyClient
+
+N_EDGES = [100, 1000, 10000]
+N_REPEAT = 5
+
+
+def number(v, unit=True):
+    msg = {"value": v, "typeTag": ""}
+    if unit:
+        msg["unitToPower"] = [{"key": "METER", "value": 1}]
+    return {"type": 1817, "typeName": "BTFSValueWithUnits" if unit else "BTFSValueNumber", "message": msg}
+
+
+def string(s):
+    return {"type": 1422, "typeName": "BTFSValueString", "message": {"value": s, "typeTag": ""}}
+
+
+def array(items, tag=""):
+    return {"type": 1499, "typeName": "BTFSValueArray", "message": {"value": items, "typeTag": tag}}
+
+
+def vmap(entries, tag=""):
+    value = [
+        {"type": 2077, "typeName": "BTFSValueMapEntry", "message": {"key": string(k), "value": v}}
+        for k, v in entries.items()
+    ]
+    return {"type": 2062, "typeName": "BTFSValueMap", "message": {"value": value, "typeTag": tag}}
+
+
+def vector(xyz):
+    return array([number(x) for x in xyz], tag="Vector")
+
+
+def rand3():
+    return [random.uniform(-1, 1) for _ in range(3)]
+
+
+def coord_system():
+    return vmap(
+        {
+            "origin": vector(rand3()),
+            "xAxis": array([number(x, unit=False) for x in (1.0, 0.0, 0.0)]),
+            "zAxis": array([number(x, unit=False) for x in (0.0, 0.0, 1.0)]),
+        },
+        tag="CoordSystem",
+    )
+
+
+def make_response(n_edges, seed=0):
+    """sketch topology response with one region per 10 edges, half lines and half arcs"""
+    random.seed(seed)
+    vertices = [vmap({"id": string("V%d" % i), "param": vector(rand3())}) for i in range(n_edges)]
+    edges = []
+    for i in range(n_edges):
+        if i % 2 == 0:
+            param = vmap({"origin": vector(rand3()), "direction": array([number(x, unit=False) for x in rand3()])}, tag="Line")
+        else:
+            param = vmap({"coordSystem": coord_system(), "radius": number(random.random())}, tag="Circle")
+        edges.append(
+            vmap(
+                {
+                    "id": string("E%d" % i),
+                    "vertices": array([string("V%d" % i), string("V%d" % ((i + 1) % n_edges))]),
+                    "param": param,
+                    "midpoint": vector(rand3()),
+                }
+            )
+        )
+    faces = [
+        vmap(
+            {
+                "id": string("F%d" % i),
+                "edges": array([string("E%d" % j) for j in range(i, min(i + 10, n_edges))]),
+                "param": vmap({"coordSystem": coord_system()}, tag="Plane"),
+            }
+        )
+        for i in range(0, n_edges, 10)
+    ]
+    topo = vmap({"faces": array(faces), "edges": array(edges), "vertices": array(vertices)})
+    return json.dumps({"result": topo}).encode("utf-8")
+
+
+def reference(content):
+    return MyClient.parse_sketch_topology(json.loads(content))
+
+
+def fast(content):
+    return btmessage.sketch_topology(btmessage.loads(content))
+
+
+def measure(fn, content):
+    times = []
+    for _ in range(N_REPEAT):
+        start = time.perf_counter()
+        out = fn(content)
+        times.append(time.perf_counter() - start)
+        del out
+    tracemalloc.start()
+    out = fn(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sorted(times)[len(times) // 2], peak, out
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        samples = [(Path(p).name, Path(p).read_bytes()) for p in sys.argv[1:]]
+    else:
+        samples = [("synthetic {} edges".format(n), make_response(n)) for n in N_EDGES]
+
+    for name, content in samples:
+        t_ref, mem_ref, out_ref = measure(reference, content)
+        t_fast, mem_fast, out_fast = measure(fast, content)
+        assert out_ref == out_fast, name
+        print("{} ({:.1f} MB)".format(name, len(content) / 2**20))
+        print("    json + parse_sketch_topology:      {:8.2f} ms  peak {:8.2f} MB".format(t_ref * 1e3, mem_ref / 2**20))
+        print("    orjson + btmessage.sketch_topology: {:8.2f} ms  peak {:8.2f} MB".format(t_fast * 1e3, mem_fast / 2**20))
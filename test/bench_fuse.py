@@ -0,0 +1,48 @@
+"""Compare create_CAD fuse modes on Join chains of up to MAX_N_EXT extrudes with several profiles each."""
+import time
+import numpy as np
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.BRepGProp import brepgprop_VolumeProperties
+
+from cs2cad.cadlib.extrude import CADSequence
+from cs2cad.cadlib.macro import MAX_N_EXT
+from cs2cad.cadlib.visualize import create_CAD, FUSE_MODES
+
+from synthetic import make_sequence_dict
+
+N_PROFILES = 3
+N_REPEAT = 5
+
+
+def volume(shape):
+    props = GProp_GProps()
+    brepgprop_VolumeProperties(shape, props)
+    return props.Mass()
+
+
+def bench(cad_seq, fuse_mode):
+    times = []
+    for _ in range(N_REPEAT):
+        start = time.perf_counter()
+        shape = create_CAD(cad_seq, fuse_mode=fuse_mode)
+        times.append(time.perf_counter() - start)
+    return np.median(times), volume(shape)
+
+
+if __name__ == "__main__":
+    print("{:>6} {:>8} {:>10} {:>10} {:>10} {:>8} {:>8}".format(
+        "n_ext", "n_ops", *["{}(ms)".format(m) for m in FUSE_MODES], "tree x", "multi x"))
+    for n_ext in range(2, MAX_N_EXT + 1):
+        data = make_sequence_dict(n_ext, n_profiles=N_PROFILES, seed=n_ext)
+        cad_seq = CADSequence.from_dict(data)
+        cad_seq.normalize()
+
+        res = {mode: bench(cad_seq, mode) for mode in FUSE_MODES}
+        ref_volume = res["linear"][1]
+        for mode, (_, vol) in res.items():
+            assert abs(vol - ref_volume) <= 1e-6 * max(abs(ref_volume), 1.0), (mode, vol, ref_volume)
+
+        t = {mode: res[mode][0] for mode in FUSE_MODES}
+        print("{:>6} {:>8} {:>10.2f} {:>10.2f} {:>10.2f} {:>8.2f} {:>8.2f}".format(
+            n_ext, len(cad_seq.seq), *[t[m] * 1000 for m in FUSE_MODES],
+            t["linear"] / t["tree"], t["linear"] / t["multi"]))
@@ -0,0 +1,65 @@
+"""Request rate of Onshape.request with and without the pooled keep-alive session.
+
+A local HTTP/1.1 server stands in for the Onshape API and answers every call with
+a small json body, so the numbers only show the per-request connection overhead
+(TCP setup here; a TLS handshake on the real API comes on top of it).
+"""
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from cs2cad.onshape_parser.apikey.onshape import Onshape
+
+N_REQUESTS = 1000
+BODY = json.dumps({"result": {"message": {"value": 0.025}}}).encode("utf-8")
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def bench(api):
+    start = time.perf_counter()
+    for _ in range(N_REQUESTS):
+        api.request("post", "/api/partstudios/d/0/w/0/e/0/featurescript", body={"script": ""}).json()
+    return N_REQUESTS / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stack = "http://127.0.0.1:{}".format(server.server_port)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        creds = Path(tmp) / "creds.json"
+        creds.write_text(json.dumps({stack: {"access_key": "key", "secret_key": "secret"}}))
+        single = Onshape(stack, creds=creds, logging=False, url_logging=False, keep_alive=False)
+        pooled = Onshape(stack, creds=creds, logging=False, url_logging=False, keep_alive=True)
+
+        rate_single = bench(single)
+        rate_pooled = bench(pooled)
+        pooled.close()
+    server.shutdown()
+
+    print("requests:   {}".format(N_REQUESTS))
+    print("new conn:   {:8.1f} req/s".format(rate_single))
+    print("keep-alive: {:8.1f} req/s".format(rate_pooled))
+    print("speedup:    {:8.2f} x".format(rate_pooled / rate_single))
@@ -0,0 +1,85 @@
+"""Bytes per parsed model of the cadlib object model, measured with tracemalloc.
+
+"unslotted" parses with a copy of the working tree cadlib whose class bodies have their
+__slots__ removed, loaded into a temporary package; every profile is expanded into Loop
+and curve objects. "slotted" is the same with the cadlib of the working tree, so the two
+differ only in __slots__. "lazy" keeps the profiles in their ProfileArrays, as parsing
+does by default.
+"""
+import ast
+import sys
+import json
+import types
+import tempfile
+import importlib
+import tracemalloc
+from pathlib import Path
+
+from cs2cad.cadlib.extrude import CADSequence
+
+SCALE = 100 # copies of every sample, tracemalloc slows parsing down a lot
+DATA_DIR = Path(__file__).parent
+CADLIB_DIR = Path(__file__).resolve().parents[1] / "cs2cad" / "cadlib"
+SAMPLES = [DATA_DIR / "json" / "test.json"] + sorted((DATA_DIR / "data" / "media" / "document" / "gear").glob("*.json"))
+
+
+def strip_slots(source):
+    """source without the `__slots__ = ...` statements of its class bodies"""
+    lines = source.splitlines(keepends=True)
+    for node in ast.walk(ast.parse(source)):
+        if not isinstance(node, ast.ClassDef):
+            continue
+        for stmt in node.body:
+            if isinstance(stmt, ast.Assign) and any(getattr(t, "id", None) == "__slots__" for t in stmt.targets):
+                # keep the line count, a bare `pass` also keeps a body that only had __slots__ valid
+                lines[stmt.lineno - 1:stmt.end_lineno] = ["    pass\n"] + ["\n"] * (stmt.end_lineno - stmt.lineno)
+    return "".join(lines)
+
+
+def load_unslotted(tmp_dir):
+    """import cadlib.extrude without __slots__ under the package name unslotted_cadlib"""
+    for path in CADLIB_DIR.glob("*.py"):
+        (Path(tmp_dir) / path.name).write_text(strip_slots(path.read_text()))
+    # a bare package: its __init__ would import visualize (OCC), only the object model is needed
+    package = types.ModuleType("unslotted_cadlib")
+    package.__path__ = [str(tmp_dir)]
+    sys.modules["unslotted_cadlib"] = package
+    return importlib.import_module("unslotted_cadlib.extrude")
+
+
+def parse(cad_sequence, data, expand):
+    models = [cad_sequence.from_dict(d) for d in data for _ in range(SCALE)]
+    if expand:
+        for model in models:
+            for ext in model.seq:
+                ext.profile.children # builds the loops and curves, drops the arrays
+    return models
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    models = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size / len(models), models
+
+
+if __name__ == "__main__":
+    data = [json.load(open(path)) for path in SAMPLES]
+    print("samples: {}, scaled to {} models".format(len(data), len(data) * SCALE))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        unslotted = load_unslotted(tmp_dir)
+        unslotted_size, models = measure(lambda: parse(unslotted.CADSequence, data, expand=True))
+        del models
+    slotted_size, models = measure(lambda: parse(CADSequence, data, expand=True))
+    del models
+    lazy_size, models = measure(lambda: parse(CADSequence, data, expand=False))
+
+    print("unslotted: {:10.0f} bytes/model".format(unslotted_size))
+    print("slotted:   {:10.0f} bytes/model, __slots__ saves {:.1f} %".format(
+        slotted_size, (1 - slotted_size / unslotted_size) * 100))
+    print("lazy:      {:10.0f} bytes/model, ProfileArrays save another {:.1f} %".format(
+        lazy_size, (1 - lazy_size / slotted_size) * 100))
@@ -0,0 +1,71 @@
+"""Write/read time of point cloud PLY files: the plyfile path (a tuple per point, one copy per column)
+against utils.pc_utils of DeepCAD (one buffer write, one np.fromfile read). Both write identical files."""
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from plyfile import PlyData, PlyElement
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "other" / "DeepCAD"))
+from utils.pc_utils import read_ply, write_ply
+
+N_POINTS = [2000, 8096, 100000]
+N_FILES = 50
+
+
+def write_ply_plyfile(points, filename, normals=None):
+    if normals is None:
+        points = [(points[i, 0], points[i, 1], points[i, 2]) for i in range(points.shape[0])]
+        vertex = np.array(points, dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4')])
+    else:
+        points = [(points[i, 0], points[i, 1], points[i, 2], normals[i, 0], normals[i, 1], normals[i, 2])
+                  for i in range(points.shape[0])]
+        vertex = np.array(points, dtype=[('x', 'f4'), ('y', 'f4'), ('z', 'f4'),
+                                         ('nx', 'f4'), ('ny', 'f4'), ('nz', 'f4')])
+    el = PlyElement.describe(vertex, 'vertex', comments=['vertices'])
+    with open(filename, mode='wb') as f:
+        PlyData([el]).write(f)
+
+
+def read_ply_plyfile(path, with_normal=False):
+    with open(path, 'rb') as f:
+        plydata = PlyData.read(f)
+        columns = ['x', 'y', 'z', 'nx', 'ny', 'nz'] if with_normal else ['x', 'y', 'z']
+        return np.stack([np.array(plydata['vertex'][c]) for c in columns], axis=1)
+
+
+def bench(fn, args_list):
+    start = time.perf_counter()
+    out = [fn(*args) for args in args_list]
+    return (time.perf_counter() - start) / len(args_list), out
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    print("{:>8} {:>7} {:>14} {:>12} {:>8} {:>14} {:>12} {:>8}".format(
+        "n_points", "normals", "write ply(ms)", "write(ms)", "x", "read ply(ms)", "read(ms)", "x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for n_points in N_POINTS:
+            for with_normal in [False, True]:
+                clouds = [rng.uniform(-1, 1, (n_points, 3)) for _ in range(N_FILES)]
+                normals = [rng.uniform(-1, 1, (n_points, 3)) if with_normal else None for _ in range(N_FILES)]
+                ref_paths = [tmp / "ref_{}.ply".format(i) for i in range(N_FILES)]
+                new_paths = [tmp / "new_{}.ply".format(i) for i in range(N_FILES)]
+
+                t_write_ref, _ = bench(write_ply_plyfile, list(zip(clouds, ref_paths, normals)))
+                t_write_new, _ = bench(lambda pc, path, n: write_ply(pc, path, normals=n),
+                                       list(zip(clouds, new_paths, normals)))
+                for ref, new in zip(ref_paths, new_paths):
+                    assert ref.read_bytes() == new.read_bytes(), new
+
+                t_read_ref, ref_pcs = bench(read_ply_plyfile, [(p, with_normal) for p in ref_paths])
+                t_read_new, new_pcs = bench(read_ply, [(p, with_normal) for p in ref_paths])
+                for ref, new in zip(ref_pcs, new_pcs):
+                    assert ref.dtype == new.dtype and np.array_equal(ref, new)
+
+                print("{:>8} {:>7} {:>14.3f} {:>12.3f} {:>8.1f} {:>14.3f} {:>12.3f} {:>8.1f}".format(
+                    n_points, str(with_normal), t_write_ref * 1000, t_write_new * 1000,
+                    t_write_ref / t_write_new, t_read_ref * 1000, t_read_new * 1000, t_read_ref / t_read_new))
@@ -0,0 +1,32 @@
+"""Timings of single-prism vs two-prism-fuse construction for symmetric and two-sided
+extrudes. Both give the same solids, see test_prism.py."""
+import time
+import numpy as np
+
+from cs2cad.cadlib.extrude import CADSequence
+from cs2cad.cadlib.visualize import create_by_extrude
+
+from synthetic import EXTENT_CASES, make_sequence_dict
+
+N_REPEAT = 5
+
+
+def bench(extrude_ops, single_prism):
+    times = []
+    for _ in range(N_REPEAT):
+        start = time.perf_counter()
+        for op in extrude_ops:
+            create_by_extrude(op, single_prism=single_prism)
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+if __name__ == "__main__":
+    for case, kwargs in EXTENT_CASES.items():
+        cad_seq = CADSequence.from_dict(make_sequence_dict(10, n_profiles=3, seed=1, **kwargs))
+        cad_seq.normalize()
+
+        t_fuse = bench(cad_seq.seq, single_prism=False)
+        t_prism = bench(cad_seq.seq, single_prism=True)
+        print("{:<24} n={:<3} fuse: {:8.2f}ms  prism: {:8.2f}ms  speedup: {:.2f}x".format(
+            case, len(cad_seq.seq), t_fuse * 1000, t_prism * 1000, t_fuse / t_prism))
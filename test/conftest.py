@@ -0,0 +1,2 @@
+# test_api.py and test_yml.py are scripts that query the Onshape API when imported
+collect_ignore = ["test_api.py", "test_yml.py"]
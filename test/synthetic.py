@@ -0,0 +1,105 @@
+"""Synthetic CAD sequences in the fusion360 gallery json format, used by the benchmark scripts."""
+import random
+
+# extent settings of the symmetric and two-sided extrudes, keyword arguments of make_sequence_dict
+EXTENT_CASES = {
+    "symmetric": dict(extent_type="SymmetricFeatureExtentType"),
+    "two sides": dict(extent_type="TwoSidesFeatureExtentType", extent_two=0.03),
+    "two sides, overlapping": dict(extent_type="TwoSidesFeatureExtentType", extent_two=-0.01),
+}
+
+
+def _xyz(x, y, z=0.0):
+    return {"x": x, "y": y, "z": z}
+
+
+def circle_loop(cx, cy, r):
+    return {
+        "is_outer": True,
+        "profile_curves": [
+            {"type": "Circle3D", "center_point": _xyz(cx, cy), "radius": r, "normal": _xyz(0.0, 0.0, 1.0)}
+        ],
+    }
+
+
+def rect_loop(x0, y0, w, h):
+    corners = [(x0, y0), (x0 + w, y0), (x0 + w, y0 + h), (x0, y0 + h)]
+    curves = [
+        {"type": "Line3D", "start_point": _xyz(*corners[i]), "end_point": _xyz(*corners[(i + 1) % 4])}
+        for i in range(4)
+    ]
+    return {"is_outer": True, "profile_curves": curves}
+
+
+def make_sequence_dict(
+    n_ext,
+    n_profiles=3,
+    operations=None,
+    extent_type="OneSideFeatureExtentType",
+    extent_two=0.0,
+    seed=0,
+):
+    """build a json dict with n_ext extrudes, each using n_profiles overlapping profiles.
+
+    Args:
+        n_ext (int): number of extrude features
+        n_profiles (int): profiles per extrude, alternating circles and rectangles
+        operations (list, optional): operation per extrude, defaults to NewBody followed by Joins
+        extent_type (str): extent type of every extrude
+        extent_two (float): second distance, used by TwoSidesFeatureExtentType
+        seed (int): random seed
+    """
+    rnd = random.Random(seed)
+    if operations is None:
+        operations = ["NewBodyFeatureOperation"] + ["JoinFeatureOperation"] * (n_ext - 1)
+
+    entities, sequence = {}, []
+    max_abs = 0.0
+    for i in range(n_ext):
+        z = 0.01 * i
+        profiles = {}
+        for k in range(n_profiles):
+            cx, cy = rnd.uniform(-0.08, 0.08), rnd.uniform(-0.08, 0.08)
+            size = rnd.uniform(0.01, 0.04)
+            loop = circle_loop(cx, cy, size) if k % 2 == 0 else rect_loop(cx - size, cy - size, 2 * size, 1.5 * size)
+            profiles["P{}_{}".format(i, k)] = {"loops": [loop], "properties": {}}
+            max_abs = max(max_abs, abs(cx) + 2 * size, abs(cy) + 2 * size)
+        entities["S{}".format(i)] = {
+            "name": "Sketch {}".format(i + 1),
+            "type": "Sketch",
+            "profiles": profiles,
+            "transform": {
+                "origin": _xyz(0.0, 0.0, z),
+                "x_axis": _xyz(1.0, 0.0, 0.0),
+                "y_axis": _xyz(0.0, 1.0, 0.0),
+                "z_axis": _xyz(0.0, 0.0, 1.0),
+            },
+            "reference_plane": {},
+        }
+
+        extent_one = rnd.uniform(0.02, 0.05)
+        max_abs = max(max_abs, z + extent_one, extent_two)
+        entities["E{}".format(i)] = {
+            "name": "Extrude {}".format(i + 1),
+            "type": "ExtrudeFeature",
+            "profiles": [{"profile": p, "sketch": "S{}".format(i)} for p in profiles],
+            "operation": operations[i],
+            "start_extent": {"type": "ProfilePlaneStartDefinition"},
+            "extent_type": extent_type,
+            "extent_one": {"distance": {"value": extent_one}},
+            "extent_two": {"distance": {"value": extent_two}},
+        }
+        sequence.append({"index": 2 * i, "type": "Sketch", "entity": "S{}".format(i)})
+        sequence.append({"index": 2 * i + 1, "type": "ExtrudeFeature", "entity": "E{}".format(i)})
+
+    return {
+        "entities": entities,
+        "properties": {
+            "bounding_box": {
+                "type": "BoundingBox3D",
+                "max_point": _xyz(max_abs, max_abs, max_abs),
+                "min_point": _xyz(-max_abs, -max_abs, -max_abs),
+            }
+        },
+        "sequence": sequence,
+    }
@@ -0,0 +1,82 @@
+"""encode_batch/decode_batch must match the CADSequence object path."""
+import copy
+import glob
+import json
+import os
+
+import pytest
+
+pytest.importorskip("cs2cad.cadlib.codec")
+import numpy as np
+from cs2cad.cadlib.codec import encode_batch, to_cad_sequences
+from cs2cad.cadlib.extrude import CADSequence
+from cs2cad.cadlib.macro import *
+from synthetic import make_sequence_dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = [os.path.join(HERE, "json", "test.json")] + \
+          sorted(glob.glob(os.path.join(HERE, "data", "media", "document", "gear", "*.json")))
+
+
+def all_stats():
+    return [json.load(open(path)) for path in SAMPLES] + \
+           [make_sequence_dict(6, seed=0),
+            make_sequence_dict(4, extent_type="SymmetricFeatureExtentType", seed=1),
+            make_sequence_dict(4, extent_type="TwoSidesFeatureExtentType", extent_two=0.03, seed=2),
+            make_sequence_dict(12, n_profiles=1, seed=3)]
+
+
+def object_vector(stat):
+    cad_seq = CADSequence.from_dict(stat)
+    cad_seq.normalize()
+    cad_seq.numericalize()
+    vec = cad_seq.to_vector(MAX_N_EXT, MAX_N_LOOPS, MAX_N_CURVES, MAX_TOTAL_LEN, pad=True)
+    if vec is None or len(vec) > MAX_TOTAL_LEN:
+        return None
+    return vec
+
+
+def test_encode_batch():
+    stats = all_stats()
+    vecs, valid, reasons = encode_batch(stats, return_reasons=True)
+    assert vecs.shape == (len(stats), MAX_TOTAL_LEN, 1 + N_ARGS)
+    assert np.any(valid) and not np.all(valid)
+    for stat, vec, is_valid, reason in zip(stats, vecs, valid, reasons):
+        expected = object_vector(stat)
+        assert is_valid == (expected is not None) == (reason is None)
+        if is_valid:
+            assert np.array_equal(vec, expected)
+        else:
+            assert np.all(vec == EOS_VEC)
+
+
+def test_encode_batch_reasons():
+    stat = make_sequence_dict(2, seed=0)
+    unsupported = copy.deepcopy(stat)
+    profile = next(iter(unsupported["entities"]["S0"]["profiles"].values()))
+    profile["loops"][0]["profile_curves"][0]["type"] = "Spline3D"
+    missing = copy.deepcopy(stat)
+    del missing["properties"]
+    _, valid, reasons = encode_batch([stat, unsupported, missing, make_sequence_dict(12, n_profiles=1)],
+                                     return_reasons=True)
+    assert valid.tolist() == [True, False, False, False]
+    assert reasons[0] is None
+    assert reasons[1].startswith("NotImplementedError")
+    assert reasons[2].startswith("KeyError")
+    assert reasons[3] == "too many extrudes"
+
+
+def test_encode_batch_raises_bugs():
+    stat = make_sequence_dict(2, seed=0)
+    stat["entities"]["E0"]["extent_one"]["distance"]["value"] = "0.1"
+    with pytest.raises(TypeError):
+        encode_batch([stat])
+
+
+def test_decode():
+    vecs, valid = encode_batch(all_stats())
+    indices = np.flatnonzero(valid)
+    for i, cad_seq in zip(indices, to_cad_sequences(vecs, indices=indices)):
+        expected = CADSequence.from_vector(vecs[i], is_numerical=True)
+        assert cad_seq.digest() == expected.digest()
+        np.testing.assert_allclose(cad_seq.to_vector(pad=False), expected.to_vector(pad=False))
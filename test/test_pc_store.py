@@ -0,0 +1,123 @@
+"""PointCloudStore of DeepCAD: parallel writers, crashed writers, pickling and refresh."""
+import os
+import sys
+import pickle
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other", "DeepCAD"))
+pytest.importorskip("utils.pc_store")
+import numpy as np
+from utils.pc_store import PointCloudStore
+
+N_POINTS = 16
+
+
+def cloud(value):
+    return np.full((N_POINTS, 3), value, dtype=np.float32)
+
+
+def append_range(root, start, stop):
+    store = PointCloudStore(root)
+    for i in range(start, stop):
+        store.append("{:04d}".format(i), cloud(i))
+    store.close()
+
+
+@pytest.fixture
+def fork():
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("needs the fork start method")
+    return multiprocessing.get_context("fork")
+
+
+def test_append_get(tmp_path):
+    store = PointCloudStore(str(tmp_path), N_POINTS)
+    store.append("a", cloud(1))
+    store.append("b", cloud(2))
+    store.close()
+
+    store = PointCloudStore(str(tmp_path))
+    assert store.n_points == N_POINTS
+    assert len(store) == 2 and "a" in store and "c" not in store
+    assert sorted(store.ids()) == ["a", "b"]
+    np.testing.assert_array_equal(store["b"], cloud(2))
+    assert store.get("c") is None
+    with pytest.raises(ValueError):
+        PointCloudStore(str(tmp_path), N_POINTS + 1)
+    with pytest.raises(ValueError):
+        store.append("c", np.zeros((N_POINTS + 1, 3)))
+    with pytest.raises(FileNotFoundError):
+        PointCloudStore(str(tmp_path / "missing"))
+
+
+def test_parallel_appends(tmp_path, fork):
+    PointCloudStore(str(tmp_path), N_POINTS)
+    with fork.Pool(4) as pool:
+        pool.starmap(append_range, [(str(tmp_path), i * 50, (i + 1) * 50) for i in range(8)])
+
+    store = PointCloudStore(str(tmp_path))
+    assert len(store) == 400
+    for i in range(400):
+        np.testing.assert_array_equal(store["{:04d}".format(i)], cloud(i))
+
+
+def test_ignore_truncated_writes(tmp_path):
+    store = PointCloudStore(str(tmp_path), N_POINTS)
+    for i in range(3):
+        store.append(str(i), cloud(i))
+    store.close()
+    # the writer died after writing half a row and half an id
+    shard = os.path.join(str(tmp_path), store._shards()[0])
+    with open(shard + ".f32", "ab") as fp:
+        fp.write(cloud(9).tobytes()[:N_POINTS * 6])
+    with open(shard + ".ids", "a") as fp:
+        fp.write("9")
+    assert sorted(PointCloudStore(str(tmp_path)).ids()) == ["0", "1", "2"]
+
+    store = PointCloudStore(str(tmp_path))
+    store.append("3", cloud(3))
+    store.close()
+    assert len(store._shards()) == 2 and store._shards()[0] == os.path.basename(shard)
+    assert sorted(store.ids()) == ["0", "1", "2", "3"]
+    for i in range(4):
+        np.testing.assert_array_equal(store[str(i)], cloud(i))
+
+
+def test_pickle(tmp_path):
+    store = PointCloudStore(str(tmp_path), N_POINTS)
+    store.append("a", cloud(1))
+    assert len(store) == 1
+    copy = pickle.loads(pickle.dumps(store))
+    assert copy._maps is None and copy._writer is None
+    np.testing.assert_array_equal(copy["a"], cloud(1))
+    store.close()
+
+
+def test_refresh(tmp_path):
+    writer = PointCloudStore(str(tmp_path), N_POINTS)
+    writer.append("a", cloud(1))
+    reader = PointCloudStore(str(tmp_path))
+    assert len(reader) == 1
+    writer.append("b", cloud(2))
+    assert "b" not in reader
+    reader.refresh()
+    np.testing.assert_array_equal(reader["b"], cloud(2))
+    writer.close()
+
+
+def test_duplicate_ids_last_write_wins(tmp_path, fork):
+    store = PointCloudStore(str(tmp_path), N_POINTS)
+    store.append("x", cloud(1))
+    store.close()
+    child = fork.Process(target=append_range, args=(str(tmp_path), 7, 8))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    store.append("0007", cloud(2)) # after close() this goes to a new shard, newer than the child's
+    store.close()
+    np.testing.assert_array_equal(store["0007"], cloud(2))
+    store.append("0007", cloud(3)) # and within a shard the later row wins
+    store.close()
+    np.testing.assert_array_equal(store["0007"], cloud(3))
@@ -0,0 +1,111 @@
+"""read_ply/write_ply of DeepCAD: round trips, byte equality with plyfile and the plyfile fallback."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other", "DeepCAD"))
+pytest.importorskip("plyfile")
+pytest.importorskip("utils.pc_utils")
+import numpy as np
+from plyfile import PlyData, PlyElement
+from utils.pc_utils import read_ply, write_ply, _read_header
+
+N_POINTS = 100
+XYZ = [('x', '<f4'), ('y', '<f4'), ('z', '<f4')]
+NORMALS = [('nx', '<f4'), ('ny', '<f4'), ('nz', '<f4')]
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).uniform(-1, 1, (N_POINTS, 3)).astype(np.float32)
+
+
+@pytest.fixture
+def normals():
+    return np.random.default_rng(1).uniform(-1, 1, (N_POINTS, 3)).astype(np.float32)
+
+
+def write_plyfile(path, columns, dtype, text=False, byte_order='=', comments=('vertices',), extra=()):
+    """the vertex element as plyfile writes it, columns (N, len(dtype))"""
+    vertex = np.empty(len(columns), dtype=dtype)
+    for i, (name, _) in enumerate(dtype):
+        vertex[name] = columns[:, i]
+    elements = [PlyElement.describe(vertex, 'vertex', comments=list(comments))] + list(extra)
+    with open(path, 'wb') as f:
+        PlyData(elements, text=text, byte_order=byte_order).write(f)
+
+
+def fast_path(path):
+    """True if read_ply reads the file without plyfile"""
+    with open(path, 'rb') as f:
+        return _read_header(f) is not None
+
+
+def read_plyfile(path, names):
+    with open(path, 'rb') as f:
+        vertex = PlyData.read(f)['vertex']
+        return np.stack([np.asarray(vertex[name]) for name in names], axis=1)
+
+
+def test_points(tmp_path, points):
+    write_ply(points, str(tmp_path / "new.ply"))
+    write_plyfile(str(tmp_path / "ref.ply"), points, XYZ)
+    assert (tmp_path / "new.ply").read_bytes() == (tmp_path / "ref.ply").read_bytes()
+    assert fast_path(str(tmp_path / "new.ply"))
+    result = read_ply(str(tmp_path / "new.ply"))
+    assert result.dtype == np.float32 and result.flags['C_CONTIGUOUS']
+    np.testing.assert_array_equal(result, points)
+
+
+def test_points_with_normals(tmp_path, points, normals):
+    write_ply(points, str(tmp_path / "new.ply"), normals=normals)
+    write_plyfile(str(tmp_path / "ref.ply"), np.concatenate([points, normals], axis=1), XYZ + NORMALS)
+    assert (tmp_path / "new.ply").read_bytes() == (tmp_path / "ref.ply").read_bytes()
+    np.testing.assert_array_equal(read_ply(str(tmp_path / "new.ply"), with_normal=True),
+                                  np.concatenate([points, normals], axis=1))
+    np.testing.assert_array_equal(read_ply(str(tmp_path / "new.ply")), points)
+
+
+def test_text(tmp_path, points, normals):
+    write_ply(points, str(tmp_path / "new.ply"), text=True, normals=normals)
+    write_plyfile(str(tmp_path / "ref.ply"), np.concatenate([points, normals], axis=1), XYZ + NORMALS, text=True)
+    assert (tmp_path / "new.ply").read_bytes() == (tmp_path / "ref.ply").read_bytes()
+    np.testing.assert_allclose(read_ply(str(tmp_path / "new.ply"), with_normal=True),
+                               np.concatenate([points, normals], axis=1), rtol=1e-6)
+
+
+@pytest.mark.parametrize("case", ["double", "big_endian", "reordered", "extra_property", "faces", "no_normals"])
+def test_plyfile_fallback(tmp_path, points, normals, case):
+    path = str(tmp_path / "case.ply")
+    columns = np.concatenate([points, normals], axis=1)
+    if case == "double":
+        write_plyfile(path, columns, [(name, '<f8') for name, _ in XYZ + NORMALS])
+    elif case == "big_endian":
+        write_plyfile(path, columns, [(name, '>f4') for name, _ in XYZ + NORMALS], byte_order='>')
+    elif case == "reordered":
+        write_plyfile(path, columns[:, [3, 4, 5, 0, 1, 2]], NORMALS + XYZ)
+    elif case == "extra_property":
+        write_plyfile(path, np.concatenate([columns, np.ones((N_POINTS, 1))], axis=1), XYZ + NORMALS + [('red', 'u1')])
+    elif case == "faces":
+        faces = np.array([([0, 1, 2],)], dtype=[('vertex_indices', 'i4', (3,))])
+        write_plyfile(path, columns, XYZ + NORMALS, extra=[PlyElement.describe(faces, 'face')])
+    else:
+        write_plyfile(path, points, XYZ)
+
+    assert fast_path(path) == (case == "no_normals") # which has no normals to read fast
+    np.testing.assert_array_equal(read_ply(path), read_plyfile(path, ['x', 'y', 'z']))
+    if case == "no_normals":
+        with pytest.raises(ValueError):
+            read_ply(path, with_normal=True)
+    else:
+        np.testing.assert_array_equal(read_ply(path, with_normal=True),
+                                      read_plyfile(path, ['x', 'y', 'z', 'nx', 'ny', 'nz']))
+
+
+def test_truncated(tmp_path, points):
+    path = tmp_path / "new.ply"
+    write_ply(points, str(path))
+    path.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(ValueError):
+        read_ply(str(path))
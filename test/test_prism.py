@@ -0,0 +1,39 @@
+"""create_by_extrude with a single prism must build the same solid as the two fused prisms."""
+import pytest
+
+pytest.importorskip("OCC")
+import numpy as np
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRepBndLib import brepbndlib_Add
+from OCC.Core.GProp import GProp_GProps
+from OCC.Core.BRepGProp import brepgprop_VolumeProperties
+
+from cs2cad.cadlib.extrude import CADSequence
+from cs2cad.cadlib.visualize import create_by_extrude
+
+from synthetic import EXTENT_CASES, make_sequence_dict
+
+
+def volume(shape):
+    props = GProp_GProps()
+    brepgprop_VolumeProperties(shape, props)
+    return props.Mass()
+
+
+def bbox(shape):
+    box = Bnd_Box()
+    box.SetGap(0.0)
+    brepbndlib_Add(shape, box)
+    return np.array(box.Get())
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+@pytest.mark.parametrize("case", list(EXTENT_CASES))
+def test_single_prism(case, seed):
+    cad_seq = CADSequence.from_dict(make_sequence_dict(4, n_profiles=3, seed=seed, **EXTENT_CASES[case]))
+    cad_seq.normalize()
+    for op in cad_seq.seq:
+        fused = create_by_extrude(op, single_prism=False)
+        prism = create_by_extrude(op, single_prism=True)
+        assert volume(prism) == pytest.approx(volume(fused), rel=1e-6)
+        np.testing.assert_allclose(bbox(prism), bbox(fused), atol=1e-6)
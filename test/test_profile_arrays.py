@@ -0,0 +1,84 @@
+"""Profiles read from json are backed by ProfileArrays, they must match the Loop/curve object path."""
+import copy
+import glob
+import json
+import os
+
+import pytest
+
+pytest.importorskip("cs2cad.cadlib.sketch")
+import numpy as np
+from cs2cad.cadlib.sketch import Loop, Profile
+from synthetic import make_sequence_dict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLES = [os.path.join(HERE, "json", "test.json")] + \
+          sorted(glob.glob(os.path.join(HERE, "data", "media", "document", "gear", "*.json")))
+
+
+def all_profile_stats():
+    all_stats = [json.load(open(path)) for path in SAMPLES] + [make_sequence_dict(4, seed=seed) for seed in range(3)]
+    return [profile for stat in all_stats for entity in stat["entities"].values() if entity["type"] == "Sketch"
+            for profile in entity["profiles"].values()]
+
+
+PROFILES = all_profile_stats()
+
+
+def object_profile(stat):
+    return Profile([Loop.from_dict(item) for item in stat["loops"]])
+
+
+def vec_equal(a, b):
+    if a is None or b is None:
+        return a is b
+    return a.dtype == b.dtype and np.array_equal(a, b)
+
+
+@pytest.mark.parametrize("stat", PROFILES)
+def test_from_dict(stat):
+    expected, profile = object_profile(stat), Profile.from_dict(stat)
+    assert profile.arrays is not None
+    np.testing.assert_array_equal(profile.start_point, expected.start_point)
+    np.testing.assert_array_equal(profile.end_point, expected.end_point)
+    np.testing.assert_array_equal(profile.bbox, expected.bbox)
+    assert profile.bbox_size == expected.bbox_size
+    assert vec_equal(profile.to_vector(pad=False), expected.to_vector(pad=False))
+    assert str(profile) == str(expected)
+    assert profile.arrays is not None
+
+
+@pytest.mark.parametrize("stat", PROFILES)
+def test_normalize_numericalize(stat):
+    expected, profile = object_profile(stat), Profile.from_dict(stat)
+    for p in [expected, profile]:
+        p.normalize()
+    assert vec_equal(profile.to_vector(pad=False), expected.to_vector(pad=False))
+    assert str(profile) == str(expected)
+    for p in [expected, profile]:
+        p.numericalize()
+    assert vec_equal(profile.to_vector(6, 15), expected.to_vector(6, 15))
+    assert str(profile) == str(expected)
+
+
+@pytest.mark.parametrize("stat", PROFILES)
+def test_children(stat):
+    expected, profile = object_profile(stat), Profile.from_dict(stat)
+    for p in [expected, profile]:
+        p.normalize()
+        p.numericalize()
+    assert [loop.is_outer for loop in profile.children] == [loop.is_outer for loop in expected.children]
+    assert profile.arrays is None
+    for loop, expected_loop in zip(profile.children, expected.children):
+        for curve, expected_curve in zip(loop.children, expected_loop.children):
+            assert type(curve) is type(expected_curve)
+            assert vec_equal(curve.to_vector(), expected_curve.to_vector())
+    assert vec_equal(profile.to_vector(pad=False), expected.to_vector(pad=False))
+
+
+def test_copy():
+    profile = Profile.from_dict(PROFILES[0])
+    vec = profile.to_vector(pad=False)
+    other = copy.copy(profile)
+    other.denormalize(2.0)
+    assert vec_equal(profile.to_vector(pad=False), vec)
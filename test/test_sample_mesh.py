@@ -0,0 +1,81 @@
+"""sample_mesh of the cs2cad and DeepCAD cadlib: points on their triangles, area weighted, unit normals."""
+import os
+import sys
+import importlib
+
+import pytest
+
+pytest.importorskip("OCC")
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "other", "DeepCAD"))
+
+# a unit right triangle in z=0 (counter-clockwise seen from +z) and one with three times its area in x=2
+VERTICES = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0],
+                     [2, 0, 0], [2, 3, 0], [2, 0, 1]], dtype=float)
+TRIANGLES = np.array([[0, 1, 2], [3, 4, 5]])
+ZERO_AREA = np.array([[0, 0, 1], [0, 1, 1], [0, 1, 3]]) # repeated vertices and collinear points
+
+
+@pytest.fixture(params=["cs2cad.cadlib.visualize", "cadlib.visualize"])
+def sample_mesh(request):
+    return importlib.import_module(request.param).sample_mesh
+
+
+def barycentric(points, corners):
+    """(N, 3) weights of points in the (N, 3, 3) triangles they were sampled from"""
+    e1, e2, p = corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0], points - corners[:, 0]
+    d11, d12, d22 = (e1 * e1).sum(1), (e1 * e2).sum(1), (e2 * e2).sum(1)
+    dp1, dp2 = (p * e1).sum(1), (p * e2).sum(1)
+    denom = d11 * d22 - d12 * d12
+    v = (d22 * dp1 - d12 * dp2) / denom
+    w = (d11 * dp2 - d12 * dp1) / denom
+    return np.stack([1 - v - w, v, w], axis=1), p - v[:, None] * e1 - w[:, None] * e2
+
+
+def test_points_on_triangles(sample_mesh):
+    points, _, face_ids = sample_mesh(VERTICES, TRIANGLES, 1000, face_ids=np.arange(2), rng=np.random.default_rng(0))
+    assert points.shape == (1000, 3)
+    weights, off_plane = barycentric(points, VERTICES[TRIANGLES[face_ids]])
+    assert np.all(weights >= -1e-12)
+    np.testing.assert_allclose(off_plane, 0, atol=1e-12)
+
+
+def test_proportional_to_area(sample_mesh):
+    _, _, face_ids = sample_mesh(VERTICES, TRIANGLES, 100000, face_ids=np.arange(2), rng=np.random.default_rng(0))
+    assert abs(np.mean(face_ids == 0) - 0.25) < 0.01
+
+
+def test_zero_area_never_picked(sample_mesh):
+    triangles = np.concatenate([ZERO_AREA, TRIANGLES[:1], ZERO_AREA, TRIANGLES[1:], ZERO_AREA])
+    face_ids = np.arange(len(triangles))
+    _, normals, point_face_ids = sample_mesh(VERTICES, triangles, 10000, face_ids=face_ids,
+                                             rng=np.random.default_rng(0))
+    assert set(np.unique(point_face_ids)) == {3, 7}
+    assert np.all(np.isfinite(normals))
+    with pytest.raises(ValueError):
+        sample_mesh(VERTICES, ZERO_AREA, 10)
+
+
+class _MaxRng(object):
+    """draws the largest value, rounds up to the total area"""
+    def random(self, size):
+        return np.ones(size)
+
+
+def test_draw_at_total_area(sample_mesh):
+    triangles = np.concatenate([TRIANGLES, ZERO_AREA])
+    points, normals, face_ids = sample_mesh(VERTICES, triangles, 4, face_ids=np.arange(len(triangles)), rng=_MaxRng())
+    np.testing.assert_array_equal(face_ids, 1)
+    assert np.all(np.isfinite(points)) and np.all(np.isfinite(normals))
+
+
+def test_normals_follow_orientation(sample_mesh):
+    _, normals, face_ids = sample_mesh(VERTICES, TRIANGLES, 1000, face_ids=np.arange(2), rng=np.random.default_rng(0))
+    np.testing.assert_allclose(np.linalg.norm(normals, axis=1), 1)
+    expected = np.array([[0, 0, 1], [1, 0, 0]], dtype=float)
+    np.testing.assert_allclose(normals, expected[face_ids], atol=1e-12)
+
+    _, flipped, face_ids = sample_mesh(VERTICES, TRIANGLES[:, ::-1], 1000, face_ids=np.arange(2),
+                                       rng=np.random.default_rng(0))
+    np.testing.assert_allclose(flipped, -expected[face_ids], atol=1e-12)